@@ -0,0 +1,238 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files users are likely to edit by hand. These are always copied, never hardlinked,
+# so editing one fight can't silently change another that happened to share it.
+UNSHARED_EXTENSIONS = (".json", ".lua")
+
+# Cache entries are named after their key (a SHA-1), plus an extension. Anything else is in progress.
+CACHE_ENTRY_PATTERN = re.compile(r"^[0-9a-f]{40}(\.[\w.]+)?$")
+# Entries used this recently are never evicted, so a concurrent build can't lose one between get() and using it
+CACHE_EVICTION_MIN_AGE = 60 * 60
+
+_hash_memo = {}
+_hash_memo_lock = threading.Lock()
+
+
+def hash_file(path: str) -> str:
+    """SHA-1 of a file's content, read in chunks. Memoized on (path, size, mtime) for the lifetime of the process."""
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            sha1.update(chunk)
+    digest = sha1.hexdigest()
+
+    with _hash_memo_lock:
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+def link_or_copy(source: str, destination: str):
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class BlobStore:
+    """
+    Content-addressed storage for imported fight files.
+    Identical files across fights are stored once and hardlinked into each fight folder (copied if hardlinks aren't supported).
+    Hardlinked files share their content: editing one in place changes it in every fight that shares it. Editors that
+    save by replacing the file (most image editors) are fine; to edit one in place, copy it over itself first.
+    An in-place edit also changes the blob, so blobs are checked against their digest before they're handed out again.
+    """
+    def __init__(self, folder: str):
+        self.folder = folder
+        os.makedirs(self.folder, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.folder, digest[:2], digest)
+
+    def add_stream(self, stream, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+        # Hash while writing to a temp file, then move it into place under its digest
+        sha1 = hashlib.sha1()
+        fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                for chunk in iter(lambda: stream.read(chunk_size), b""):
+                    sha1.update(chunk)
+                    target.write(chunk)
+            digest = sha1.hexdigest()
+            blob_path = self.blob_path(digest)
+            if os.path.exists(blob_path) and self.is_intact(digest):
+                os.remove(temp_path)
+            else:
+                # A blob edited through one of its links is replaced, not written through, so the edited fights keep their edit
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return digest
+
+    def add_file(self, path: str) -> str:
+        with open(path, "rb") as file:
+            return self.add_stream(file)
+
+    def is_intact(self, digest: str) -> bool:
+        """Whether the blob still has the content it's named after."""
+        return hash_file(self.blob_path(digest)) == digest
+
+    def link(self, digest: str, destination: str):
+        blob_path = self.blob_path(digest)
+        if not self.is_intact(digest):
+            raise ValueError(f"Blob {digest} was modified, add its content again before linking it")
+        if destination.lower().endswith(UNSHARED_EXTENSIONS):
+            if os.path.lexists(destination):
+                os.remove(destination)
+            shutil.copyfile(blob_path, destination)
+        else:
+            link_or_copy(blob_path, destination)
+
+    def collect_garbage(self, fights_folder: str) -> int:
+        """
+        Removes the blobs no file in fights_folder has the content of anymore, and the ones that were modified
+        (the fights they're linked into keep their copy). Returns the number of bytes freed.
+        Don't run it while an import is running, the blobs it just stored aren't linked into a fight yet.
+        """
+        blobs = {}
+        for root, _, files in os.walk(self.folder):
+            for file_name in files:
+                # Temp files belong to an add_stream that's still running
+                if file_name.endswith(".tmp"):
+                    continue
+                blob_path = os.path.join(root, file_name)
+                blobs[file_name] = (blob_path, os.stat(blob_path))
+
+        # Hardlinked fight files are matched to their blob by inode, the copied ones by content
+        blob_inodes = {(stat.st_dev, stat.st_ino): digest for digest, (_, stat) in blobs.items()}
+        blob_sizes = {stat.st_size for _, stat in blobs.values()}
+        referenced = set()
+        for root, _, files in os.walk(fights_folder):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                digest = blob_inodes.get((stat.st_dev, stat.st_ino))
+                if digest is None and stat.st_size in blob_sizes:
+                    digest = hash_file(path)
+                referenced.add(digest)
+
+        freed = 0
+        for digest, (blob_path, stat) in blobs.items():
+            if digest not in referenced:
+                os.remove(blob_path)
+                freed += stat.st_size
+            elif not self.is_intact(digest):
+                os.remove(blob_path)
+        return freed
+
+
+class ArtifactCache:
+    """
+    Stores build outputs (encoded textures, audio, etc) keyed by a hash of everything that went into them,
+    so identical assets are only ever encoded once, even across fights and builds.
+    """
+    def __init__(self, name: str, folder: str):
+        self.folder = os.path.join(folder, name)
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    def path(self, key: str, extension: str) -> str:
+        return os.path.join(self.folder, f"{key}{extension}")
+
+    def get(self, key: str, extension: str):
+        path = self.path(key, extension)
+        return path if touch(path) else None
+
+    def work_dir(self, key: str) -> str:
+        """A private directory to produce an artifact in, before handing it to put()."""
+        return tempfile.mkdtemp(dir=self.folder, prefix=f"{key}-")
+
+    def get_dir(self, key: str):
+        path = self.path(key, "")
+        return path if os.path.isdir(path) and touch(path) else None
+
+    def put_dir(self, key: str, source_dir: str) -> str:
+        """Moves a whole directory of outputs into the cache. If another process got there first, its copy is kept."""
+        path = self.path(key, "")
+        try:
+            os.rename(source_dir, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(source_dir, ignore_errors=True)
+        return path
+
+    def put(self, key: str, extension: str, source_path: str, move: bool = False) -> str:
+        path = self.path(key, extension)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if move:
+            shutil.move(source_path, temp_path)
+        else:
+            shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+        return path
+
+
+def touch(path: str) -> bool:
+    """Marks a cache entry as recently used, for trim_cache_folder. Returns False if it doesn't exist."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def entry_size(path: str) -> int:
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, file_name)) for root, _, files in os.walk(path) for file_name in files)
+
+
+def trim_cache_folder(folder: str, max_bytes: int) -> int:
+    """
+    Evicts the least recently used entries of every ArtifactCache in folder until they fit in max_bytes.
+    Returns the number of bytes freed.
+    """
+    entries = []
+    for name in os.listdir(folder) if os.path.isdir(folder) else []:
+        cache_folder = os.path.join(folder, name)
+        if not os.path.isdir(cache_folder):
+            continue
+        for entry_name in os.listdir(cache_folder):
+            if CACHE_ENTRY_PATTERN.match(entry_name) and not entry_name.endswith(".tmp"):
+                path = os.path.join(cache_folder, entry_name)
+                entries.append((os.stat(path).st_mtime, entry_size(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    cutoff = time.time() - CACHE_EVICTION_MIN_AGE
+    for mtime, size, path in sorted(entries):
+        if total - freed <= max_bytes or mtime > cutoff:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        freed += size
+    return freed
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+from assetstore import hash_file
+from core import ARENA_MAKER_DATA_FOLDER, FIGHTS_FOLDER, open_text_smart
+
+CATALOG_FILE = os.path.join(ARENA_MAKER_DATA_FOLDER, "catalog.sqlite3")
+CATALOG_VERSION = 1
+
+
+class FightCatalog:
+    """
+    Index of the fights folder, backed by SQLite.
+
+    Each fight's row is only rebuilt when the fight folder or its data.json change (by mtime),
+    so listing thousands of fights only costs one directory scan and a stat per fight.
+    """
+    def __init__(self, db_path: str = CATALOG_FILE, fights_folder: str = FIGHTS_FOLDER):
+        self.fights_folder = fights_folder
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != CATALOG_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS fights")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS fights (
+                folder TEXT PRIMARY KEY,
+                dir_mtime INTEGER NOT NULL,
+                data_mtime INTEGER,
+                valid INTEGER NOT NULL,
+                error TEXT,
+                design_file TEXT,
+                ac_name TEXT,
+                pilot_name TEXT,
+                mission_param_id INTEGER,
+                logic_file TEXT,
+                assets TEXT
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS fights_ac_name ON fights (ac_name COLLATE NOCASE)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS fights_pilot_name ON fights (pilot_name COLLATE NOCASE)")
+        self.connection.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self, deep: bool = False) -> List[str]:
+        """
+        Brings the catalog up to date with the fights folder. Returns the folders that were (re)indexed.
+        With deep=True, the referenced assets are also checked and hashed if they changed.
+        """
+        known = {row["folder"]: row for row in self.connection.execute("SELECT folder, dir_mtime, data_mtime, assets FROM fights")}
+        seen = set()
+        updated = []
+
+        with self.connection:
+            for entry in os.scandir(self.fights_folder):
+                if not entry.is_dir():
+                    continue
+                seen.add(entry.name)
+                dir_mtime = entry.stat().st_mtime_ns
+                try:
+                    data_mtime = os.stat(os.path.join(entry.path, "data.json")).st_mtime_ns
+                except FileNotFoundError:
+                    data_mtime = None
+
+                row = known.get(entry.name)
+                if row and row["dir_mtime"] == dir_mtime and row["data_mtime"] == data_mtime:
+                    if not deep or not self._assets_changed(entry.path, row["assets"]):
+                        continue
+
+                self._index_fight(entry.name, entry.path, dir_mtime, data_mtime, deep)
+                updated.append(entry.name)
+
+            removed = [(folder,) for folder in known if folder not in seen]
+            self.connection.executemany("DELETE FROM fights WHERE folder = ?", removed)
+
+        return updated
+
+    def _index_fight(self, folder: str, folder_path: str, dir_mtime: int, data_mtime: Optional[int], hash_assets: bool):
+        design_file = None
+        for file_name in os.listdir(folder_path):
+            if file_name.endswith(".design"):
+                design_file = file_name
+                break
+
+        fight_data = {}
+        error = None
+        if data_mtime is None:
+            error = "Missing data.json"
+        elif design_file is None:
+            error = "Missing .design file"
+        else:
+            try:
+                with open_text_smart(os.path.join(folder_path, "data.json")) as file:
+                    fight_data = json.load(file)
+            except (ValueError, OSError) as e:
+                error = f"Could not read data.json: {e}"
+            if not isinstance(fight_data, dict):
+                error = "data.json doesn't hold a JSON object"
+                fight_data = {}
+
+        # Sections of the wrong type are indexed as missing, validation reports them properly
+        text_data, file_data, arena_data = [fight_data.get(key) if isinstance(fight_data.get(key), dict) else {}
+                                            for key in ("textData", "fileData", "arenaData")]
+
+        assets = {}
+        for asset_path in referenced_files(file_data):
+            full_path = os.path.join(folder_path, asset_path)
+            try:
+                stat = os.stat(full_path)
+            except FileNotFoundError:
+                continue
+            assets[asset_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "hash": hash_file(full_path) if hash_assets else None
+            }
+
+        self.connection.execute("""
+            INSERT OR REPLACE INTO fights
+            (folder, dir_mtime, data_mtime, valid, error, design_file, ac_name, pilot_name, mission_param_id, logic_file, assets)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (folder, dir_mtime, data_mtime, error is None, error, design_file,
+              text_data.get("acName"), text_data.get("pilotName"), arena_data.get("missionParamId"),
+              file_data.get("logicFile"), json.dumps(assets)))
+
+    def _assets_changed(self, folder_path: str, assets_json: str) -> bool:
+        for asset_path, asset in json.loads(assets_json or "{}").items():
+            if asset["hash"] is None:
+                return True
+            try:
+                stat = os.stat(os.path.join(folder_path, asset_path))
+            except FileNotFoundError:
+                return True
+            if stat.st_size != asset["size"] or stat.st_mtime_ns != asset["mtime"]:
+                return True
+        return False
+
+    def valid_folders(self) -> List[str]:
+        return [row["folder"] for row in self.connection.execute("SELECT folder FROM fights WHERE valid ORDER BY folder")]
+
+    def errors(self) -> Dict[str, str]:
+        """Why each invalid fight can't be used, by folder."""
+        return {row["folder"]: row["error"] for row in self.connection.execute("SELECT folder, error FROM fights WHERE NOT valid")}
+
+    def get(self, folder: str) -> Optional[dict]:
+        row = self.connection.execute("SELECT * FROM fights WHERE folder = ?", (folder,)).fetchone()
+        if row is None:
+            return None
+        fight = dict(row)
+        fight["assets"] = json.loads(fight["assets"] or "{}")
+        return fight
+
+    def search(self, text: str) -> List[str]:
+        # The text is matched literally, so a search for "100%" or "my_fight" doesn't treat those as wildcards
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        return [row["folder"] for row in self.connection.execute(r"""
+            SELECT folder FROM fights
+            WHERE valid AND (folder LIKE ? ESCAPE '\' OR ac_name LIKE ? ESCAPE '\' OR pilot_name LIKE ? ESCAPE '\'
+                             OR CAST(mission_param_id AS TEXT) LIKE ? ESCAPE '\')
+            ORDER BY folder
+        """, (pattern, pattern, pattern, pattern))]
+
+
+def referenced_files(file_data: dict) -> List[str]:
+    files = []
+    for key, value in file_data.items():
+        if isinstance(value, str):
+            files.append(value)
+        elif isinstance(value, list):
+            files.extend(item for item in value if isinstance(item, str))
+    return files
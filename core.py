@@ -1,34 +1,65 @@
 import copy
+import fnmatch
+import hashlib
 import math
 import os
 import re
 import shutil
 import subprocess
 import json
-import zipfile
-from typing import Union, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Optional, Tuple
 
-import numpy
 import platformdirs
-import xmltodict
-import chardet
-from PIL import ImageDraw, ImageFont, ImageColor, Image, ImageOps, ImageFilter
-
-import soundfile as sf
 
+from lazyimport import lazy_import
+
+# Heavy dependencies, only loaded once a build stage actually uses them
+numpy = lazy_import("numpy")
+xmltodict = lazy_import("xmltodict")
+chardet = lazy_import("chardet")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
+ImageColor = lazy_import("PIL.ImageColor")
+ImageOps = lazy_import("PIL.ImageOps")
+ImageFilter = lazy_import("PIL.ImageFilter")
+sf = lazy_import("soundfile")
+try:
+    orjson = lazy_import("orjson")
+except ModuleNotFoundError:
+    orjson = None
+
+from assetstore import ArtifactCache, hash_file, link_or_copy, trim_cache_folder
+from gamedata import GameDataProvider
+from scratch import ScratchWorkspace
+import dds
+import params
+import souls
+import swf
 
 TOOLS_FOLDER = platformdirs.user_data_dir(appauthor="lugia19", roaming=True, appname="ac6_tools")
 VERSIONS_FILE = os.path.join(TOOLS_FOLDER, "versions.json")
 ARENA_MAKER_DATA_FOLDER = platformdirs.user_data_dir(appauthor="lugia19", roaming=True, appname="ac6_arena_maker")
 FIGHTS_FOLDER = os.path.join(ARENA_MAKER_DATA_FOLDER, "fights")
+BUILD_MANIFEST_FILE = os.path.join(ARENA_MAKER_DATA_FOLDER, "build_manifest.json")
+BLOBS_FOLDER = os.path.join(ARENA_MAKER_DATA_FOLDER, "blobs")
+CACHE_FOLDER = os.path.join(ARENA_MAKER_DATA_FOLDER, "cache")
+# Past this, the least recently used build artifacts are evicted after each build
+CACHE_MAX_BYTES = 4 * 1024 ** 3
+SCRATCH_FOLDER = os.path.join(ARENA_MAKER_DATA_FOLDER, "scratch")
 
 os.makedirs(FIGHTS_FOLDER, exist_ok=True)
-paths = {}
+game_data = GameDataProvider(ARENA_MAKER_DATA_FOLDER)
 
 baseline_ac = 11200000
 base_talk_accountid = 310
 menu_category = 20
 param_name_prefix = "CustomArena"
+# The Paramdex definition of ArenaParam, whose fields arenaData sets
+arena_param_type = "ARENA_PARAM_ST"
 starting_arena_id = 300
 starting_arena_rank = 300
 starting_account_id = 16000
@@ -55,6 +86,65 @@ en_jp_fmg_filenames = {
     }
 
 
+# Estimated cost (in seconds) of each build stage, per unit of work.
+# These are only used until a build has been timed, after which the measured costs from the build manifest take over.
+default_stage_costs = {
+    "validate": 0.2,
+    "prepare": 20.0,
+    "fights": 4.0,
+    "logic": 10.0,
+    "textures": 10.0,
+    "rank_icons": 45.0,
+    "save": 5.0,
+    "deploy": 2.0,
+}
+
+# Checkpoints of an unfinished build, kept in its build directory (see BuildCheckpoint)
+build_state_file_name = ".build_state.json"
+build_state_version = 1
+
+# What's already in the mod directory, so deploy_build only hashes files that changed on disk
+deploy_manifest_file_name = ".deploy_manifest.json"
+# Build intermediates that never leave the build directory, on top of the unpacked archive folders (see is_unpacked_dir)
+deploy_excluded_files = [build_state_file_name, "*.backup.bnk", "*.xml", "*.tmp"]
+
+default_locale = "engus"
+msgbnd_files = ["menu.msgbnd.dcx", "item.msgbnd.dcx"]
+
+# The menu archives the decal thumbnails and rank icons go into
+ui_tpf_path = os.path.join("menu", "hi", "01_common.tpf.dcx")
+ui_sblytbnd_path = os.path.join("menu", "hi", "01_common.sblytbnd.dcx")
+
+# Every game file a build may need, extracted up front in parallel (plus the msgbnds of every locale built)
+game_data_files = [
+    "regulation.bin",
+    os.path.join("sd", "enus", "npc015.bnk"),
+    os.path.join("param", "asmparam", "asmparam.designbnd.dcx"),
+    os.path.join("menu", "hi", "00_solo.tpfbhd"),
+    os.path.join("menu", "hi", "00_solo.tpfbdt"),
+    os.path.join("menu", "hi", "01_common.sblytbnd.dcx"),
+    os.path.join("menu", "hi", "01_common.tpf.dcx"),
+    os.path.join("menu", "01_texteffect_hi.gfx"),
+    os.path.join("menu", "02_acarena_preparing.gfx"),
+    os.path.join("menu", "02_acarena_select.gfx"),
+    os.path.join("menu", "02_npcarenaresult.gfx"),
+]
+
+supported_audio_extensions = (".wav", ".mp3", ".ogg", ".flac")
+# Bump when the native luabnd output changes, so cached ones get rebuilt
+luabnd_format_version = 1
+
+# What the WEM converter gets fed
+wem_sample_rate = 48000
+# Peak level for fights that opt into normalization with fileData.normalizeAudio
+wem_peak_dbfs = -1.0
+audio_block_frames = 65536
+# Kaiser windowed-sinc resampling: zero crossings on each side of the kernel, window shape, and where the low-pass
+# starts rolling off, relative to the lower of the two Nyquist frequencies
+resample_zero_crossings = 16
+resample_kaiser_beta = 8.6
+resample_rolloff = 0.94
+
 # Define the rank data
 rank_tiers = [
     {"letter": "S", "percentage": 10, "color": "#fff145"},
@@ -66,16 +156,151 @@ rank_tiers = [
     {"letter": "F", "percentage": 10, "color": "#e3ffff"},
 ]
 
+class BuildMemo:
+    """
+    In-memory results that stay valid from one build to the next, like parsed baseline params and FMGs or tool output for a given input.
+    Each build gets a fresh one by default, the build daemon keeps one alive so repeat builds skip that work.
+    """
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+        # Computed outside the lock, if two threads race the first result wins
+        value = factory()
+        with self._lock:
+            return self._values.setdefault(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class BuildCancelled(Exception):
+    """Raised inside a build once its CancellationToken has been cancelled."""
+
+
+class CancellationToken:
+    """
+    Shared between a build and whoever may want to stop it. The build checks it between stages and before every tool it runs,
+    cancelling also kills the tools running at that moment so the build stops right away instead of after the current repack.
+    """
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            kill_process(process)
+
+    def check(self):
+        if self.cancelled:
+            raise BuildCancelled("The build was cancelled")
+
+    def register(self, process: subprocess.Popen):
+        with self._lock:
+            self._processes.add(process)
+        # Started just as the build was cancelled
+        if self.cancelled:
+            kill_process(process)
+
+    def unregister(self, process: subprocess.Popen):
+        with self._lock:
+            self._processes.discard(process)
+
+
+class BuildContext:
+    """
+    Everything a single build works with: tool paths, the roster of fights, the mod output directory and a private scratch workspace.
+    Nothing about a build lives in module globals or depends on the working directory, so several builds
+    (different rosters, or variants of the same one) can run side by side as long as they use different mod directories.
+    Builds happen in a build directory next to the mod directory, which only gets the finished files (see deploy_build).
+    """
+    def __init__(self, roster: List[str], mod_directory: str = None, scratch: ScratchWorkspace = None,
+                 tools_folder: str = TOOLS_FOLDER, fights_directory: str = FIGHTS_FOLDER, data_provider: GameDataProvider = None,
+                 memo: BuildMemo = None, paramdex: params.Paramdex = None, locales: List[str] = None,
+                 cancel_token: CancellationToken = None, build_directory: str = None):
+        self.roster = list(roster)
+        # The msg folders text is written to, English is always built since it's the fallback for every other locale
+        self.locales = [default_locale] + [locale for locale in (locales or []) if locale != default_locale]
+        self.game_data = data_provider if data_provider else game_data
+        self.memo = memo if memo else BuildMemo()
+        self.cancel_token = cancel_token if cancel_token else CancellationToken()
+        self.tool_stats = {"calls": 0}
+        self.tool_stats_lock = threading.Lock()
+        self._tool_versions = None
+
+        # Intermediates never go into the fight folders, which stay read-only during a build
+        self._owns_scratch = scratch is None
+        self.scratch = scratch if scratch else ScratchWorkspace(SCRATCH_FOLDER)
+
+        resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+        rewwise_path = os.path.join(tools_folder, "rewwise")
+        self.paths = {
+            "resources_dir": resources_dir,
+            "witchybnd_path": os.path.join(tools_folder, "witchybnd", "WitchyBND.exe"),
+            "ffdec_path": os.path.join(tools_folder, "ffdec", "ffdec.bat"),
+            "rewwise_path": rewwise_path,
+            "texconv_path": os.path.join(tools_folder, "DirectXTex", "texconv.exe"),
+            "fnv_hash_path": os.path.join(rewwise_path, "fnv-hash.exe"),
+            "bnk2json_path": os.path.join(rewwise_path, "bnk2json.exe"),
+            "wem_converter": os.path.join(resources_dir, "wem_converter.exe"),
+            "fights_directory": fights_directory,
+            "mod_directory": mod_directory if mod_directory else os.path.join(ARENA_MAKER_DATA_FOLDER, "mod"),
+        }
+        self.paths["build_directory"] = build_directory if build_directory else self.paths["mod_directory"] + "-build"
+        self.paramdex = paramdex if paramdex else params.Paramdex(os.path.join(os.path.dirname(self.paths["witchybnd_path"]), "Assets"))
+
+    def tool_version(self, tool_name: str):
+        """The installed version of a tool, as recorded by the updater in versions.json."""
+        if self._tool_versions is None:
+            try:
+                with open(VERSIONS_FILE, "r", encoding="utf-8") as fp:
+                    self._tool_versions = json.load(fp)
+            except (FileNotFoundError, json.decoder.JSONDecodeError):
+                self._tool_versions = {}
+        return self._tool_versions.get(tool_name)
+
+    def tool_fingerprint(self, tool_name: str, path_key: str):
+        """Identifies the installed build of a tool for cache keys: its recorded version, or the hash of its executable."""
+        version = self.tool_version(tool_name)
+        if version is None and os.path.exists(self.paths[path_key]):
+            version = hash_file(self.paths[path_key])
+        return version
+
+    def scratch_dir(self, prefix: str, expected_size: int = 0) -> str:
+        """A fresh directory in this build's scratch workspace, in RAM if expected_size bytes still fit."""
+        return self.scratch.make_dir(prefix, expected_size)
+
+    def cleanup(self):
+        if self._owns_scratch:
+            self.scratch.cleanup()
+
 class SoundbankEditor:
-    def __init__(self, rel_soundbank_path):
-        copy_file_from_game_folder_if_missing(rel_soundbank_path)
-        soundbank_path = os.path.join(paths['mod_directory'], rel_soundbank_path)
-        subprocess.run([paths["bnk2json_path"], soundbank_path])
+    def __init__(self, context: BuildContext, rel_soundbank_path):
+        self.context = context
+        copy_file_from_game_folder_if_missing(self.context, rel_soundbank_path)
+        soundbank_path = os.path.join(self.context.paths['build_directory'], rel_soundbank_path)
         self.soundbank_path = soundbank_path
         self.soundbank_dir = os.path.join(os.path.dirname(soundbank_path), os.path.splitext(soundbank_path)[0])
         self.soundbank_json_path = os.path.join(self.soundbank_dir, "soundbank.json")
 
-        self.soundbank_data = json.load(open_text_smart(self.soundbank_json_path))
+        # The WEMs are linked in from the cache, the JSON is read straight from it and only ever written fresh
+        unpacked_dir = self.unpack_baseline()
+        shutil.copytree(unpacked_dir, self.soundbank_dir, copy_function=link_or_copy, dirs_exist_ok=True,
+                        ignore=lambda directory, names: ["soundbank.json"] if directory == unpacked_dir else [])
+        self.soundbank_data = load_json_fast(os.path.join(unpacked_dir, "soundbank.json"))
         self.sound_object_list = self.soundbank_data["sections"][1]["body"]["HIRC"]["objects"]
 
         self.base_play_event = copy.deepcopy(self.get_object(f"Play_v{600000000 + base_talk_accountid * 1000 + 100}"))
@@ -85,9 +310,28 @@ class SoundbankEditor:
         self.base_sound = copy.deepcopy(self.get_object(self.base_stop_action["body"]["Action"]["external_id"]))
         self.actor_mixer = self.get_object(self.base_sound["body"]["Sound"]["node_base_params"]["direct_parent_id"])
 
+    def unpack_baseline(self) -> str:
+        """Runs bnk2json on the untouched soundbank once per soundbank/rewwise version, returning the cached unpacked folder."""
+        soundbank_cache = ArtifactCache("soundbanks", CACHE_FOLDER)
+        rewwise_version = self.context.tool_fingerprint("rewwise", "bnk2json_path")
+        cache_key = soundbank_cache.key(hash_file(self.soundbank_path), "bnk2json", rewwise_version)
+        cached_dir = soundbank_cache.get_dir(cache_key)
+        if cached_dir:
+            print(f"Reusing unpacked soundbank for {os.path.basename(self.soundbank_path)}")
+            return cached_dir
+
+        work_dir = soundbank_cache.work_dir(cache_key)
+        try:
+            work_bnk_path = os.path.join(work_dir, os.path.basename(self.soundbank_path))
+            shutil.copyfile(self.soundbank_path, work_bnk_path)
+            run_tool(self.context, [self.context.paths["bnk2json_path"], work_bnk_path], check=True)
+            return soundbank_cache.put_dir(cache_key, os.path.splitext(work_bnk_path)[0])
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
     def get_object(self, object_id: Union[str, int]):
         if isinstance(object_id, str):
-            hash_id = get_hash(object_id)
+            hash_id = get_hash(self.context, object_id)
             string_id = object_id
         else:
             hash_id = object_id
@@ -104,7 +348,7 @@ class SoundbankEditor:
 
         if not new_sound:
             new_sound = copy.deepcopy(self.base_sound)
-            new_sound["id"]["Hash"] = get_hash(string_id)
+            new_sound["id"]["Hash"] = get_hash(self.context, string_id)
             self.sound_object_list.insert(self.sound_object_list.index(self.base_sound), new_sound)
 
         new_sound["body"]["Sound"]["bank_source_data"]["source_type"] = "Embedded"
@@ -122,7 +366,7 @@ class SoundbankEditor:
         new_action = self.get_object(string_id)
         if not new_action:
             new_action = copy.deepcopy(base_action)
-            new_action["id"]["Hash"] = get_hash(string_id)
+            new_action["id"]["Hash"] = get_hash(self.context, string_id)
             self.sound_object_list.insert(self.sound_object_list.index(base_action), new_action)
 
         sound_hash = self.update_sound(talk_id, sound_filename)
@@ -151,117 +395,300 @@ class SoundbankEditor:
     def save(self):
         print(f'Final ActorMixer children count: {len(self.actor_mixer["body"]["ActorMixer"]["children"]["items"])}')
         print(f'Final object count: {len(self.sound_object_list)}')
-        json.dump(self.soundbank_data, open(self.soundbank_json_path, "w", encoding="utf-8"), indent=2)
+        dump_json_fast(self.soundbank_data, self.soundbank_json_path)
 
         print("Done saving. Rebuilding the bnk from the folder.")
-        subprocess.run([paths["bnk2json_path"], self.soundbank_dir])
+        run_tool(self.context, [self.context.paths["bnk2json_path"], self.soundbank_dir])
         shutil.move(self.soundbank_path, self.soundbank_path.replace(".bnk", ".backup.bnk"))
         shutil.move(self.soundbank_path.replace(".bnk",".created.bnk"), self.soundbank_path)
 
 class ParamFile:
-    def __init__(self, param_name, baseline_id: Union[int, str], baseline_id_property="@id"):
+    def __init__(self, context: BuildContext, param_name, baseline_id: Union[int, str], baseline_id_property="@id"):
+        self.context = context
         self.param_name = param_name
         self.baseline_id = baseline_id
         self.baseline_id_property = baseline_id_property
-        self.param_data = None
+        self.param = None
+        self.param_file_path = None
         self.base_data = None
-        self.fetch_param_xml()
-
-    def fetch_param_xml(self):
-        if copy_file_from_game_folder_if_missing("regulation.bin"):
-            run_witchy(os.path.join(paths['mod_directory'], "regulation.bin"), recursive=True)
-
-        param_file_path = os.path.join(os.path.join(paths['mod_directory'], "regulation-bin"), self.param_name + ".param.xml")
-        xml_data = parse_xml_file(param_file_path)
-        self.param_data = xml_data
-        self.base_data = self.get_param_entry_with_id(self.baseline_id, self.baseline_id_property)
+        self.new_entries = []
+        self.fetch_param()
+
+    def fetch_param(self):
+        # The params are read and written natively, so regulation.bin only needs its entries unpacked
+        if copy_file_from_game_folder_if_missing(self.context, "regulation.bin"):
+            run_witchy(self.context, os.path.join(self.context.paths['build_directory'], "regulation.bin"))
+
+        self.param_file_path = os.path.join(self.context.paths['build_directory'], "regulation-bin", self.param_name + ".param")
+        baseline = self.context.memo.get(("param", self.param_name, hash_file(self.param_file_path)),
+                                         lambda: params.Param.read(self.param_file_path, self.context.paramdex))
+        self.param = baseline.copy()
+        base_index = self.find_param_entry(self.baseline_id, self.baseline_id_property)
+        self.base_data = self.param.row(base_index) if base_index is not None else None
+
+    def find_param_entry(self, ID: Union[int, str], ID_property="@id"):
+        if ID_property == "@id":
+            matches = numpy.flatnonzero(self.param.ids == int(ID))
+            return int(matches[0]) if len(matches) else None
+        return self.param.find(ID_property[1:], ID)
 
     def get_param_entry_with_id(self, ID: Union[int, str], ID_property="@id"):
-        for entry in self.param_data["param"]["rows"]["row"]:
-            if entry[ID_property] == str(ID):
-                return copy.deepcopy(entry)
-        return None
+        index = self.find_param_entry(ID, ID_property)
+        return self.param.row(index) if index is not None else None
 
     def add_param_entry(self, new_param_entry_data: dict):
-        new_param_entry = copy.deepcopy(self.base_data)
-        for key, value in new_param_entry_data.items():
-            new_param_entry[key] = value
-
-        param_rows = self.param_data["param"]["rows"]["row"]
-
-        insert_index = None
-        for i in range(len(param_rows)):
-            if int(new_param_entry["@id"]) < int(param_rows[i]["@id"]):
-                insert_index = i
-                break
-
-        if insert_index is None:
-            param_rows.append(new_param_entry)
-        else:
-            param_rows.insert(insert_index, new_param_entry)
+        # Only the changed fields are kept per entry, the rows are materialized in bulk when saving
+        self.new_entries.append(self.base_data.overlay(new_param_entry_data))
 
     def save(self):
-        xml_file = self.param_name + ".param.xml"
-        xml_path = os.path.join(paths['mod_directory'], "regulation-bin", xml_file)
-        xml_data = xmltodict.unparse(self.param_data, pretty=True)
-
-        with open(os.path.join(xml_path), "w", encoding="utf-8") as file:
-            file.write(xml_data)
-        run_witchy(xml_path)
+        self.param.add_overlay_rows(self.new_entries)
+        self.new_entries = []
+        self.param.write(self.param_file_path)
 
 class FMGFile:
-    def __init__(self, fmg_name):
+    def __init__(self, context: BuildContext, fmg_name, locale=default_locale):
+        self.context = context
         self.fmg_name = fmg_name
-        self.fmg_text_data = None
+        self.locale = locale
+        self.fmg = None
+        self.fmg_file_path = None
         self.fetch_fmg_text()
 
     def fetch_fmg_text(self):
-        bnds = ["menu.msgbnd.dcx", "item.msgbnd.dcx"]
-        msg_rel_dir = os.path.join("msg", "engus")
-        for bnd in bnds:
-            if copy_file_from_game_folder_if_missing(os.path.join(msg_rel_dir, bnd)):
-                run_witchy(os.path.join(paths['mod_directory'], msg_rel_dir, bnd), recursive=True)
-
-        msgdir = os.path.join(paths['mod_directory'], msg_rel_dir)
+        msg_rel_dir = os.path.join("msg", self.locale)
+        # The FMGs are read and written natively, so the msgbnds only need their entries unpacked
+        missing_bnds = [os.path.join(self.context.paths['build_directory'], msg_rel_dir, bnd) for bnd in msgbnd_files
+                        if copy_file_from_game_folder_if_missing(self.context, os.path.join(msg_rel_dir, bnd))]
+        if missing_bnds:
+            run_witchy(self.context, missing_bnds)
+
+        msgdir = os.path.join(self.context.paths['build_directory'], msg_rel_dir)
         actual_fmg_name = en_jp_fmg_filenames[self.fmg_name]["name"]
-        fmg_file_path = os.path.join(msgdir, en_jp_fmg_filenames[self.fmg_name]["file"].replace(".", "-"), actual_fmg_name + ".fmg.xml")
-        xml_data = parse_xml_file(fmg_file_path)
-        self.fmg_text_data = xml_data
+        self.fmg_file_path = os.path.join(msgdir, en_jp_fmg_filenames[self.fmg_name]["file"].replace(".", "-"), actual_fmg_name + ".fmg")
+        baseline = self.context.memo.get(("fmg", self.locale, self.fmg_name, hash_file(self.fmg_file_path)), lambda: souls.Fmg.read(self.fmg_file_path))
+        self.fmg = souls.Fmg(dict(baseline.entries), baseline.version)
 
     def add_text_fmg_entry(self, id_list: Union[int, List[int]], text_value: str):
         if isinstance(id_list, int):
             id_list = [id_list]
-
-        fmg_entries:List = self.fmg_text_data["fmg"]["entries"]["text"]
-        items_to_pop = []
-        for item in fmg_entries:
-            if int(item["@id"]) in id_list:
-                items_to_pop.append(item)
-        for item in items_to_pop:
-            fmg_entries.pop(item)
         for item_id in id_list:
-            fmg_entries.append({"@id": item_id, "#text": text_value})
+            self.fmg.entries[int(item_id)] = text_value
 
     def save(self):
-        bnds = ["menu.msgbnd.dcx", "item.msgbnd.dcx"]
-        msg_rel_dir = os.path.join("msg", "engus")
-        for bnd in bnds:
-            if copy_file_from_game_folder_if_missing(os.path.join(msg_rel_dir, bnd)):
-                run_witchy(os.path.join(msg_rel_dir, bnd), recursive=True)
-
-        msgdir = os.path.join(paths['mod_directory'], msg_rel_dir)
-        actual_fmg_name = en_jp_fmg_filenames[self.fmg_name]["name"]
-        fmg_file_path = os.path.join(msgdir, en_jp_fmg_filenames[self.fmg_name]["file"].replace(".", "-"), actual_fmg_name + ".fmg.xml")
-
-        xml_data = xmltodict.unparse(self.fmg_text_data, pretty=True)
-
-        with open(os.path.join(fmg_file_path), "w", encoding="utf-8") as file:
-            file.write(xml_data)
-        run_witchy(fmg_file_path)
+        self.fmg.write(self.fmg_file_path)
 
 class DummySignal:
-    def emit(self, arg, arg2):
-        return arg
+    def emit(self, *args):
+        return args[0]
+
+class BuildProgress:
+    """
+    Turns stage/unit completion into a weighted percentage, an ETA and throughput figures.
+
+    Each stage is weighted by its per-unit cost as measured on previous builds (see BUILD_MANIFEST_FILE),
+    so long stages like the final repack get a proportional share of the progress bar.
+    """
+    def __init__(self, progress_signal, stage_units: dict, stats_signal=None, tool_stats: dict = None, cancel_token: CancellationToken = None):
+        self.progress_signal = progress_signal if progress_signal else DummySignal()
+        self.cancel_token = cancel_token if cancel_token else CancellationToken()
+        self.stats_signal = stats_signal if stats_signal else DummySignal()
+        self.stage_units = dict(stage_units)
+        self.stage_costs = load_stage_costs()
+        self.estimated_total = sum(self.stage_costs[stage] * units for stage, units in self.stage_units.items())
+
+        self.stage_seconds = {}
+        self.current_stage = None
+        self.current_stage_start = None
+        self.current_stage_done = 0
+        self.completed_estimate = 0.0
+
+        self.start_time = time.monotonic()
+        self.tool_stats = tool_stats if tool_stats is not None else {"calls": 0}
+        self.start_tool_calls = self.tool_stats["calls"]
+        self.fights_done = 0
+        self.resumed = False
+
+    def start_stage(self, stage: str, message: str):
+        self.cancel_token.check()
+        if self.current_stage:
+            self._end_stage()
+        self.current_stage = stage
+        self.current_stage_start = time.monotonic()
+        self.current_stage_done = 0
+        self._emit(message)
+
+    def advance(self, message: str, units: int = 1):
+        self.cancel_token.check()
+        self.current_stage_done = min(self.current_stage_done + units, self.stage_units[self.current_stage])
+        if self.current_stage == "fights":
+            self.fights_done += units
+        self._emit(message)
+
+    def skip_stage(self, stage: str):
+        """Counts a stage an earlier, interrupted build already finished as done."""
+        if self.current_stage:
+            self._end_stage()
+        self.completed_estimate += self.stage_costs[stage] * self.stage_units[stage]
+        self.resumed = True
+        self._emit(f"Reusing {stage} from the previous build...")
+
+    def finish(self, message="Done!"):
+        if self.current_stage:
+            self._end_stage()
+        self.progress_signal.emit(100, message)
+        self.stats_signal.emit(0, *self._throughput())
+        # Only part of a resumed build actually ran, its timings would throw off the estimates
+        if not self.resumed:
+            save_stage_costs(self.stage_units, self.stage_seconds)
+
+    def _end_stage(self):
+        self.stage_seconds[self.current_stage] = time.monotonic() - self.current_stage_start
+        self.completed_estimate += self.stage_costs[self.current_stage] * self.stage_units[self.current_stage]
+        self.current_stage = None
+
+    def _done_estimate(self):
+        done = self.completed_estimate
+        if self.current_stage:
+            done += self.stage_costs[self.current_stage] * self.current_stage_done
+        return done
+
+    def _throughput(self):
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        return self.fights_done / elapsed, (self.tool_stats["calls"] - self.start_tool_calls) / elapsed
+
+    def _emit(self, message):
+        done = self._done_estimate()
+        percentage = math.floor(100 * done / self.estimated_total) if self.estimated_total else 0
+        self.progress_signal.emit(min(percentage, 99), message)
+
+        # Scale the remaining estimate by how fast this machine is actually going compared to the estimate
+        elapsed = time.monotonic() - self.start_time
+        remaining = self.estimated_total - done
+        if done > 0:
+            remaining *= elapsed / done
+        self.stats_signal.emit(int(remaining), *self._throughput())
+
+class BuildCheckpoint:
+    """
+    The stages a build has finished, persisted in its build directory so a build that failed or was cancelled picks up after
+    the last completed stage instead of wiping the build directory and starting over.
+    Only ever resumed by a build of the exact same inputs (see build_signature), and removed once the build is done.
+    """
+    def __init__(self, path: str, signature: str, completed: List[str] = None, data: dict = None):
+        self.path = path
+        self.signature = signature
+        self.completed = list(completed) if completed else []
+        self.data = dict(data) if data else {}
+
+    @classmethod
+    def load(cls, context: BuildContext) -> "BuildCheckpoint":
+        path = os.path.join(context.paths["build_directory"], build_state_file_name)
+        signature = build_signature(context)
+        try:
+            with open(path, "r", encoding="utf-8") as fp:
+                state = json.load(fp)
+            if state.get("signature") == signature:
+                return cls(path, signature, state.get("completed"), state.get("data"))
+            print("The previous build had different inputs, starting over")
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            pass
+        return cls(path, signature)
+
+    def is_done(self, unit: str) -> bool:
+        return unit in self.completed
+
+    def mark_done(self, unit: str, **data):
+        self.completed.append(unit)
+        self.data.update(data)
+        # Written atomically, a build killed halfway through writing it shouldn't lose the earlier stages
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as fp:
+            json.dump({"signature": self.signature, "completed": self.completed, "data": self.data}, fp)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        self.completed = []
+        self.data = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def build_signature(context: BuildContext) -> str:
+    """Hash of everything a build's output depends on: the roster and its fights' files, the locales and the tool versions."""
+    fights_directory = context.paths["fights_directory"]
+    inputs = {
+        "version": build_state_version,
+        "roster": context.roster,
+        "locales": context.locales,
+        "fights": {fight: fight_signature(os.path.join(fights_directory, fight)) for fight in context.roster},
+        "tools": {tool: context.tool_version(tool) for tool in ("witchy", "rewwise", "texconv", "ffdec")},
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+def fight_signature(fight_dir: str) -> tuple:
+    signature = []
+    for root, _, files in os.walk(fight_dir):
+        for file_name in files:
+            try:
+                stat = os.stat(os.path.join(root, file_name))
+            except FileNotFoundError:
+                continue
+            signature.append((os.path.relpath(os.path.join(root, file_name), fight_dir), stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(signature))
+
+def load_stage_costs() -> dict:
+    stage_costs = dict(default_stage_costs)
+    try:
+        with open(BUILD_MANIFEST_FILE, "r", encoding="utf-8") as fp:
+            stage_costs.update(json.load(fp).get("stage_costs", {}))
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        pass
+    return stage_costs
+
+def save_stage_costs(stage_units: dict, stage_seconds: dict):
+    manifest = {}
+    try:
+        with open(BUILD_MANIFEST_FILE, "r", encoding="utf-8") as fp:
+            manifest = json.load(fp)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        pass
+
+    stage_costs = manifest.get("stage_costs", {})
+    for stage, seconds in stage_seconds.items():
+        units = stage_units.get(stage, 0)
+        if units <= 0:
+            continue
+        measured = seconds / units
+        # Smooth it out so a single odd build doesn't throw off the next estimate
+        previous = stage_costs.get(stage)
+        stage_costs[stage] = measured if previous is None else (previous + measured) / 2
+
+    manifest["stage_costs"] = stage_costs
+    manifest["last_build"] = {
+        "finished": time.time(),
+        "stage_units": stage_units,
+        "stage_seconds": stage_seconds,
+    }
+    # Written atomically, other builds may be reading it at the same time
+    temp_path = f"{BUILD_MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=4)
+    os.replace(temp_path, BUILD_MANIFEST_FILE)
+
+def load_json_fast(path: str):
+    # Only for files written by our own tools, which are always UTF-8
+    with open(path, "rb") as fp:
+        data = fp.read()
+    return orjson.loads(data) if orjson else json.loads(data.decode("utf-8"))
+
+def dump_json_fast(data, path: str):
+    # Compact output, nothing reads these files but the tools
+    with open(path, "wb") as fp:
+        if orjson:
+            fp.write(orjson.dumps(data))
+        else:
+            fp.write(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
 
 #I love encoding
 def open_text_smart(filename):
@@ -336,7 +763,23 @@ def generate_rank_image(text, text_color, font_path):
 
     return image
 
-def process_image(subfolder_path, img_path, target_width, target_height, pad_x=0, pad_y=0):
+def load_ui_image(subfolder_path, img_path, target_width, target_height):
+    """Loads and resizes a small UI image (thumbnails, rank icons). These stay in memory until they're packed into a sheet."""
+    if not img_path:
+        return None
+    if subfolder_path not in img_path:
+        img_path = os.path.join(subfolder_path, img_path)
+    with Image.open(img_path) as img:
+        return img.convert("RGBA").resize((target_width, target_height), Image.Resampling.LANCZOS)
+
+def write_ui_texture(image, dds_path) -> int:
+    """Encodes a UI texture natively, returning the TPF format it was written in."""
+    dds_format = dds.ui_texture_format(image.width, image.height)
+    with open(dds_path, "wb") as file:
+        file.write(dds.encode_dds(numpy.asarray(image.convert("RGBA")), dds_format))
+    return dds.TPF_FORMATS[dds_format]
+
+def process_image(context: BuildContext, subfolder_path, img_path, target_width, target_height, pad_x=0, pad_y=0):
     if not img_path:
         return None
     if subfolder_path not in img_path:
@@ -347,96 +790,433 @@ def process_image(subfolder_path, img_path, target_width, target_height, pad_x=0
     if pad_y == 0:
         target_height = target_height + (4 - target_height % 4) % 4
 
-    filename = os.path.splitext(os.path.basename(img_path))[0]
-    resized_img_path = os.path.join(subfolder_path, f"{filename}-resized.png")
-    with Image.open(img_path) as img:
-        # Resize the image
-        img_resized = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-        img_resized = ImageOps.expand(img_resized, (0, 0, pad_x, pad_y))
+    # Identical images (shared emblems etc) only get encoded once
+    texture_cache = ArtifactCache("textures", CACHE_FOLDER)
+    cache_key = texture_cache.key(hash_file(img_path), target_width, target_height, pad_x, pad_y, "BC7_UNORM",
+                                  context.tool_fingerprint("texconv", "texconv_path"))
+    cached_dds_path = texture_cache.get(cache_key, ".dds")
+    if cached_dds_path:
+        return cached_dds_path
+
+    # Room for the resized png and the dds
+    work_dir = context.scratch_dir("texture-", (target_width + pad_x) * (target_height + pad_y) * 4 * 2)
+    resized_img_path = os.path.join(work_dir, "resized.png")
+    try:
+        with Image.open(img_path) as img:
+            # Resize the image
+            img_resized = img.resize((target_width, target_height), Image.Resampling.LANCZOS)
+            img_resized = ImageOps.expand(img_resized, (0, 0, pad_x, pad_y))
 
-        # Save the padded image
-        img_resized.save(resized_img_path)
+            # Save the padded image
+            img_resized.save(resized_img_path)
 
-    # Convert to DDS using texconv
-    dds_path = os.path.join(subfolder_path, f"{filename}-final.dds")
+        # Convert to DDS using texconv
+        run_tool(context, [context.paths["texconv_path"], "-f", "BC7_UNORM", resized_img_path, "-o", work_dir, "-y"], check=True)
+        return texture_cache.put(cache_key, ".dds", os.path.join(work_dir, "resized.dds"), move=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-    subprocess.run([paths["texconv_path"], "-f", "BC7_UNORM", resized_img_path, "-o", subfolder_path, "-y"], check=True)
-    shutil.move(os.path.join(subfolder_path, f"{filename}-resized.dds"), dds_path)
-    os.remove(os.path.join(subfolder_path, f"{filename}-resized.png"))
-    return dds_path
 
+class BuildValidationError(ValueError):
+    """Raised before a build starts if any fight in the roster is broken. errors holds every problem found."""
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} problem(s) found in the fights:\n" + "\n".join(errors))
 
-def compile_folder(progress_signal=None):
-    with open_text_smart("config.json") as f:
-        config = json.load(f)
+def validate_fight(fight_dir: str, warnings: List[str] = None, arena_fields: dict = None) -> List[str]:
+    """
+    Checks a single fight's data.json and everything it references. Returns the problems that would break the build, empty if it's fine.
+    Things the build works around (like audio files it skips) are added to warnings instead, if given.
+    With arena_fields (see arena_param_fields), the arenaData keys and values are checked against ArenaParam too.
+    """
+    fight_name = os.path.basename(fight_dir)
+    errors = []
+    if warnings is None:
+        warnings = []
 
-    if not progress_signal:
-        progress_signal = DummySignal()
+    def error(message):
+        errors.append(f"{fight_name}: {message}")
 
-    resources_dir = os.path.join(os.path.dirname(__file__), "resources")
-    paths["witchybnd_path"] = os.path.join(TOOLS_FOLDER, "witchybnd", "WitchyBND.exe")
-    paths["fights_directory"] = FIGHTS_FOLDER
-    paths["ffdec_path"] = os.path.join(TOOLS_FOLDER, "ffdec", "ffdec.bat")
-    paths["rewwise_path"] = os.path.join(TOOLS_FOLDER, "rewwise")
-    paths["texconv_path"] = os.path.join(TOOLS_FOLDER, "DirectXTex", "texconv.exe")
-    paths["fnv_hash_path"] = os.path.join(paths["rewwise_path"], "fnv-hash.exe")
-    paths["bnk2json_path"] = os.path.join(paths["rewwise_path"], "bnk2json.exe")
-    paths["wem_converter"] = os.path.join(resources_dir, "wem_converter.exe")
+    def warning(message):
+        warnings.append(f"{fight_name}: {message}")
 
-    paths["mod_directory"] = os.path.join(ARENA_MAKER_DATA_FOLDER, "mod")
+    if not os.path.isdir(fight_dir):
+        error("Fight folder not found")
+        return errors
 
     try:
-        shutil.rmtree(paths['mod_directory'])
-        print(f"Directory '{paths['mod_directory']}' and its contents have been deleted.")
+        with open_text_smart(os.path.join(fight_dir, "data.json")) as file:
+            fight_data = json.load(file)
     except FileNotFoundError:
-        print(f"Directory '{paths['mod_directory']}' does not exist.")
-    os.makedirs(paths['mod_directory'], exist_ok=True)
-
-    # Prep params
-    arena_param = ParamFile("ArenaParam", baseline_ac, "@charaInitParamId")
-    charinit_param = ParamFile("CharaInitParam", baseline_ac)
-    npc_param = ParamFile("NpcParam", baseline_ac)
-    account_param = ParamFile("AccountParam", npc_param.base_data["@accountParamId"])
-    npcthink_param = ParamFile("NpcThinkParam", baseline_ac)
-    talk_param = ParamFile("TalkParam", 600000000 + int(npc_param.base_data["@accountParamId"]) * 1000 + 100)
-
-    # Prep FMGs
-    menu_text_fmg = FMGFile("MenuText")
-    menu_text_fmg.add_text_fmg_entry([258010 + menu_category], "CUSTOM ARENA")
-    ranker_profile_fmg = FMGFile("RankerProfile")
-    title_characters_fmg = FMGFile("TitleCharacters")
-    talk_msg_fmg = FMGFile("TalkMsg")
-
-    decal_thumbnail_paths = dict()
-    rank_icon_paths = dict()
-
-    npc_015_bnk = SoundbankEditor(os.path.join("sd", "enus", "npc015.bnk"))
-
-    # Main loop
-    fight_order = config["folder_order"]
-    fight_dirs = [os.path.join(paths["fights_directory"], fight_dir) for fight_dir in fight_order]
-    total_fights = len(fight_dirs)
+        error("Missing data.json")
+        return errors
+    except (ValueError, OSError) as e:
+        error(f"Could not read data.json: {e}")
+        return errors
+    if not isinstance(fight_data, dict):
+        error("data.json doesn't hold a JSON object")
+        return errors
+
+    file_data = fight_data.get("fileData")
+    text_data = fight_data.get("textData")
+    if not isinstance(file_data, dict):
+        error("data.json has no fileData")
+        file_data = {}
+    if not isinstance(text_data, dict):
+        error("data.json has no textData")
+        text_data = {}
+    arena_data = fight_data.get("arenaData")
+    if not isinstance(arena_data, dict):
+        error("data.json has no arenaData")
+    elif arena_fields is not None:
+        for key, value in arena_data.items():
+            field = arena_fields.get(key)
+            if field is None or field.is_padding:
+                error(f"arenaData.{key} is not an ArenaParam field")
+            elif not field.is_string and not field.is_array:
+                try:
+                    params.coerce_value(field, value)
+                except (TypeError, ValueError):
+                    error(f"arenaData.{key} should be a number, not '{value}'")
+
+    for key in ["acName", "pilotName", "arenaDescription"]:
+        if not isinstance(text_data.get(key), str):
+            error(f"textData.{key} is missing")
+    for key, line_count in [("intro", 3), ("outro", 2)]:
+        if key in text_data and (not isinstance(text_data[key], list) or len(text_data[key]) < line_count):
+            error(f"textData.{key} needs {line_count} lines")
+    localized_text_data = fight_data.get("localizedTextData", {})
+    if not isinstance(localized_text_data, dict) or not all(isinstance(overrides, dict) for overrides in localized_text_data.values()):
+        error("localizedTextData must map locales to textData overrides")
+    else:
+        for locale, overrides in localized_text_data.items():
+            for key in ["acName", "pilotName", "arenaDescription"]:
+                if key in overrides and not isinstance(overrides[key], str):
+                    error(f"localizedTextData.{locale}.{key} is not a string")
+            for key, line_count in [("intro", 3), ("outro", 2)]:
+                if key in overrides and (key not in text_data or not isinstance(overrides[key], list) or len(overrides[key]) < line_count):
+                    error(f"localizedTextData.{locale}.{key} needs {line_count} lines, and English ones in textData")
+
+    def existing_file(key, relative_path):
+        if not isinstance(relative_path, str) or not relative_path:
+            error(f"fileData.{key} is not a file name")
+            return None
+        full_path = os.path.join(fight_dir, relative_path)
+        if not os.path.isfile(full_path):
+            error(f"fileData.{key} points to '{relative_path}', which doesn't exist")
+            return None
+        return full_path
+
+    design_file = existing_file("acDesign", file_data.get("acDesign"))
+    if design_file and not design_file.endswith(".design"):
+        error(f"fileData.acDesign '{file_data['acDesign']}' is not a .design file")
+
+    if "logicFile" in file_data:
+        lua_file = existing_file("logicFile", file_data["logicFile"])
+        if lua_file:
+            logic_warnings = []
+            errors.extend(f"{fight_name}: {message}" for message in validate_logic_file(lua_file, logic_warnings))
+            warnings.extend(f"{fight_name}: {message}" for message in logic_warnings)
+    elif "logicId" not in fight_data:
+        error("Needs either fileData.logicFile or logicId")
+
+    for key in ["decalThumbnail", "rankIcon", "decalImage", "archetypeImage"]:
+        if key not in file_data:
+            continue
+        image_path = existing_file(key, file_data[key])
+        if image_path:
+            try:
+                with Image.open(image_path) as img:
+                    img.load()
+                    if img.width < 1 or img.height < 1:
+                        error(f"fileData.{key} '{file_data[key]}' is empty")
+            except Exception as e:
+                error(f"fileData.{key} '{file_data[key]}' could not be decoded: {e}")
+
+    if "customRankData" in fight_data:
+        rank_data = fight_data["customRankData"]
+        if not isinstance(rank_data, dict) or not isinstance(rank_data.get("text"), str):
+            error("customRankData needs a text")
+        else:
+            try:
+                ImageColor.getcolor(rank_data.get("color", ""), mode="RGB")
+            except ValueError:
+                error(f"customRankData color '{rank_data.get('color')}' is not a valid color")
+
+    for key in ["introAudioPaths", "outroAudioPaths"]:
+        audio_paths = file_data.get(key) or []
+        if not isinstance(audio_paths, list):
+            error(f"fileData.{key} should be a list")
+            continue
+        for index, relative_path in enumerate(audio_paths):
+            audio_path = existing_file(f"{key}[{index}]", relative_path)
+            if not audio_path:
+                continue
+            if not audio_path.lower().endswith(supported_audio_extensions):
+                warning(f"fileData.{key}[{index}] '{relative_path}' is not a supported audio format and will be skipped")
+                continue
+            try:
+                with sf.SoundFile(audio_path) as audio_file:
+                    audio_file.read(1024)
+            except Exception as e:
+                error(f"fileData.{key}[{index}] '{relative_path}' could not be decoded: {e}")
 
-    # Calculate the number of fights for each rank
-    fights_per_rank = [math.ceil(tier["percentage"] * total_fights / 100) for tier in rank_tiers]
+    return errors
 
-    # Ensure we have at least one fight per used rank
-    while sum(fights_per_rank) > total_fights:
-        fights_per_rank[-1] -= 1
-        if fights_per_rank[-1] == 0:
-            fights_per_rank.pop()
+def validate_logic_file(lua_file: str, warnings: List[str] = None) -> List[str]:
+    try:
+        with open_text_smart(lua_file) as file:
+            file.read()
+    except (ValueError, OSError) as e:
+        return [f"Could not read logic file '{os.path.basename(lua_file)}': {e}"]
+
+    # The build renames the logic id (the file name prefix) everywhere in the file
+    if not re.match(r"^\d+_", os.path.basename(lua_file)) and warnings is not None:
+        warnings.append(f"Logic file '{os.path.basename(lua_file)}' isn't named <logic id>_<name>.lua, its logic id won't be renamed")
+    return []
+
+def arena_param_fields(context: BuildContext) -> Optional[dict]:
+    """The ArenaParam fields by name, or None if the Paramdex isn't available (the build itself reports that)."""
+    try:
+        return context.paramdex.get(arena_param_type).fields
+    except FileNotFoundError:
+        return None
 
-    progress_signal.emit(0, f"Adding parameters for fight 1/{total_fights}")
-    for fight_index, subfolder_path in enumerate(fight_dirs):
+def validate_roster(context: BuildContext, max_workers: int = None):
+    """
+    Validates every fight in the roster concurrently, raising a BuildValidationError with all the problems found.
+    Warnings don't stop the build, they're only printed.
+    """
+    if not context.roster:
+        raise BuildValidationError(["No fights selected"])
+    fight_dirs = [os.path.join(context.paths["fights_directory"], fight) for fight in context.roster]
+    fight_warnings = [[] for _ in fight_dirs]
+    arena_fields = arena_param_fields(context)
+    with ThreadPoolExecutor(max_workers=max_workers or min(16, (os.cpu_count() or 1) * 2)) as executor:
+        errors = [error for fight_errors in executor.map(validate_fight, fight_dirs, fight_warnings, [arena_fields] * len(fight_dirs))
+                  for error in fight_errors]
+    for warning in (warning for warnings in fight_warnings for warning in warnings):
+        print(f"Warning - {warning}")
+    if errors:
+        raise BuildValidationError(errors)
+
+def prebuild_fight(context: BuildContext, fight_index: int):
+    """
+    Fills the artifact caches with what a build of the roster can reuse from one of its fights (validation, WEMs, the luabnd),
+    so the next compile_folder only has to link them in. The build daemon runs this when a fight changes on disk.
+    """
+    fight_dir = os.path.join(context.paths["fights_directory"], context.roster[fight_index])
+    errors = validate_fight(fight_dir, arena_fields=arena_param_fields(context))
+    if errors:
+        raise BuildValidationError(errors)
+
+    with open_text_smart(os.path.join(fight_dir, "data.json")) as file:
+        file_data = json.load(file)["fileData"]
+    for audio_key in ("introAudioPaths", "outroAudioPaths"):
+        for audio_path in file_data.get(audio_key) or []:
+            if audio_path.lower().endswith(supported_audio_extensions):
+                convert_to_wem(context, os.path.join(fight_dir, audio_path))
+    if "logicFile" in file_data:
+        # Same id compile_folder gives the fight at this roster position
+        build_logic_files(context, [(os.path.join(fight_dir, file_data["logicFile"]), starting_npc_chara_id + fight_index)])
+
+def compile_folder(context: BuildContext, progress_signal=None, stats_signal=None):
+    fight_order = context.roster
+    build_directory = context.paths['build_directory']
+    tpf_dir = os.path.join(build_directory, ui_tpf_path.replace(".", "-"))
+    sblytbnd_dir = os.path.join(build_directory, ui_sblytbnd_path.replace(".", "-"))
+    save_steps = [
+        ("regulation.bin", lambda: run_witchy(context, os.path.join(build_directory, "regulation-bin"))),
+        (f"msgbnds ({len(context.locales)} locales)", lambda: [job.result() for job in locale_jobs]),
+        ("asmparam.designbnd.dcx", lambda: run_witchy(context, os.path.join(build_directory, "param", "asmparam", "asmparam-designbnd-dcx"))),
+        ("01_common.tpf.dcx", lambda: run_witchy(context, tpf_dir)),
+        ("01_common.sblytbnd.dcx", lambda: run_witchy(context, sblytbnd_dir)),
+    ]
+    progress = BuildProgress(progress_signal, {
+        "validate": len(fight_order),
+        "prepare": 1,
+        "fights": len(fight_order),
+        "logic": 1,
+        "textures": 1,
+        "rank_icons": 1,
+        "save": len(save_steps),
+        "deploy": 1,
+    }, stats_signal, context.tool_stats, context.cancel_token)
+
+    # Catch broken fights before the previous build is wiped and anything expensive runs
+    progress.start_stage("validate", "Validating fights...")
+    validate_roster(context)
+    progress.advance("Validating fights...", units=len(fight_order))
+
+    checkpoint = BuildCheckpoint.load(context)
+    text_saved = checkpoint.is_done(f"save:{save_steps[1][0]}")
+
+    # Each locale's msgbnds are unpacked, patched and repacked on their own thread, alongside the rest of the build.
+    # Text is collected as (fmg name, ids, fight index, textData key, line index) and resolved per locale.
+    locale_executor = ThreadPoolExecutor(max_workers=len(context.locales))
+    try:
+        if checkpoint.is_done("fights"):
+            # The fights stage wrote everything it made to the mod directory, apart from what the later stages get from the checkpoint
+            print(f"Resuming the previous build in '{build_directory}'")
+            progress.skip_stage("prepare")
+            progress.skip_stage("fights")
+            fight_datas = [load_fight_data(context, fight) for fight in fight_order]
+            logic_jobs = [tuple(job) for job in checkpoint.data["logic_jobs"]]
+            text_entries = [tuple(entry) for entry in checkpoint.data["text_entries"]]
+            locale_fmgs = {} if text_saved else {locale: locale_executor.submit(load_locale_fmgs, context, locale) for locale in context.locales}
+        else:
+            progress.start_stage("prepare", "Preparing params...")
+            try:
+                shutil.rmtree(build_directory)
+                print(f"Directory '{build_directory}' and its contents have been deleted.")
+            except FileNotFoundError:
+                print(f"Directory '{build_directory}' does not exist.")
+            os.makedirs(build_directory, exist_ok=True)
+            context.game_data.prefetch(game_data_files + [os.path.join("msg", locale, bnd) for locale in context.locales for bnd in msgbnd_files])
+
+            locale_fmgs = {locale: locale_executor.submit(load_locale_fmgs, context, locale) for locale in context.locales}
+            fight_datas = [load_fight_data(context, fight) for fight in fight_order]
+            logic_jobs, text_entries = add_fights(context, progress, fight_datas)
+            checkpoint.mark_done("fights", logic_jobs=logic_jobs, text_entries=text_entries)
+
+        locale_jobs = [] if text_saved else [locale_executor.submit(save_locale_text, context, locale, locale_fmgs[locale], text_entries, fight_datas)
+                                             for locale in context.locales]
+
+        stages = [
+            ("logic", "Building logic files...", lambda: build_logic_files(context, logic_jobs)),
+            ("textures", "Unpacking textures...", lambda: add_decal_thumbnails(context, progress, fight_datas)),
+            ("rank_icons", "Adding custom rank icons...", lambda: add_rank_icons(context, fight_datas)),
+        ]
+        for stage, message, run_stage in stages:
+            if checkpoint.is_done(stage):
+                progress.skip_stage(stage)
+                continue
+            progress.start_stage(stage, message)
+            run_stage()
+            checkpoint.mark_done(stage)
+
+        # Repack everything
+        progress.start_stage("save", f"Saving {save_steps[0][0]}...")
+        for step_name, save_step in save_steps:
+            if not checkpoint.is_done(f"save:{step_name}"):
+                progress.advance(f"Saving {step_name}...", units=0)
+                save_step()
+                checkpoint.mark_done(f"save:{step_name}")
+            progress.advance(f"Saved {step_name}")
+    finally:
+        # Nothing keeps writing to the build directory once the build is over, failed or not
+        locale_executor.shutdown(wait=True, cancel_futures=True)
+
+    # Only a finished build reaches the mod directory ModEngine2 loads
+    progress.start_stage("deploy", "Deploying to the mod folder...")
+    files_written, bytes_written = deploy_build(context)
+    checkpoint.clear()
+    freed = trim_cache_folder(CACHE_FOLDER, CACHE_MAX_BYTES)
+    if freed:
+        print(f"Evicted {freed / (1024 * 1024):.1f} MB of old build artifacts from the cache")
+    progress.finish(f"Done! Deployed {files_written} changed files ({bytes_written / (1024 * 1024):.1f} MB)")
+
+def is_unpacked_dir(file_names: List[str]) -> bool:
+    """WitchyBND unpack folders and bnk2json soundbank folders, which only exist to be repacked."""
+    return "soundbank.json" in file_names or any(name.startswith("_witchy") and name.endswith(".xml") for name in file_names)
+
+def staged_files(build_directory: str) -> List[str]:
+    """The files of a build that belong in the mod directory, relative to the build directory."""
+    relative_paths = []
+    for root, dirs, files in os.walk(build_directory):
+        dirs[:] = [name for name in dirs if not is_unpacked_dir(os.listdir(os.path.join(root, name)))]
+        for file_name in files:
+            if not any(fnmatch.fnmatch(file_name, pattern) for pattern in deploy_excluded_files):
+                relative_paths.append(os.path.relpath(os.path.join(root, file_name), build_directory))
+    return sorted(relative_paths)
+
+def deployed_hash(path: str, record: list):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    # Untouched since the last deploy, no need to read it again
+    if record and record[0] == stat.st_size and record[1] == stat.st_mtime_ns:
+        return record[2]
+    return hash_file(path)
+
+def deploy_build(context: BuildContext) -> Tuple[int, int]:
+    """
+    Syncs a finished build into the mod directory, only writing the files whose content changed and removing the ones
+    the build no longer makes. Every file is replaced atomically, so ModEngine2 never sees a half-written one.
+    Returns the number of files and bytes written.
+    """
+    build_directory = context.paths["build_directory"]
+    mod_directory = context.paths["mod_directory"]
+    os.makedirs(mod_directory, exist_ok=True)
+    manifest_path = os.path.join(mod_directory, deploy_manifest_file_name)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as fp:
+            manifest = json.load(fp)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        manifest = {}
+
+    deployed = {}
+    files_written = 0
+    bytes_written = 0
+    for relative_path in staged_files(build_directory):
+        source = os.path.join(build_directory, relative_path)
+        destination = os.path.join(mod_directory, relative_path)
+        digest = hash_file(source)
+        if deployed_hash(destination, manifest.get(relative_path)) != digest:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            temp_path = f"{destination}.{os.getpid()}.tmp"
+            shutil.copyfile(source, temp_path)
+            os.replace(temp_path, destination)
+            files_written += 1
+            bytes_written += os.path.getsize(destination)
+        stat = os.stat(destination)
+        deployed[relative_path] = [stat.st_size, stat.st_mtime_ns, digest]
+
+    # Leftovers from older builds, including the intermediates builds used to leave in the mod directory
+    for root, _, files in os.walk(mod_directory, topdown=False):
+        for file_name in files:
+            relative_path = os.path.relpath(os.path.join(root, file_name), mod_directory)
+            if relative_path not in deployed and relative_path != deploy_manifest_file_name:
+                os.remove(os.path.join(root, file_name))
+        if root != mod_directory and not os.listdir(root):
+            os.rmdir(root)
+
+    temp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as fp:
+        json.dump(deployed, fp)
+    os.replace(temp_path, manifest_path)
+    print(f"Deployed {files_written} of {len(deployed)} files to '{mod_directory}', {bytes_written} bytes written")
+    return files_written, bytes_written
+
+def load_fight_data(context: BuildContext, fight: str) -> dict:
+    with open_text_smart(os.path.join(context.paths["fights_directory"], fight, "data.json")) as file:
+        return json.load(file)
+
+def add_fights(context: BuildContext, progress: BuildProgress, fight_datas: List[dict]):
+    """
+    Adds every fight's params, design, emblem, archetype and audio, then saves the params and the soundbank.
+    Returns the logic files to build as (lua_file, npc_chara_id) and the text to add as (fmg name, ids, fight index, textData key, line index).
+    """
+    arena_param = ParamFile(context, "ArenaParam", baseline_ac, "@charaInitParamId")
+    charinit_param = ParamFile(context, "CharaInitParam", baseline_ac)
+    npc_param = ParamFile(context, "NpcParam", baseline_ac)
+    account_param = ParamFile(context, "AccountParam", npc_param.base_data["@accountParamId"])
+    npcthink_param = ParamFile(context, "NpcThinkParam", baseline_ac)
+    talk_param = ParamFile(context, "TalkParam", 600000000 + int(npc_param.base_data["@accountParamId"]) * 1000 + 100)
+
+    npc_015_bnk = SoundbankEditor(context, os.path.join("sd", "enus", "npc015.bnk"))
+
+    logic_jobs = []
+    text_entries = []
+    total_fights = len(fight_datas)
+    progress.start_stage("fights", f"Adding parameters for fight 1/{total_fights}")
+    for fight_index, fight_data in enumerate(fight_datas):
+        subfolder_path = os.path.join(context.paths["fights_directory"], context.roster[fight_index])
         npc_chara_id = starting_npc_chara_id + fight_index
         arena_id = starting_arena_id + fight_index
         account_id = starting_account_id + fight_index * 10
 
-        # Load data.json as a dictionary
-        data_file = os.path.join(subfolder_path, "data.json")
-        with open_text_smart(data_file) as file:
-            fight_data = json.load(file)
-
         file_data = fight_data["fileData"]
         # Get the path to the .design file
         design_file = os.path.join(subfolder_path, file_data["acDesign"])
@@ -446,47 +1226,6 @@ def compile_folder(progress_signal=None):
         if "logicFile" in file_data:
             lua_file = os.path.join(subfolder_path, file_data["logicFile"])
 
-        if "decalThumbnail" in file_data:
-            decal_thumbnail_path = process_image(subfolder_path, file_data["decalThumbnail"], 128, 128)
-            if decal_thumbnail_path:
-                decal_thumbnail_paths[account_id] = decal_thumbnail_path
-
-        rank_data = None
-        rank_icon_path = None
-        # In your loop, replace the rank_data section with this:
-        if "rankIcon" in file_data:
-            rank_icon_path = process_image(subfolder_path, os.path.join(subfolder_path, file_data["rankIcon"]), 232, 128)
-        elif "customRankData" in fight_data:
-            rank_data = fight_data["customRankData"]
-        else:
-            # Calculate the rank number (1 is the highest rank)
-            rank_number = total_fights - fight_index
-            rank_letter = ""
-            rank_color = "#ffffff"
-            # Determine which rank tier this fight belongs to
-            cumulative_fights = 0
-            for i, fights in enumerate(fights_per_rank):
-                cumulative_fights += fights
-                if rank_number <= cumulative_fights:
-                    rank_letter = rank_tiers[i]["letter"]
-                    rank_color = rank_tiers[i]["color"]
-                    break
-            if rank_number < 10:
-                rank_number = f"0{rank_number}"
-            rank_data = {
-                "text": f"{rank_number}/{rank_letter}",
-                "color": rank_color
-            }
-
-        if rank_data:
-            rank_icon_img = generate_rank_image(rank_data["text"], rank_data["color"], os.path.join(resources_dir, "Jura-SemiBold.ttf"))
-            rank_icon_path = os.path.join(subfolder_path, f"{fight_index}_rank_icon.png")
-            rank_icon_img.save(rank_icon_path)
-            rank_icon_path = process_image(subfolder_path, rank_icon_path, 232, 128)
-            os.remove(os.path.join(subfolder_path, f"{fight_index}_rank_icon.png")) #Clean up
-
-        rank_icon_paths[starting_arena_rank - fight_index] = rank_icon_path
-
         default_arena_values = {
             "introCutsceneId": "230000",
             "outroCutsceneId": -1,
@@ -509,7 +1248,7 @@ def compile_folder(progress_signal=None):
                 new_fight[key] = value
 
         arena_param.add_param_entry(new_fight)
-        ranker_profile_fmg.add_text_fmg_entry(new_fight["@id"], fight_data["textData"]["arenaDescription"])
+        text_entries.append(("RankerProfile", new_fight["@id"], fight_index, "arenaDescription", None))
 
         # AccountParam
         new_account = {
@@ -519,8 +1258,8 @@ def compile_folder(progress_signal=None):
             "@menuDecalId": account_id
         }
         account_param.add_param_entry(new_account)
-        title_characters_fmg.add_text_fmg_entry([account_id, account_id + 2], fight_data["textData"]["acName"])
-        title_characters_fmg.add_text_fmg_entry([account_id + 1, account_id + 3], fight_data["textData"]["pilotName"])
+        text_entries.append(("TitleCharacters", [account_id, account_id + 2], fight_index, "acName", None))
+        text_entries.append(("TitleCharacters", [account_id + 1, account_id + 3], fight_index, "pilotName", None))
 
         # Intro and Outro text
         if "intro" in fight_data["textData"]:
@@ -533,7 +1272,7 @@ def compile_folder(progress_signal=None):
                     "@characterNameTextId": fight_data["textData"].get("characterNameTextId", "200")
                 }
                 talk_param.add_param_entry(new_talk)
-                talk_msg_fmg.add_text_fmg_entry(new_talk["@id"], fight_data["textData"]["intro"][i])
+                text_entries.append(("TalkMsg", new_talk["@id"], fight_index, "intro", i))
 
         if "outro" in fight_data["textData"]:
             for i in range(2):
@@ -545,7 +1284,7 @@ def compile_folder(progress_signal=None):
                     "@characterNameTextId": fight_data["textData"].get("characterNameTextId", "200")
                 }
                 talk_param.add_param_entry(new_talk)
-                talk_msg_fmg.add_text_fmg_entry(new_talk["@id"], fight_data["textData"]["outro"][i])
+                text_entries.append(("TalkMsg", new_talk["@id"], fight_index, "outro", i))
 
         # CharaInitParam
         new_charainit = {
@@ -572,202 +1311,348 @@ def compile_folder(progress_signal=None):
         npcthink_param.add_param_entry(new_npcthinkdata)
 
         # Design file
-        add_design_file(design_file, npc_chara_id)
+        add_design_file(context, design_file, npc_chara_id)
 
         # Emblem/archetype
-        process_emblem_archetype_images(subfolder_path, account_id, npc_chara_id, file_data)
+        process_emblem_archetype_images(context, subfolder_path, account_id, npc_chara_id, file_data)
 
-        # Logic file
+        # Logic file, built for the whole roster at once afterwards
         if lua_file:
-            os.makedirs(os.path.join(paths['mod_directory'], "script"), exist_ok=True)
-            if not os.path.exists(os.path.join(paths['mod_directory'], "script", "aicommon.luabnd.dcx")):
-                shutil.copy(os.path.join(resources_dir, "aicommon.luabnd.dcx"), os.path.join(paths['mod_directory'], "script"))
-            process_custom_logic_file(lua_file, npc_chara_id)
-
-        process_audio_files(subfolder_path, account_id, npc_015_bnk, file_data)
-        progress_signal.emit(math.floor(75 / len(fight_dirs) * (fight_index+1)), f"Adding parameters for fight {fight_index+2}/{total_fights}")
-
-    progress_signal.emit(75, "Unpacking textures...")
-    # Prep work for thumbnails and rank icons
-    sblytbnd_path = os.path.join("menu", "hi", "01_common.sblytbnd.dcx")
-    copy_file_from_game_folder_if_missing(sblytbnd_path)
-    sblytbnd_dir = os.path.join(paths['mod_directory'], sblytbnd_path.replace(".", "-"))
-    sblytbnd_path = os.path.join(paths['mod_directory'], sblytbnd_path)
-    run_witchy(sblytbnd_path)
-
-    tpf_path = os.path.join("menu", "hi", "01_common.tpf.dcx")
-    copy_file_from_game_folder_if_missing(tpf_path)
-    tpf_dir = os.path.join(paths['mod_directory'], tpf_path.replace(".", "-"))
-    tpf_path = os.path.join(paths['mod_directory'], tpf_path)
-    run_witchy(tpf_path)
+            logic_jobs.append((lua_file, npc_chara_id))
+
+        process_audio_files(context, subfolder_path, account_id, npc_015_bnk, file_data)
+        progress.advance(f"Adding parameters for fight {fight_index+2}/{total_fights}")
+
+    # Saved here rather than with the repacks, so nothing after this stage depends on in-memory state
+    progress.advance("Saving params and the soundbank...", units=0)
+    for param_file in (arena_param, charinit_param, npc_param, account_param, npcthink_param, talk_param):
+        param_file.save()
+    npc_015_bnk.save()
+    return logic_jobs, text_entries
+
+def decal_thumbnail_images(context: BuildContext, fight_datas: List[dict]) -> dict:
+    images = dict()
+    for fight_index, fight_data in enumerate(fight_datas):
+        file_data = fight_data["fileData"]
+        if "decalThumbnail" in file_data:
+            subfolder_path = os.path.join(context.paths["fights_directory"], context.roster[fight_index])
+            decal_thumbnail_image = load_ui_image(subfolder_path, file_data["decalThumbnail"], 128, 128)
+            if decal_thumbnail_image:
+                images[starting_account_id + fight_index * 10] = decal_thumbnail_image
+    return images
+
+def rank_icon_images(context: BuildContext, fight_datas: List[dict]) -> dict:
+    """Every fight's rank icon, by rank texture id: its own image, its customRankData, or the rank it gets from rank_tiers."""
+    total_fights = len(fight_datas)
+
+    # Calculate the number of fights for each rank
+    fights_per_rank = [math.ceil(tier["percentage"] * total_fights / 100) for tier in rank_tiers]
+
+    # Ensure we have at least one fight per used rank
+    while sum(fights_per_rank) > total_fights:
+        fights_per_rank[-1] -= 1
+        if fights_per_rank[-1] == 0:
+            fights_per_rank.pop()
+
+    images = dict()
+    for fight_index, fight_data in enumerate(fight_datas):
+        subfolder_path = os.path.join(context.paths["fights_directory"], context.roster[fight_index])
+        file_data = fight_data["fileData"]
+        rank_data = None
+        rank_icon_image = None
+        if "rankIcon" in file_data:
+            rank_icon_image = load_ui_image(subfolder_path, file_data["rankIcon"], 232, 128)
+        elif "customRankData" in fight_data:
+            rank_data = fight_data["customRankData"]
+        else:
+            # Calculate the rank number (1 is the highest rank)
+            rank_number = total_fights - fight_index
+            rank_letter = ""
+            rank_color = "#ffffff"
+            # Determine which rank tier this fight belongs to
+            cumulative_fights = 0
+            for i, fights in enumerate(fights_per_rank):
+                cumulative_fights += fights
+                if rank_number <= cumulative_fights:
+                    rank_letter = rank_tiers[i]["letter"]
+                    rank_color = rank_tiers[i]["color"]
+                    break
+            if rank_number < 10:
+                rank_number = f"0{rank_number}"
+            rank_data = {
+                "text": f"{rank_number}/{rank_letter}",
+                "color": rank_color
+            }
+
+        if rank_data:
+            rank_icon_image = generate_rank_image(rank_data["text"], rank_data["color"], os.path.join(context.paths["resources_dir"], "Jura-SemiBold.ttf"))
+
+        images[starting_arena_rank - fight_index] = rank_icon_image
+    return images
+
+def add_decal_thumbnails(context: BuildContext, progress: BuildProgress, fight_datas: List[dict]):
+    # Prep work for thumbnails and rank icons. Always unpacked from the untouched archives, which only get repacked at the very end
+    copy_file_from_game_folder_if_missing(context, ui_sblytbnd_path)
+    sblytbnd_dir = os.path.join(context.paths['build_directory'], ui_sblytbnd_path.replace(".", "-"))
+    run_witchy(context, os.path.join(context.paths['build_directory'], ui_sblytbnd_path))
+
+    copy_file_from_game_folder_if_missing(context, ui_tpf_path)
+    tpf_dir = os.path.join(context.paths['build_directory'], ui_tpf_path.replace(".", "-"))
+    run_witchy(context, os.path.join(context.paths['build_directory'], ui_tpf_path))
 
     old_witchy_content = open_text_smart(os.path.join(tpf_dir, "_witchy-tpf.xml")).read().replace("DCX_KRAK_MAX", "DCX_DFLT_11000_44_9_15")
     open(os.path.join(tpf_dir, "_witchy-tpf.xml"), "w", encoding="utf-8").write(old_witchy_content)
 
     # Decal thumbnail
-    if len(decal_thumbnail_paths.values()) > 0:
-        progress_signal.emit(80, "Adding decal thumbnails...")
-        combined_texture_sheet, combined_layout = create_texture_sheet(decal_thumbnail_paths, "SB_CustomDecalThumbnails", "SB_DecalThumbnails", 128, 128, "Decal_tmb", 8,
-                                                                       existing_texture_sheet=Image.open(os.path.join(tpf_dir, "SB_DecalThumbnails.dds")),
-                                                                       existing_layout=parse_xml_file(os.path.join(sblytbnd_dir, "SB_DecalThumbnails.layout")))
-
-        combined_texture_sheet.save(os.path.join(tpf_dir, "SB_DecalThumbnails.png"))
+    thumbnail_images = decal_thumbnail_images(context, fight_datas)
+    if len(thumbnail_images.values()) > 0:
+        progress.advance("Adding decal thumbnails...", units=0)
+        with Image.open(os.path.join(tpf_dir, "SB_DecalThumbnails.dds")) as existing_sheet:
+            combined_texture_sheet, combined_layout = create_texture_sheet(thumbnail_images, "SB_CustomDecalThumbnails", "SB_DecalThumbnails", 128, 128, "Decal_tmb", 8,
+                                                                           existing_texture_sheet=existing_sheet.convert("RGBA"),
+                                                                           existing_layout=parse_xml_file(os.path.join(sblytbnd_dir, "SB_DecalThumbnails.layout")))
 
-        subprocess.run([paths["texconv_path"], "-f", "BC7_UNORM", os.path.join(tpf_dir, "SB_DecalThumbnails.png"), "-o", tpf_dir, "-y"], check=True)
+        tpf_format = write_ui_texture(combined_texture_sheet, os.path.join(tpf_dir, "SB_DecalThumbnails.dds"))
+        add_to_witchy_xml(tpf_dir, ["SB_DecalThumbnails.dds"], tpf_format=tpf_format)
 
         with open(os.path.join(sblytbnd_dir, "SB_DecalThumbnails.layout"), "w", encoding="utf-8") as fp:
             fp.write(xmltodict.unparse(combined_layout, pretty=True))
-        for path in decal_thumbnail_paths.values():
-            os.remove(path)
 
-    # Rank icons
-    if len(rank_icon_paths.values()) > 0:
-        progress_signal.emit(85, "Adding custom rank icons...")
-        new_rank_sheet, rank_layout = create_texture_sheet(rank_icon_paths, "SB_CustomArenaRank", "SB_ArenaRank", 232, 128, "CustomArenaRank", 5)
-        new_rank_sheet.save(os.path.join(tpf_dir, "SB_CustomArenaRank.png"))
-        subprocess.run([paths["texconv_path"], "-f", "BC7_UNORM", os.path.join(tpf_dir, "SB_CustomArenaRank.png"), "-o", tpf_dir, "-y"], check=True)
+def add_rank_icons(context: BuildContext, fight_datas: List[dict]):
+    tpf_dir = os.path.join(context.paths['build_directory'], ui_tpf_path.replace(".", "-"))
+    sblytbnd_dir = os.path.join(context.paths['build_directory'], ui_sblytbnd_path.replace(".", "-"))
+    rank_images = rank_icon_images(context, fight_datas)
+    if len(rank_images.values()) > 0:
+        new_rank_sheet, rank_layout = create_texture_sheet(rank_images, "SB_CustomArenaRank", "SB_ArenaRank", 232, 128, "CustomArenaRank", 5)
+        tpf_format = write_ui_texture(new_rank_sheet, os.path.join(tpf_dir, "SB_CustomArenaRank.dds"))
 
         layout_path = os.path.join(sblytbnd_dir, "SB_CustomArenaRank.layout")
         with open(layout_path, "w", encoding="utf-8") as fp:
             fp.write(xmltodict.unparse(rank_layout, pretty=True))
 
         add_to_witchy_xml(sblytbnd_dir, ["SB_CustomArenaRank.layout"])
-        add_to_witchy_xml(tpf_dir, ["SB_CustomArenaRank.dds"])
+        add_to_witchy_xml(tpf_dir, ["SB_CustomArenaRank.dds"], tpf_format=tpf_format)
 
-        # GFX wizardry
+        # GFX wizardry, always on fresh copies so a resumed build doesn't patch them twice
         gfx_files = ["01_texteffect_hi.gfx", "02_acarena_preparing.gfx", "02_acarena_select.gfx", "02_npcarenaresult.gfx"]
         for gfx_file in gfx_files:
-            copy_file_from_game_folder_if_missing(os.path.join("menu", gfx_file))
-            process_gfx_file(os.path.join(paths['mod_directory'], "menu", gfx_file), layout_path)
-
-        for path in rank_icon_paths.values():
-            os.remove(path)
-    progress_signal.emit(95, "Saving...")
-    # Save params
-    arena_param.save()
-    charinit_param.save()
-    npc_param.save()
-    account_param.save()
-    npcthink_param.save()
-    talk_param.save()
-    run_witchy(os.path.join(paths['mod_directory'], "regulation-bin"))
-
-    # Save FMGs
-    menu_text_fmg.save()
-    ranker_profile_fmg.save()
-    title_characters_fmg.save()
-    talk_msg_fmg.save()
-    npc_015_bnk.save()
-    run_witchy(os.path.join(paths['mod_directory'], "msg", "engus", "item-msgbnd-dcx"))
-    run_witchy(os.path.join(paths['mod_directory'], "msg", "engus", "menu-msgbnd-dcx"))
-    run_witchy(os.path.join(paths['mod_directory'], "param", "asmparam", "asmparam-designbnd-dcx"))
-    run_witchy(tpf_dir)
-    run_witchy(sblytbnd_dir)
-    progress_signal.emit(100, "Done!")
-
-def process_emblem_archetype_images(subfolder_path, account_id, npc_chara_id, file_data):
-    copy_file_from_game_folder_if_missing(os.path.join("menu", "hi", "00_solo.tpfbhd"))
-    if copy_file_from_game_folder_if_missing(os.path.join("menu", "hi", "00_solo.tpfbdt")):
-        run_witchy(os.path.join(paths['mod_directory'], "menu", "hi", "00_solo.tpfbdt"))
-    solo_dir = os.path.join(paths['mod_directory'], "menu", "hi", "00_solo-tpfbdt")
+            gfx_path = os.path.join(context.paths['build_directory'], "menu", gfx_file)
+            context.game_data.copy_to(os.path.join("menu", gfx_file), gfx_path)
+            process_gfx_file(context, gfx_path, layout_path)
+
+def fight_text(fight_data: dict, locale: str, key: str, index: int = None):
+    """A textData value for a locale: the fight's localizedTextData override if it has one, the English text otherwise."""
+    localized_text_data = fight_data.get("localizedTextData", {}).get(locale, {})
+    value = localized_text_data[key] if key in localized_text_data else fight_data["textData"][key]
+    return value[index] if index is not None else value
+
+def load_locale_fmgs(context: BuildContext, locale: str) -> dict:
+    fmgs = {fmg_name: FMGFile(context, fmg_name, locale) for fmg_name in en_jp_fmg_filenames}
+    fmgs["MenuText"].add_text_fmg_entry([258010 + menu_category], "CUSTOM ARENA")
+    return fmgs
+
+def save_locale_text(context: BuildContext, locale: str, fmgs_job, text_entries: List[tuple], fight_datas: List[dict]):
+    fmgs = fmgs_job.result()
+    for fmg_name, id_list, fight_index, key, index in text_entries:
+        fmgs[fmg_name].add_text_fmg_entry(id_list, fight_text(fight_datas[fight_index], locale, key, index))
+    for fmg in fmgs.values():
+        fmg.save()
+    msg_dir = os.path.join(context.paths['build_directory'], "msg", locale)
+    run_witchy(context, [os.path.join(msg_dir, bnd.replace(".", "-")) for bnd in msgbnd_files])
+
+def process_emblem_archetype_images(context: BuildContext, subfolder_path, account_id, npc_chara_id, file_data):
+    copy_file_from_game_folder_if_missing(context, os.path.join("menu", "hi", "00_solo.tpfbhd"))
+    if copy_file_from_game_folder_if_missing(context, os.path.join("menu", "hi", "00_solo.tpfbdt")):
+        run_witchy(context, os.path.join(context.paths['build_directory'], "menu", "hi", "00_solo.tpfbdt"))
+    solo_dir = os.path.join(context.paths['build_directory'], "menu", "hi", "00_solo-tpfbdt")
 
     image_paths = []
 
-    decal_image_path = process_image(subfolder_path, file_data.get("decalImage"), 1024, 1024)
+    decal_image_path = process_image(context, subfolder_path, file_data.get("decalImage"), 1024, 1024)
     if decal_image_path:
-        image_paths.append(decal_image_path)
+        image_paths.append(("Decal", decal_image_path))
 
-    archetype_image_path = process_image(subfolder_path, file_data.get("archetypeImage"), 2048, 893, pad_y=131)
+    archetype_image_path = process_image(context, subfolder_path, file_data.get("archetypeImage"), 2048, 893, pad_y=131)
     if archetype_image_path:
-        image_paths.append(archetype_image_path)
+        image_paths.append(("Archetype", archetype_image_path))
 
 
-    for image_path in image_paths:
-        image_type = "Decal" if image_path == file_data.get("decalImage") else "Archetype"
+    for image_type, image_path in image_paths:
         image_id = str(account_id) if image_type == "Decal" else str(npc_chara_id)
         image_id = image_id.zfill(8)
 
 
-        image_dir = os.path.join(solo_dir, f"MENU_{image_type}_{image_id}-tpf-dcx")
-        os.makedirs(image_dir, exist_ok=True)
-        shutil.copy(image_path, os.path.join(image_dir, f"MENU_{image_type}_{image_id}.dds"))
-
-        tpf_dict = generate_single_tpf_xml(f"MENU_{image_type}_{image_id}")
-        tpf_xml = xmltodict.unparse(tpf_dict, pretty=True)
-        with open(os.path.join(image_dir, "_witchy-tpf.xml"), 'w', encoding="utf-8") as file:
-            file.write(tpf_xml)
-
-        run_witchy(image_dir)
+        with open(image_path, "rb") as file:
+            dds_data = file.read()
+        with open(os.path.join(solo_dir, f"MENU_{image_type}_{image_id}.tpf.dcx"), "wb") as file:
+            file.write(generate_single_tpf(f"MENU_{image_type}_{image_id}", dds_data))
         add_to_witchy_xml(solo_dir, [f"MENU_{image_type}_{image_id}.tpf.dcx"])
-        os.remove(image_path)
-    run_witchy(solo_dir)
-
-def process_custom_logic_file(lua_file, npc_chara_id):
-    current_id = os.path.basename(lua_file).split("_")[0]
-    luabnd_dir = os.path.join(paths['mod_directory'], "script", f"{npc_chara_id}_logic-luabnd-dcx")
-    lua_file_dest = os.path.join(luabnd_dir, f"{npc_chara_id}_logic.lua")
-    os.makedirs(luabnd_dir, exist_ok=True)
-    shutil.copy(lua_file, os.path.join(luabnd_dir, f"{npc_chara_id}_logic.lua"))
-
-    curr_lua_content = open_text_smart(lua_file_dest).read()
-    curr_lua_content = curr_lua_content.replace(current_id, str(npc_chara_id))
-    open(lua_file_dest, "w", encoding="utf-8").write(curr_lua_content)
-
-    luagnl_dict = generate_luagnl(npc_chara_id)
-    with open(os.path.join(luabnd_dir, f"{npc_chara_id}_logic.luagnl.xml"), 'w', encoding="utf-8") as file:
-        file.write(xmltodict.unparse(luagnl_dict, pretty=True))
-    run_witchy(os.path.join(luabnd_dir, f"{npc_chara_id}_logic.luagnl.xml"))
-
-    bnd_dict = generate_lua_bnd_xml(npc_chara_id)
-    with open(os.path.join(luabnd_dir, "_witchy-bnd4.xml"), 'w', encoding="utf-8") as file:
-        file.write(xmltodict.unparse(bnd_dict, pretty=True))
-    run_witchy(luabnd_dir)
-
-def convert_to_wem(input_file):
-    # Get the directory and filename without extension
-    input_dir, input_filename = os.path.split(input_file)
-    filename_without_ext = os.path.splitext(input_filename)[0]
-
-    # Create a temporary WAV file name
-    temp_wav = os.path.join(input_dir, f"{filename_without_ext}_temp.wav")
-
-    try:
-        # Read the audio file
-        data, samplerate = sf.read(input_file)
+    run_witchy(context, solo_dir)
+
+def build_logic_files(context: BuildContext, logic_jobs: List[tuple], max_workers: int = 4):
+    """
+    Builds a luabnd for every (lua_file, npc_chara_id) pair, reusing the ones already built by earlier builds.
+    Fights sharing a logic file only read it once, and the luabnds are packed natively on a few threads.
+    """
+    if not logic_jobs:
+        return
+    script_dir = os.path.join(context.paths['build_directory'], "script")
+    os.makedirs(script_dir, exist_ok=True)
+    if not os.path.exists(os.path.join(script_dir, "aicommon.luabnd.dcx")):
+        shutil.copy(os.path.join(context.paths["resources_dir"], "aicommon.luabnd.dcx"), script_dir)
+
+    luabnd_cache = ArtifactCache("luabnd", CACHE_FOLDER)
+    jobs_by_lua = {}
+    for lua_file, npc_chara_id in logic_jobs:
+        jobs_by_lua.setdefault(hash_file(lua_file), (lua_file, []))[1].append(npc_chara_id)
+
+    pending = []
+    for lua_hash, (lua_file, npc_chara_ids) in jobs_by_lua.items():
+        lua_content = None
+        for npc_chara_id in npc_chara_ids:
+            cache_key = luabnd_cache.key(lua_hash, npc_chara_id, luabnd_format_version)
+            luabnd_path = os.path.join(script_dir, f"{npc_chara_id}_logic.luabnd.dcx")
+            cached_luabnd = luabnd_cache.get(cache_key, ".luabnd.dcx")
+            if cached_luabnd:
+                link_or_copy(cached_luabnd, luabnd_path)
+                continue
+            if lua_content is None:
+                with open_text_smart(lua_file) as file:
+                    lua_content = file.read()
+            current_id = os.path.basename(lua_file).split("_")[0]
+            pending.append((cache_key, lua_content.replace(current_id, str(npc_chara_id)), npc_chara_id, luabnd_path))
+
+    if not pending:
+        print(f"Reused all {len(logic_jobs)} cached logic files")
+        return
 
-        # Convert to stereo if mono
-        if len(data.shape) == 1 or data.shape[1] == 1:
-            print(f"Converting {input_file} from mono to stereo")
-            stereo_data = numpy.column_stack((data, data))
-        else:
-            print(f"{input_file} is already in stereo")
-            stereo_data = data
+    def pack(job):
+        cache_key, lua_content, npc_chara_id, luabnd_path = job
+        with open(luabnd_path, "wb") as file:
+            file.write(generate_luabnd(lua_content, npc_chara_id))
+        luabnd_cache.put(cache_key, ".luabnd.dcx", luabnd_path)
+
+    # zlib releases the GIL, so the compression actually runs in parallel
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+        for _ in executor.map(pack, pending):
+            pass
+
+def convert_to_wem(context: BuildContext, input_file, normalize=False):
+    # Identical clips (shared voicelines etc) only get converted once
+    peak_dbfs = wem_peak_dbfs if normalize else None
+    audio_cache = ArtifactCache("audio", CACHE_FOLDER)
+    cache_key = audio_cache.key(hash_file(input_file), "wem", wem_sample_rate, peak_dbfs, "sinc",
+                                context.tool_fingerprint("wem_converter", "wem_converter"))
+    cached_wem = audio_cache.get(cache_key, ".wem")
+    if cached_wem:
+        print(f"Reusing converted WEM file for {input_file}")
+        return cached_wem
+
+    # The converter writes test.wem to its working directory, so each conversion gets its own
+    # The preprocessed 16 bit stereo wav, plus about as much again for the converter's output
+    duration = sf.info(input_file).duration
+    work_dir = context.scratch_dir("wem-", int(duration * wem_sample_rate * 2 * 2 * 2))
+    filename_without_ext = os.path.splitext(os.path.basename(input_file))[0]
+    temp_wav = os.path.join(work_dir, f"{filename_without_ext}_temp.wav")
 
-        # Write the stereo data to the temporary WAV file
-        sf.write(temp_wav, stereo_data, samplerate)
+    try:
+        preprocess_audio(input_file, temp_wav, peak_dbfs=peak_dbfs)
 
         # Run the WEM converter executable
-        subprocess.run([paths["wem_converter"], temp_wav], check=True)
+        run_tool(context, [context.paths["wem_converter"], temp_wav], check=True, cwd=work_dir)
+        temp_wem = os.path.join(work_dir, "test.wem")
 
-        # The output will be temp.wem in the same directory as the executable
-        temp_wem = os.path.join(os.getcwd(), "test.wem")
-
-        # Create the final WEM filename
-        final_wem = os.path.join(input_dir, f"{filename_without_ext}.wem")
-
-        # Move and rename the temp.wem file
-        shutil.move(temp_wem, final_wem)
+        # Move it into the cache
+        final_wem = audio_cache.put(cache_key, ".wem", temp_wem, move=True)
 
         print(f"Created WEM file: {final_wem}")
         return final_wem
 
     finally:
-        # Clean up the temporary WAV file if it was created
-        if os.path.exists(temp_wav):
-            os.remove(temp_wav)
-            print(f"Cleaned up temporary file: {temp_wav}")
-
-def process_audio_files(subfolder_path, account_id, soundbnk, file_data):
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def resample_blocks(blocks, source_rate, target_rate, zero_crossings=resample_zero_crossings):
+    """
+    Resamples a stream of (frames, channels) blocks with a polyphase Kaiser windowed-sinc filter, yielding the output in blocks.
+    When downsampling, the filter's cutoff drops below the target's Nyquist frequency, so nothing above it aliases back.
+    Only the last few source frames are kept between blocks, so memory use doesn't depend on the stream's length.
+    """
+    # Output frame n sits at source position n * step / phases: a whole frame plus one of `phases` fractions
+    divisor = math.gcd(source_rate, target_rate)
+    step, phases = source_rate // divisor, target_rate // divisor
+    cutoff = min(1.0, target_rate / source_rate) * resample_rolloff
+    half_width = int(math.ceil(zero_crossings / cutoff))
+    offsets = numpy.arange(1 - half_width, half_width + 1)
+    distance = offsets[None, :] - (numpy.arange(phases) / phases)[:, None]
+    window = numpy.i0(resample_kaiser_beta * numpy.sqrt(numpy.clip(1 - (distance / half_width) ** 2, 0, None))) / numpy.i0(resample_kaiser_beta)
+    kernels = (cutoff * numpy.sinc(cutoff * distance) * window).astype(numpy.float32)
+
+    def render(frames, frames_start, first_output, end_output):
+        base, phase = numpy.divmod(numpy.arange(first_output, end_output, dtype=numpy.int64) * step, phases)
+        output = numpy.zeros((len(base), frames.shape[1]), dtype=numpy.float32)
+        for index, offset in enumerate(offsets):
+            output += frames[base + offset - frames_start] * kernels[phase, index][:, None]
+        return output
+
+    # The source is treated as silent before its first frame and after its last one
+    frames = None
+    frames_start = -half_width
+    total_frames = 0
+    next_output = 0
+    for block in blocks:
+        if frames is None:
+            frames = numpy.zeros((half_width, block.shape[1]), dtype=numpy.float32)
+        frames = numpy.concatenate((frames, block))
+        total_frames += len(block)
+        # An output frame can be rendered once every source frame its kernel covers has been read
+        end_output = max(next_output, -(-(frames_start + len(frames) - half_width) * phases // step))
+        if end_output > next_output:
+            yield render(frames, frames_start, next_output, end_output)
+            next_output = end_output
+        drop = max(0, next_output * step // phases - half_width + 1 - frames_start)
+        frames = frames[drop:]
+        frames_start += drop
+
+    if frames is None:
+        return
+    frames = numpy.concatenate((frames, numpy.zeros((half_width + 1, frames.shape[1]), dtype=numpy.float32)))
+    end_output = -(-total_frames * phases // step)
+    if end_output > next_output:
+        yield render(frames, frames_start, next_output, end_output)
+
+def preprocess_audio(input_file, output_wav, target_rate=None, peak_dbfs=None, block_frames=audio_block_frames):
+    """
+    Prepares a clip for the WEM converter: stereo, resampled to the game's rate and, if peak_dbfs is given, peak normalized.
+    Works block by block (with an extra pass to find the peak when normalizing), so memory use doesn't depend on the clip's length.
+    """
+    target_rate = target_rate if target_rate else wem_sample_rate
+
+    info = sf.info(input_file)
+    source_rate = info.samplerate
+    output_channels = 2 if info.channels == 1 else info.channels
+    if info.channels == 1:
+        print(f"Converting {input_file} from mono to stereo")
+
+    gain = 1.0
+    if peak_dbfs is not None:
+        peak = 0.0
+        for block in sf.blocks(input_file, blocksize=block_frames, dtype="float32", always_2d=True):
+            if len(block):
+                peak = max(peak, float(numpy.abs(block).max()))
+        # Measured on the source, the resampler's ringing can overshoot it very slightly and gets clipped below
+        gain = 10 ** (peak_dbfs / 20) / peak if peak > 1e-4 else 1.0
+
+    blocks = (block for block in sf.blocks(input_file, blocksize=block_frames, dtype="float32", always_2d=True) if len(block))
+    if source_rate != target_rate:
+        blocks = resample_blocks(blocks, source_rate, target_rate)
+    with sf.SoundFile(output_wav, "w", samplerate=target_rate, channels=output_channels, subtype="PCM_16") as output:
+        for block in blocks:
+            block = numpy.clip(block * gain, -1.0, 1.0)
+            if info.channels == 1:
+                block = numpy.repeat(block, 2, axis=1)
+            output.write(block)
+
+def process_audio_files(context: BuildContext, subfolder_path, account_id, soundbnk, file_data):
     intro_audio_paths = file_data.get("introAudioPaths")
     if intro_audio_paths:
         intro_audio_paths = [os.path.join(subfolder_path, x) for x in intro_audio_paths]
@@ -782,27 +1667,32 @@ def process_audio_files(subfolder_path, account_id, soundbnk, file_data):
         for filepath in audio_file_list:
 
             filename = os.path.basename(filepath)
-            if filename.lower().endswith((".wav", ".mp3", ".ogg", ".flac")):
-                wem_file = convert_to_wem(filepath)
+            if filename.lower().endswith(supported_audio_extensions):
+                wem_file = convert_to_wem(context, filepath, normalize=bool(file_data.get("normalizeAudio")))
                 offset = audio_file_list.index(filepath)
                 talk_id = 600000000 + int(account_id) * 1000 + 100 + offset if audio_file_list == intro_audio_paths else 700000000 + int(account_id) * 1000 + offset
 
-                new_wem_filename = str(get_hash(f"Source_v{talk_id}")) + ".wem"
+                new_wem_filename = str(get_hash(context, f"Source_v{talk_id}")) + ".wem"
                 new_wem_filepath = os.path.join(soundbnk.soundbank_dir, new_wem_filename)
                 os.makedirs(os.path.dirname(new_wem_filepath), exist_ok=True)
 
                 if os.path.exists(new_wem_filepath):
                     print(f"Warning - overwriting existing file {new_wem_filename}.")
-                shutil.move(wem_file, new_wem_filepath)
+                    # May be a hardlink into the soundbank cache, so replace it rather than writing through it
+                    os.remove(new_wem_filepath)
+                shutil.copyfile(wem_file, new_wem_filepath)
 
                 soundbnk.add_event(talk_id, is_play=True, sound_filename=new_wem_filename)
                 soundbnk.add_event(talk_id, is_play=False, sound_filename=new_wem_filename)
 
-def get_hash(input_text):
-    command = [os.path.join(paths["rewwise_path"], "fnv-hash.exe"), "--input", input_text]
+def get_hash(context: BuildContext, input_text):
+    return context.memo.get(("fnv", input_text), lambda: run_fnv_hash(context, input_text))
+
+def run_fnv_hash(context: BuildContext, input_text):
+    command = [context.paths["fnv_hash_path"], "--input", input_text]
 
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        result = run_tool(context, command, capture_output=True, text=True, check=True)
         return int(result.stdout.strip())
     except subprocess.CalledProcessError as e:
         print(f"Error running the command: {e}")
@@ -844,9 +1734,7 @@ def modify_sprite_tag(sprite_tag, images_by_rank, arena_rank_00000d_id):
                     sprite_tag['subTags']['item'].insert(index, xmltodict.parse(place_object3_tag)['item'])
 
             frame_count += 1
-def process_gfx_file(gfx_file, layout_file):
-    xml_file = os.path.splitext(gfx_file)[0] + '.xml'
-    subprocess.run([paths["ffdec_path"], '-swf2xml', gfx_file, xml_file], check=True)
+def process_gfx_file(context: BuildContext, gfx_file, layout_file):
     layout_data = parse_xml_file(layout_file)
 
     rank_image_files = []
@@ -860,6 +1748,17 @@ def process_gfx_file(gfx_file, layout_file):
         if id_match:
             id_value = int(id_match.group(1))
             rank_image_files.append({"filename": filename, "rankID": id_value})
+
+    # Patch the tags directly, only going through JPEXS' XML export if the file has something the native patcher doesn't understand
+    try:
+        swf.add_rank_images(gfx_file, rank_image_files)
+    except swf.SwfFormatError as e:
+        print(f"Could not patch {os.path.basename(gfx_file)} natively ({e}), falling back to JPEXS")
+        process_gfx_file_ffdec(context, gfx_file, rank_image_files)
+
+def process_gfx_file_ffdec(context: BuildContext, gfx_file, rank_image_files):
+    xml_file = os.path.splitext(gfx_file)[0] + '.xml'
+    run_tool(context, [context.paths["ffdec_path"], '-swf2xml', gfx_file, xml_file], check=True)
     gfx_data = parse_xml_file(xml_file)
 
     highest_character_id = max([int(item['@characterID']) for item in gfx_data['swf']["tags"]["item"] if '@characterID' in item])
@@ -904,11 +1803,11 @@ def process_gfx_file(gfx_file, layout_file):
     with open(edited_xml_file, 'w', encoding="utf-8") as file:
         file.write(xmltodict.unparse(gfx_data, pretty=True))
 
-    subprocess.run([paths["ffdec_path"], '-xml2swf', edited_xml_file, gfx_file], check=True)
+    run_tool(context, [context.paths["ffdec_path"], '-xml2swf', edited_xml_file, gfx_file], check=True)
     os.remove(xml_file)
     os.remove(edited_xml_file)
-def create_texture_sheet(image_files: dict, texture_atlas_name, root_texture_atlas_name, subtexture_width, subtexture_height, prefix, id_length: int, gap_size=2, existing_texture_sheet=None, existing_layout=None):
-    num_images = len(image_files.values())
+def create_texture_sheet(images: dict, texture_atlas_name, root_texture_atlas_name, subtexture_width, subtexture_height, prefix, id_length: int, gap_size=2, existing_texture_sheet=None, existing_layout=None):
+    num_images = len(images.values())
     square_size = math.ceil(math.sqrt(num_images))
     num_rows = math.ceil(num_images / square_size)
     num_columns = math.ceil(num_images / num_rows)
@@ -923,12 +1822,11 @@ def create_texture_sheet(image_files: dict, texture_atlas_name, root_texture_atl
         texture_sheet = existing_texture_sheet.copy()
         subtextures = existing_layout["TextureAtlas"]["SubTexture"]
 
-    for index, item in enumerate(image_files.items()):
-        image_index, image_file = item
-        image = Image.open(image_file)
+    for index, item in enumerate(images.items()):
+        image_index, image = item
 
         if image.size != (subtexture_width, subtexture_height):
-            raise ValueError(f"Image {image_file} has incorrect dimensions. Expected {subtexture_width}x{subtexture_height}, got {image.size}")
+            raise ValueError(f"Image {image_index} has incorrect dimensions. Expected {subtexture_width}x{subtexture_height}, got {image.size}")
 
         if existing_texture_sheet is None:
             row = index // num_columns
@@ -968,71 +1866,17 @@ def create_texture_sheet(image_files: dict, texture_atlas_name, root_texture_atl
     }
 
     return adjusted_texture_sheet, texture_atlas
-def generate_single_tpf_xml(filename):
-    tpf_dict = {
-        'tpf': {
-            'filename': f'{filename}.tpf.dcx',
-            'compression': 'DCX_KRAK_MAX',
-            'encoding': '0x01',
-            'flag2': '0x03',
-            'platform': 'PC',
-            'textures': {
-                'texture': {
-                    'name': f'{filename}.dds',
-                    'format': '102',
-                    'flags1': '0x00'
-                }
-            }
-        }
-    }
-    return tpf_dict
-def generate_luagnl(logic_id):
-    luagnl_dict = {
-        "luagnl": {
-            "filename": f"{logic_id}_logic.luagnl",
-            "bigendian": False,
-            "longformat": True,
-            "globals": {
-                "global": [
-                    f'LogicInitialSetup_{logic_id}',
-                    f'InterruptCallBack_{logic_id}'
-                ]
-            }
-        }
-    }
-
-    return luagnl_dict
-def generate_lua_bnd_xml(logic_id):
-    bnd4_dict = {
-        'bnd4': {
-            'filename': f'{logic_id}_logic.luabnd.dcx',
-            'compression': 'DCX_KRAK_MAX',
-            'version': '07D7R6',
-            'format': 'IDs, Names1, Names2, Compression',
-            'bigendian': 'False',
-            'bitbigendian': 'False',
-            'unicode': 'True',
-            'extended': '0x04',
-            'unk04': 'False',
-            'unk05': 'False',
-            'root': f'W:\\FNR\\data\\Target\\INTERROOT_win64\\script\\ai\\out\\each\\{logic_id}_logic',
-            'files': {
-                'file': [
-                    {
-                        'flags': 'Flag1',
-                        'id': '1000',
-                        'path': f'{logic_id}_logic.lua'
-                    },
-                    {
-                        'flags': 'Flag1',
-                        'id': '1000000',
-                        'path': f'{logic_id}_logic.luagnl'
-                    }
-                ]
-            }
-        }
-    }
-    return bnd4_dict
+def generate_single_tpf(filename, dds_data: bytes) -> bytes:
+    return souls.dcx_dflt(souls.tpf([(filename, 102, 0x00, dds_data)]))
+def generate_luagnl(logic_id) -> bytes:
+    return souls.luagnl([f'LogicInitialSetup_{logic_id}', f'InterruptCallBack_{logic_id}'])
+def generate_luabnd(lua_content: str, logic_id) -> bytes:
+    root = f'W:\\FNR\\data\\Target\\INTERROOT_win64\\script\\ai\\out\\each\\{logic_id}_logic'
+    bnd4_data = souls.bnd4([
+        (1000, f'{root}\\{logic_id}_logic.lua', lua_content.encode("utf-8")),
+        (1000000, f'{root}\\{logic_id}_logic.luagnl', generate_luagnl(logic_id)),
+    ])
+    return souls.dcx_dflt(bnd4_data)
 
 def run_exe_shell_hack(exe_path:str, args=None):
     if not args:
@@ -1064,38 +1908,55 @@ def run_exe_shell_hack(exe_path:str, args=None):
         if error.stderr:
                 print(f"stderr: {error.stderr.decode()}")
 
-def run_witchy(path:str, recursive:bool=False):
+def run_tool(context: BuildContext, args: list, check: bool = False, capture_output: bool = False, text: bool = False, **kwargs):
+    """subprocess.run for the build's tools, which a cancelled build kills instead of waiting for."""
+    context.cancel_token.check()
+    with context.tool_stats_lock:
+        context.tool_stats["calls"] += 1
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    process = subprocess.Popen(args, text=text, **kwargs)
+    context.cancel_token.register(process)
+    try:
+        stdout, stderr = process.communicate()
+    except BaseException:
+        kill_process(process)
+        raise
+    finally:
+        context.cancel_token.unregister(process)
+    # A killed tool fails, which should read as the cancellation rather than a tool error
+    context.cancel_token.check()
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+def kill_process(process: subprocess.Popen):
+    if process.poll() is not None:
+        return
+    if os.name == "nt":
+        # ffdec is a batch file running java, only killing the whole tree gets rid of it
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        process.kill()
+
+def run_witchy(context: BuildContext, path: Union[str, List[str]], recursive:bool=False):
     #args = ["-p", f"\"{path}\""]
-    args = [paths["witchybnd_path"], "-s", path]
+    # WitchyBND takes any number of paths, passing several saves a launch per path
+    args = [context.paths["witchybnd_path"], "-s"] + (path if isinstance(path, list) else [path])
     if recursive:
         args.insert(2, "-c")
-    subprocess.run(args, check=True, capture_output=True, text=True)
-    #run_exe_shell_hack(paths["witchybnd_path"], args)
+    run_tool(context, args, check=True, capture_output=True, text=True)
+    #run_exe_shell_hack(context.paths["witchybnd_path"], args)
 
 
-def copy_file_from_game_folder_if_missing(relative_file_path: str) -> bool:
-    game_data_dir = os.path.join(ARENA_MAKER_DATA_FOLDER, "game_data")
-
-    if not os.path.exists(game_data_dir):
-        # Check if game_data.zip exists in the resources directory
-        game_data_zip = os.path.join(ARENA_MAKER_DATA_FOLDER, "game_data.zip")
-        if os.path.exists(game_data_zip):
-            # Extract game_data.zip to the resources directory
-            with zipfile.ZipFile(game_data_zip, 'r') as zip_ref:
-                zip_ref.extractall(ARENA_MAKER_DATA_FOLDER)
-        else:
-            raise FileNotFoundError(f"Neither 'game_data' folder nor 'game_data.zip' found in the {ARENA_MAKER_DATA_FOLDER} directory.")
-
-    source_file = os.path.join(game_data_dir, relative_file_path)
-    destination_file = os.path.join(paths['mod_directory'], relative_file_path)
-    os.makedirs(os.path.dirname(destination_file), exist_ok=True)
-
+def copy_file_from_game_folder_if_missing(context: BuildContext, relative_file_path: str) -> bool:
+    destination_file = os.path.join(context.paths['build_directory'], relative_file_path)
     if not os.path.exists(destination_file):
-        shutil.copy(source_file, destination_file)
+        context.game_data.copy_to(relative_file_path, destination_file)
         return True
     return False
 
-def add_to_witchy_xml(folder_path:str, new_files:list[str]):
+def add_to_witchy_xml(folder_path:str, new_files:list[str], tpf_format: int = None):
     # Search for an XML file whose name starts with "_witchy"
     xml_file = None
     for file_name in os.listdir(folder_path):
@@ -1139,13 +2000,18 @@ def add_to_witchy_xml(folder_path:str, new_files:list[str]):
 
         for new_file in new_files:
             # Check if the texture is already present
-            if any(texture['name'] == new_file for texture in existing_textures):
-                print(f"Texture '{new_file}' is already present in the XML. Skipping...")
+            existing_texture = next((texture for texture in existing_textures if texture['name'] == new_file), None)
+            if existing_texture is not None:
+                if tpf_format is not None:
+                    # Replaced with a texture in another format
+                    existing_texture['format'] = str(tpf_format)
+                else:
+                    print(f"Texture '{new_file}' is already present in the XML. Skipping...")
                 continue
 
             new_texture_element = {
                 'name': new_file,
-                'format': '102',
+                'format': str(tpf_format) if tpf_format is not None else '102',
                 'flags1': '0x00'
             }
             existing_textures.append(new_texture_element)
@@ -1163,11 +2029,11 @@ def add_to_witchy_xml(folder_path:str, new_files:list[str]):
         file.write(updated_xml)
 
     print(f"Updated {xml_file} with {len(new_files)} new files")
-def add_design_file(design_file_path, design_id:Union[str,int]):
+def add_design_file(context: BuildContext, design_file_path, design_id:Union[str,int]):
     designbnd_rel_path = os.path.join("param","asmparam","asmparam.designbnd.dcx")
-    if copy_file_from_game_folder_if_missing(designbnd_rel_path):
-        run_witchy(os.path.join(paths['mod_directory'], designbnd_rel_path))
-    design_dir = os.path.join(paths['mod_directory'], designbnd_rel_path.replace(".","-"))
+    if copy_file_from_game_folder_if_missing(context, designbnd_rel_path):
+        run_witchy(context, os.path.join(context.paths['build_directory'], designbnd_rel_path))
+    design_dir = os.path.join(context.paths['build_directory'], designbnd_rel_path.replace(".","-"))
     shutil.copy(design_file_path, os.path.join(design_dir, f"{design_id}.design"))
 
     add_to_witchy_xml(design_dir, [f"{design_id}.design"])
@@ -1177,4 +2043,10 @@ def add_design_file(design_file_path, design_id:Union[str,int]):
 
 
 if __name__=="__main__":
-    compile_folder()
\ No newline at end of file
+    with open_text_smart("config.json") as f:
+        config = json.load(f)
+    build_context = BuildContext(config["folder_order"], locales=config.get("locales"))
+    try:
+        compile_folder(build_context)
+    finally:
+        build_context.cleanup()
\ No newline at end of file
@@ -2,70 +2,73 @@ import os
 import sys
 import time
 
-import requests as requests
 from PyQt6 import QtWidgets, QtCore, QtGui
 
+from downloads import Download, download_all
+
 class DownloadThread(QtCore.QThread):
     setProgressBarTotalSignal = QtCore.pyqtSignal(int)
     updateProgressSignal = QtCore.pyqtSignal(int)
     etaSignal = QtCore.pyqtSignal(int)
     doneSignal = QtCore.pyqtSignal()
+    errorSignal = QtCore.pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.total_size = -2
+        self.last_emit_time = None
+        self.last_emit_bytes = 0
+
+    def report_progress(self, bytes_done, bytes_total):
+        if bytes_total != self.total_size:
+            self.total_size = bytes_total
+            # -1 sets the progress bar to an indeterminate state
+            self.setProgressBarTotalSignal.emit(-1 if bytes_total is None else min(bytes_total, 2 ** 31 - 1))
+        if bytes_total is None:
+            return
+
+        current_time = time.time()
+        if self.last_emit_time is None:
+            self.last_emit_time = current_time
+            self.last_emit_bytes = bytes_done
+            return
+        if current_time - self.last_emit_time >= 1:
+            download_speed = (bytes_done - self.last_emit_bytes) / (current_time - self.last_emit_time)
+
+            # Calculate ETA
+            remaining_data = bytes_total - bytes_done
+            if download_speed > 0:  # Avoid division by zero
+                self.etaSignal.emit(int(remaining_data / download_speed))
+            self.updateProgressSignal.emit(int((bytes_done / bytes_total) * 100) if bytes_total else 100)
+            # Reset tracking variables for the next second
+            self.last_emit_time = current_time
+            self.last_emit_bytes = bytes_done
 
 class FileDownloadThread(DownloadThread):
-    def __init__(self, url, location):
+    def __init__(self, url, location, expected_sha1=None):
         super().__init__()
-        self.url = url
-        self.location = location
+        self.download = Download(url, location, expected_sha1)
 
     def run(self):
-        response = requests.get(self.url, stream=True)
-        total_size_in_bytes = response.headers.get('content-length')
+        # Partial data is kept on failure, so the next attempt resumes instead of starting over
+        try:
+            self.download.run(self.report_progress)
+        except Exception as e:
+            self.errorSignal.emit(str(e))
+            return
+        self.doneSignal.emit()
 
-        if total_size_in_bytes is None:  # If 'content-length' is not found in headers
-            self.setProgressBarTotalSignal.emit(-1)  # Set progress bar to indeterminate state
-        else:
-            total_size_in_bytes = int(total_size_in_bytes)
-            self.setProgressBarTotalSignal.emit(total_size_in_bytes)
+class MultiFileDownloadThread(DownloadThread):
+    def __init__(self, downloads: list):
+        super().__init__()
+        self.downloads = [Download(url, location, expected_sha1) for url, location, expected_sha1 in downloads]
 
-        block_size = 1024 * 16
+    def run(self):
         try:
-            response.raise_for_status()
-            file = open(self.location, 'wb')
-
-            start_time = time.time()
-            total_data_received = 0
-            last_emit_time = start_time  # Initialize last_emit_time to start_time
-            data_received_since_last_emit = 0
-
-            for data in response.iter_content(block_size):
-                total_data_received += len(data)
-                data_received_since_last_emit += len(data)
-
-                file.write(data)
-                if total_size_in_bytes is not None:  # Only update if 'content-length' was found
-                    current_time = time.time()
-                    if current_time - last_emit_time >= 1:
-                        elapsed_time_since_last_emit = current_time - last_emit_time
-                        download_speed = data_received_since_last_emit / elapsed_time_since_last_emit
-
-                        # Calculate ETA
-                        remaining_data = total_size_in_bytes - total_data_received
-                        if download_speed != 0:  # Avoid division by zero
-                            eta = int(remaining_data / download_speed)
-                            self.etaSignal.emit(eta)
-                        self.updateProgressSignal.emit(int((total_data_received / total_size_in_bytes) * 100))
-                        # Reset tracking variables for the next X seconds
-                        last_emit_time = current_time  # Update last_emit_time
-                        data_received_since_last_emit = 0  # Reset data_received_since_last_emit
-
-            file.flush()
-            file.close()
-
-        except requests.exceptions.RequestException as e:
-            if os.path.exists(self.location):
-                os.remove(self.location)
-            raise
-
+            download_all(self.downloads, self.report_progress)
+        except Exception as e:
+            self.errorSignal.emit(str(e))
+            return
         self.doneSignal.emit()
 
 
@@ -75,6 +78,7 @@ class ProgressDialog(QtWidgets.QDialog):
 
         self.setWindowTitle('Download')
         self.previous_percent_completed = -1
+        self.error = None
 
         self.layout = QtWidgets.QVBoxLayout()
         self.baseLabelText = baseLabelText
@@ -89,9 +93,15 @@ class ProgressDialog(QtWidgets.QDialog):
 
         self.download_thread.setProgressBarTotalSignal.connect(self.set_progress_bar_total)
         self.download_thread.doneSignal.connect(lambda: self.done(0))
+        self.download_thread.errorSignal.connect(self.show_error)
         self.download_thread.etaSignal.connect(self.set_eta)
         self.download_thread.updateProgressSignal.connect(self.update_progress_bar)
 
+    def show_error(self, message):
+        self.error = message
+        QtWidgets.QMessageBox.critical(self, "Download failed", f"{self.baseLabelText} failed: {message}")
+        self.done(1)
+
     def set_eta(self, ETASeconds):
         self.label.setText(f"{self.baseLabelText} ({format_eta(ETASeconds)})")
 
@@ -126,8 +136,13 @@ class ProgressDialog(QtWidgets.QDialog):
             event.ignore()
 
 class DownloadDialog(ProgressDialog):
-    def __init__(self, baseLabelText, url, location):
-        super().__init__(baseLabelText, FileDownloadThread(url, location))
+    def __init__(self, baseLabelText, url, location, expected_sha1=None):
+        super().__init__(baseLabelText, FileDownloadThread(url, location, expected_sha1))
+
+class MultiDownloadDialog(ProgressDialog):
+    """Runs several independent downloads in parallel, given as (url, location, expected_sha1) tuples."""
+    def __init__(self, baseLabelText, downloads: list):
+        super().__init__(baseLabelText, MultiFileDownloadThread(downloads))
 
 
 def format_eta(seconds) -> str:
@@ -0,0 +1,346 @@
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import traceback
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional
+
+from core import (ARENA_MAKER_DATA_FOLDER, FIGHTS_FOLDER, SCRATCH_FOLDER, BuildCancelled, BuildContext, BuildMemo, CancellationToken,
+                  compile_folder, fight_signature, open_text_smart, prebuild_fight)
+from scratch import ScratchWorkspace
+
+DAEMON_ADDRESS = ("127.0.0.1", 47813)
+AUTHKEY_FILE = os.path.join(ARENA_MAKER_DATA_FOLDER, "daemon.key")
+# Requests arriving within this long of each other are built once
+COALESCE_DELAY = 0.3
+# The roster's fights are checked this often after a change, backing off to WATCH_MAX_INTERVAL while nothing changes
+WATCH_INTERVAL = 1.0
+WATCH_MAX_INTERVAL = 16.0
+
+
+def load_authkey(create: bool = False) -> Optional[bytes]:
+    """The shared secret clients need to talk to the daemon. Only readable by the current user."""
+    if os.path.exists(AUTHKEY_FILE):
+        with open(AUTHKEY_FILE, "rb") as file:
+            return file.read()
+    if not create:
+        return None
+    os.makedirs(ARENA_MAKER_DATA_FOLDER, exist_ok=True)
+    authkey = secrets.token_bytes(32)
+    fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(authkey)
+    return authkey
+
+
+class BuildJob:
+    """A pending build, shared by every client that asked for it before it started."""
+    def __init__(self, roster: List[str], mod_directory: Optional[str], locales: Optional[List[str]] = None):
+        self.roster = roster
+        self.mod_directory = mod_directory
+        self.locales = locales
+        self.connections = []
+        self.cancel_token = CancellationToken()
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def broadcast(self, message: dict):
+        with self._lock:
+            for connection in list(self.connections):
+                try:
+                    connection.send(message)
+                except (OSError, EOFError):
+                    self.connections.remove(connection)
+
+
+class RemoteSignal:
+    """Stands in for a pyqtSignal, forwarding every emit to the clients waiting on a build."""
+    def __init__(self, job: BuildJob, message_type: str):
+        self.job = job
+        self.message_type = message_type
+
+    def emit(self, *args):
+        self.job.broadcast({"type": self.message_type, "args": list(args)})
+
+
+class BuildDaemon:
+    """
+    Long running local build service. Keeps a BuildMemo (parsed baseline params and FMGs, Paramdex definitions, tool output)
+    alive between builds, coalesces compile requests that arrive in quick succession, and watches the fights folder
+    to fill the artifact caches for changed fights before they're asked for.
+    """
+    def __init__(self, address=DAEMON_ADDRESS, authkey: bytes = None, fights_directory: str = FIGHTS_FOLDER):
+        self.address = address
+        self.authkey = authkey if authkey else load_authkey(create=True)
+        self.fights_directory = fights_directory
+        self.memo = BuildMemo()
+        self.paramdex = None
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.last_roster = []
+        self.roster_changed = threading.Event()
+        self.current_job = None
+        # Builds and prebuilds share the caches and tool state, so only one of them runs at a time
+        self.build_lock = threading.Lock()
+        self.prebuild_token = None
+        self.running = True
+        self.listener = None
+
+    def serve_forever(self):
+        self.listener = Listener(self.address, authkey=self.authkey)
+        print(f"Build daemon listening on {self.address[0]}:{self.address[1]}")
+        threading.Thread(target=self.build_loop, daemon=True).start()
+        threading.Thread(target=self.watch_loop, daemon=True).start()
+        try:
+            while self.running:
+                try:
+                    connection = self.listener.accept()
+                except OSError:
+                    if not self.running:
+                        break
+                    traceback.print_exc()
+                    continue
+                threading.Thread(target=self.handle_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.listener:
+            try:
+                self.listener.close()
+            except OSError:
+                pass
+
+    def handle_connection(self, connection):
+        try:
+            request = connection.recv()
+            if request.get("type") == "ping":
+                connection.send({"type": "pong"})
+            elif request.get("type") == "shutdown":
+                connection.send({"type": "done"})
+                self.stop()
+            elif request.get("type") == "compile":
+                job = self.submit(list(request["roster"]), request.get("mod_directory"), request.get("locales"), connection)
+                job.done.wait()
+            elif request.get("type") == "cancel":
+                self.cancel(request.get("mod_directory"))
+                connection.send({"type": "done"})
+            else:
+                connection.send({"type": "error", "message": f"Unknown request {request.get('type')}"})
+        except (OSError, EOFError):
+            pass
+        finally:
+            connection.close()
+
+    def submit(self, roster: List[str], mod_directory: Optional[str], locales: Optional[List[str]], connection) -> BuildJob:
+        with self.condition:
+            job = self.pending.get(mod_directory)
+            if job:
+                # Not started yet, so the newest request wins and everyone gets that build
+                job.roster = roster
+                job.locales = locales
+            else:
+                job = BuildJob(roster, mod_directory, locales)
+                self.pending[mod_directory] = job
+                self.condition.notify()
+            with job._lock:
+                job.connections.append(connection)
+            return job
+
+    def cancel(self, mod_directory: Optional[str]):
+        """Cancels the build for mod_directory, whether it's still waiting or already running."""
+        with self.condition:
+            job = self.pending.pop(mod_directory, None)
+            if self.current_job and self.current_job.mod_directory == mod_directory:
+                self.current_job.cancel_token.cancel()
+        if job:
+            job.broadcast({"type": "cancelled"})
+            job.done.set()
+
+    def build_loop(self):
+        while self.running:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+            if not self.running:
+                break
+            time.sleep(COALESCE_DELAY)
+            with self.condition:
+                # Cancelled while waiting for more requests
+                if not self.pending:
+                    continue
+                mod_directory = next(iter(self.pending))
+                job = self.pending.pop(mod_directory)
+                self.current_job = job
+                # A build covers whatever the prebuild was doing, no point waiting for it to finish
+                if self.prebuild_token:
+                    self.prebuild_token.cancel()
+            try:
+                with self.build_lock:
+                    self.run_build(job)
+            finally:
+                with self.condition:
+                    self.current_job = None
+
+    def run_build(self, job: BuildJob):
+        context = BuildContext(job.roster, job.mod_directory, memo=self.memo, paramdex=self.paramdex, locales=job.locales,
+                               cancel_token=job.cancel_token)
+        self.paramdex = context.paramdex
+        start_time = time.perf_counter()
+        try:
+            compile_folder(context, RemoteSignal(job, "progress"), RemoteSignal(job, "stats"))
+            print(f"Built {len(job.roster)} fights in {time.perf_counter() - start_time:.2f}s")
+            job.broadcast({"type": "done"})
+            if job.roster != self.last_roster:
+                self.last_roster = list(job.roster)
+                self.roster_changed.set()
+        except BuildCancelled:
+            print("Build cancelled")
+            job.broadcast({"type": "cancelled"})
+        except Exception as e:
+            traceback.print_exc()
+            job.broadcast({"type": "error", "message": str(e)})
+        finally:
+            context.cleanup()
+            job.done.set()
+
+    def watch_loop(self):
+        # Only the fights of the last built roster are watched, they're the only ones a prebuild can help
+        signatures = {}
+        stale = set()
+        interval = WATCH_INTERVAL
+        while self.running:
+            roster = list(self.last_roster)
+            changed = []
+            for fight in roster:
+                signature = fight_signature(os.path.join(self.fights_directory, fight))
+                if fight in signatures and signatures[fight] != signature:
+                    changed.append(fight)
+                signatures[fight] = signature
+            for fight in set(signatures) - set(roster):
+                del signatures[fight]
+            stale = (stale | set(changed)) & set(roster)
+            # Fights changed during a build are prebuilt once it's done
+            if stale and self.build_lock.acquire(blocking=False):
+                try:
+                    for fight in sorted(stale):
+                        if not self.prebuild(fight):
+                            break
+                        stale.discard(fight)
+                finally:
+                    self.build_lock.release()
+            interval = WATCH_INTERVAL if changed or stale else min(interval * 2, WATCH_MAX_INTERVAL)
+            # A new roster is picked up right away
+            if self.roster_changed.wait(interval):
+                self.roster_changed.clear()
+                interval = WATCH_INTERVAL
+
+    def prebuild(self, fight: str) -> bool:
+        """Prebuilds one fight, with build_lock held. Returns False if it gave way to a build and should be retried."""
+        cancel_token = CancellationToken()
+        with self.condition:
+            if self.pending or self.current_job:
+                return False
+            self.prebuild_token = cancel_token
+        # Prebuilds never touch the real mod folder, their output only matters for the caches they fill
+        scratch = ScratchWorkspace(SCRATCH_FOLDER)
+        roster = list(self.last_roster)
+        prebuild_dir = scratch.make_dir("prebuild-")
+        context = BuildContext(roster, os.path.join(prebuild_dir, "mod"), scratch=scratch, fights_directory=self.fights_directory,
+                               memo=self.memo, paramdex=self.paramdex, build_directory=os.path.join(prebuild_dir, "build"),
+                               cancel_token=cancel_token)
+        try:
+            prebuild_fight(context, roster.index(fight))
+            print(f"Prebuilt {fight}")
+        except BuildCancelled:
+            print(f"Prebuild of {fight} interrupted by a build")
+            return False
+        except Exception as e:
+            print(f"Couldn't prebuild {fight}: {e}")
+        finally:
+            with self.condition:
+                self.prebuild_token = None
+            scratch.cleanup()
+        return True
+
+
+def request_build(roster: List[str], mod_directory: str = None, progress_signal=None, stats_signal=None, locales: List[str] = None,
+                  address=DAEMON_ADDRESS) -> bool:
+    """
+    Hands a build to the daemon and waits for it, forwarding its progress. Returns False if no daemon is running,
+    raises RuntimeError if the build failed and BuildCancelled if it was cancelled (see cancel_build).
+    """
+    authkey = load_authkey()
+    if authkey is None:
+        return False
+    try:
+        connection = Client(address, authkey=authkey)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+
+    try:
+        connection.send({"type": "compile", "roster": list(roster), "mod_directory": mod_directory, "locales": locales})
+        while True:
+            message = connection.recv()
+            if message["type"] == "progress" and progress_signal:
+                progress_signal.emit(*message["args"])
+            elif message["type"] == "stats" and stats_signal:
+                stats_signal.emit(*message["args"])
+            elif message["type"] == "error":
+                raise RuntimeError(message["message"])
+            elif message["type"] == "cancelled":
+                raise BuildCancelled("The build was cancelled")
+            elif message["type"] == "done":
+                return True
+    except EOFError:
+        raise RuntimeError("The build daemon closed the connection")
+    finally:
+        connection.close()
+
+
+def cancel_build(mod_directory: str = None, address=DAEMON_ADDRESS) -> bool:
+    """Cancels the daemon's build for mod_directory. Returns False if no daemon is running."""
+    return send_request({"type": "cancel", "mod_directory": mod_directory}, address) is not None
+
+
+def send_request(request: dict, address=DAEMON_ADDRESS) -> Optional[dict]:
+    authkey = load_authkey()
+    if authkey is None:
+        return None
+    try:
+        connection = Client(address, authkey=authkey)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
+    try:
+        connection.send(request)
+        return connection.recv()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    if command == "serve":
+        BuildDaemon().serve_forever()
+    elif command == "build":
+        with open_text_smart("config.json") as f:
+            config = json.load(f)
+        if not request_build(config["folder_order"], locales=config.get("locales")):
+            print("The build daemon isn't running.")
+            sys.exit(1)
+    elif command in ("ping", "shutdown"):
+        response = send_request({"type": command})
+        print(response if response else "The build daemon isn't running.")
+    elif command == "cancel":
+        if not cancel_build():
+            print("The build daemon isn't running.")
+            sys.exit(1)
+    else:
+        print("Usage: daemon.py [serve|build|cancel|ping|shutdown]")
+        sys.exit(1)
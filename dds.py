@@ -0,0 +1,171 @@
+import struct
+
+from lazyimport import lazy_import
+
+numpy = lazy_import("numpy")
+
+B8G8R8A8 = "B8G8R8A8"
+BC1 = "BC1"
+BC3 = "BC3"
+
+# The format byte a TPF entry needs for each of these
+TPF_FORMATS = {B8G8R8A8: 9, BC1: 0, BC3: 5}
+
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDSCAPS_TEXTURE = 0x1000
+
+# Uncompressed up to this many pixels (a 512x512 texture is 1MB), block compressed past it
+UNCOMPRESSED_PIXEL_LIMIT = 512 * 512
+
+
+def ui_texture_format(width: int, height: int) -> str:
+    """Small UI textures stay lossless, bigger ones get BC3 (DXT5) to keep the alpha gradients."""
+    return B8G8R8A8 if width * height <= UNCOMPRESSED_PIXEL_LIMIT else BC3
+
+
+def dds_header(width: int, height: int, dds_format: str) -> bytes:
+    flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT | DDSD_MIPMAPCOUNT
+    if dds_format == B8G8R8A8:
+        flags |= DDSD_PITCH
+        pitch_or_linear_size = width * 4
+        pixel_format = struct.pack("<II4sIIIII", 32, DDPF_RGB | DDPF_ALPHAPIXELS, b"\0\0\0\0", 32,
+                                   0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000)
+    else:
+        flags |= DDSD_LINEARSIZE
+        block_size = 8 if dds_format == BC1 else 16
+        pitch_or_linear_size = max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block_size
+        pixel_format = struct.pack("<II4sIIIII", 32, DDPF_FOURCC, b"DXT1" if dds_format == BC1 else b"DXT5", 0, 0, 0, 0, 0)
+    header = struct.pack("<IIIIIII", 124, flags, height, width, pitch_or_linear_size, 0, 1)
+    header += b"\0" * 44 + pixel_format
+    header += struct.pack("<IIIII", DDSCAPS_TEXTURE, 0, 0, 0, 0)
+    return b"DDS " + header
+
+
+def encode_dds(pixels, dds_format: str) -> bytes:
+    """Encodes an (height, width, 4) uint8 RGBA array as a single mip DDS."""
+    pixels = numpy.ascontiguousarray(pixels, dtype=numpy.uint8)
+    height, width = pixels.shape[:2]
+    if dds_format == B8G8R8A8:
+        body = pixels[:, :, [2, 1, 0, 3]].tobytes()
+    elif dds_format == BC1:
+        body = encode_bc1(to_blocks(pixels)).tobytes()
+    elif dds_format == BC3:
+        blocks = to_blocks(pixels)
+        body = numpy.concatenate([encode_bc3_alpha(blocks[:, :, 3]), encode_color_blocks(blocks, punch_through=False)], axis=1).tobytes()
+    else:
+        raise ValueError(f"Unsupported DDS format {dds_format}")
+    return dds_header(width, height, dds_format) + body
+
+
+def to_blocks(pixels):
+    """Splits the image into 4x4 blocks, row by row, as a (block count, 16, 4) array. Partial blocks repeat the edge pixels."""
+    height, width = pixels.shape[:2]
+    padded = numpy.pad(pixels, ((0, -height % 4), (0, -width % 4), (0, 0)), mode="edge")
+    block_rows, block_columns = padded.shape[0] // 4, padded.shape[1] // 4
+    return padded.reshape(block_rows, 4, block_columns, 4, 4).swapaxes(1, 2).reshape(-1, 16, 4)
+
+
+def quantize_565(colors):
+    """float RGB (..., 3) in 0-255 -> packed 565 values, and the colors they expand back to."""
+    rounded = numpy.clip(numpy.rint(colors * numpy.array([31, 63, 31]) / 255), 0, [31, 63, 31]).astype(numpy.uint16)
+    packed = (rounded[..., 0] << 11) | (rounded[..., 1] << 5) | rounded[..., 2]
+    expanded = numpy.stack([(rounded[..., 0] << 3) | (rounded[..., 0] >> 2),
+                            (rounded[..., 1] << 2) | (rounded[..., 1] >> 4),
+                            (rounded[..., 2] << 3) | (rounded[..., 2] >> 2)], axis=-1).astype(numpy.float32)
+    return packed, expanded
+
+
+def endpoints(colors):
+    """Per block endpoints along the principal axis of its colors (a few vectorized power iterations)."""
+    mean = colors.mean(axis=1, keepdims=True)
+    centered = colors - mean
+    covariance = numpy.einsum("nki,nkj->nij", centered, centered)
+    axis = colors.max(axis=1) - colors.min(axis=1) + 1e-3
+    for _ in range(4):
+        axis = numpy.einsum("nij,nj->ni", covariance, axis)
+        axis /= numpy.linalg.norm(axis, axis=1, keepdims=True) + 1e-12
+    projection = numpy.einsum("nki,ni->nk", centered, axis)
+    block_indices = numpy.arange(len(colors))
+    high = colors[block_indices, projection.argmax(axis=1)]
+    low = colors[block_indices, projection.argmin(axis=1)]
+    return high, low
+
+
+def nearest(values, palette):
+    """Index of the closest palette entry for every value. values (n, 16, c), palette (n, p, c)."""
+    distances = ((values[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=-1)
+    return distances.argmin(axis=2)
+
+
+def pack_indices(indices, bits: int):
+    shifts = numpy.arange(16, dtype=numpy.uint64) * bits
+    return (indices.astype(numpy.uint64) << shifts).sum(axis=1, dtype=numpy.uint64)
+
+
+def encode_color_blocks(blocks, punch_through: bool):
+    """BC1 style color blocks as (n, 8) bytes. With punch_through, blocks with transparent pixels use the 3 color mode."""
+    colors = blocks[:, :, :3].astype(numpy.float32)
+    transparent = blocks[:, :, 3] < 128
+    has_transparency = transparent.any(axis=1) if punch_through else numpy.zeros(len(blocks), dtype=bool)
+    if punch_through:
+        # Transparent pixels shouldn't pull the endpoints around
+        opaque_mean = numpy.where(transparent[:, :, None], 0, colors).sum(axis=1) / numpy.maximum((~transparent).sum(axis=1), 1)[:, None]
+        colors = numpy.where(transparent[:, :, None], opaque_mean[:, None, :], colors)
+
+    high, low = endpoints(colors)
+    packed_high, expanded_high = quantize_565(high)
+    packed_low, expanded_low = quantize_565(low)
+
+    # 4 color mode needs color0 > color1, 3 color mode needs color0 <= color1
+    swap = numpy.where(has_transparency, packed_high > packed_low, packed_high < packed_low)
+    color0 = numpy.where(swap, packed_low, packed_high)
+    color1 = numpy.where(swap, packed_high, packed_low)
+    expanded0 = numpy.where(swap[:, None], expanded_low, expanded_high)
+    expanded1 = numpy.where(swap[:, None], expanded_high, expanded_low)
+
+    four_color_palette = numpy.stack([expanded0, expanded1, (2 * expanded0 + expanded1) / 3, (expanded0 + 2 * expanded1) / 3], axis=1)
+    three_color_palette = numpy.stack([expanded0, expanded1, (expanded0 + expanded1) / 2], axis=1)
+    indices = nearest(colors, four_color_palette)
+    if has_transparency.any():
+        three_color_indices = numpy.where(transparent, 3, nearest(colors, three_color_palette))
+        indices = numpy.where(has_transparency[:, None], three_color_indices, indices)
+    # Single color blocks: color0 == color1 would switch BC1 to the 3 color mode, so just point everything at color0
+    indices = numpy.where(((color0 == color1) & ~has_transparency)[:, None], 0, indices)
+
+    output = numpy.zeros((len(blocks), 8), dtype=numpy.uint8)
+    output[:, 0:2] = color0.astype("<u2").view(numpy.uint8).reshape(-1, 2)
+    output[:, 2:4] = color1.astype("<u2").view(numpy.uint8).reshape(-1, 2)
+    output[:, 4:8] = pack_indices(indices, 2).astype("<u4").view(numpy.uint8).reshape(-1, 4)
+    return output
+
+
+def encode_bc1(blocks):
+    return encode_color_blocks(blocks, punch_through=True)
+
+
+def encode_bc3_alpha(alpha):
+    """BC3 alpha blocks as (n, 8) bytes, using the 8 value mode between each block's min and max alpha."""
+    alpha = alpha.astype(numpy.float32)
+    alpha0 = alpha.max(axis=1)
+    alpha1 = alpha.min(axis=1)
+    weights = numpy.array([[7, 0], [0, 7], [6, 1], [5, 2], [4, 3], [3, 4], [2, 5], [1, 6]], dtype=numpy.float32) / 7
+    palette = numpy.floor(weights[None, :, 0] * alpha0[:, None] + weights[None, :, 1] * alpha1[:, None] + 0.5)
+    indices = nearest(alpha[:, :, None], palette[:, :, None])
+    # alpha0 == alpha1 is the 6 value mode, where index 0 still means alpha0
+    indices = numpy.where((alpha0 == alpha1)[:, None], 0, indices)
+
+    output = numpy.zeros((len(alpha), 8), dtype=numpy.uint8)
+    output[:, 0] = alpha0.astype(numpy.uint8)
+    output[:, 1] = alpha1.astype(numpy.uint8)
+    packed = pack_indices(indices, 3)
+    output[:, 2:8] = packed.astype("<u8").view(numpy.uint8).reshape(-1, 8)[:, :6]
+    return output
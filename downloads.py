@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from typing import Callable, List, Optional
+
+from lazyimport import lazy_import
+
+requests = lazy_import("requests")
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 256
+HASH_CHUNK_SIZE = 1024 * 1024
+SEGMENT_MIN_SIZE = 1024 * 1024 * 8
+DEFAULT_SEGMENTS = 4
+NETWORK_TIMEOUT = 30
+SEGMENT_RETRIES = 3
+STATE_SAVE_INTERVAL = 1.0
+
+
+class DownloadError(Exception):
+    pass
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class Download:
+    """
+    Downloads a single file, resumable across runs.
+
+    Data goes to '<location>.part' and progress to '<location>.part.json'. If the server supports byte ranges,
+    large files are split into segments fetched over separate connections, and an interrupted download
+    picks up where each segment left off. The SHA-1 is computed over the contiguous downloaded prefix
+    while the download is still running, so verifying it doesn't need a second pass over the file.
+    """
+    def __init__(self, url: str, location: str, expected_sha1: Optional[str] = None, segments: int = DEFAULT_SEGMENTS, session: "requests.Session" = None):
+        self.url = url
+        self.location = location
+        self.expected_sha1 = expected_sha1.lower() if expected_sha1 else None
+        self.max_segments = max(1, segments)
+        self.session = session if session else requests.Session()
+
+        self.part_path = f"{location}.part"
+        self.state_path = f"{location}.part.json"
+        self.total_size = None
+        self.state = None
+        self._lock = threading.Lock()
+        self._hasher = hashlib.sha1()
+        self._hashed_bytes = 0
+        self._last_state_save = 0.0
+        # Set when a segment fails, so the others stop instead of finishing their ranges first
+        self._abort = threading.Event()
+
+    @property
+    def downloaded_bytes(self) -> int:
+        if not self.state:
+            return 0
+        with self._lock:
+            return sum(segment["done"] for segment in self.state["segments"])
+
+    def run(self, progress_callback: Callable[[int, Optional[int]], None] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(self.location)), exist_ok=True)
+        remote = self._probe()
+        if remote is None:
+            self._stream_whole(progress_callback)
+        else:
+            try:
+                self._download_segments(remote, progress_callback)
+            except RangeNotSupported:
+                self._clear_partial()
+                self._stream_whole(progress_callback)
+        self._finish()
+
+    def _probe(self) -> Optional[dict]:
+        """Returns the remote size and validators if ranged downloads are possible, otherwise None."""
+        try:
+            response = self.session.head(self.url, allow_redirects=True, timeout=NETWORK_TIMEOUT)
+            response.raise_for_status()
+        except requests.exceptions.RequestException:
+            return None
+
+        size = response.headers.get("content-length")
+        if size is None or response.headers.get("accept-ranges", "").lower() != "bytes":
+            return None
+        self.total_size = int(size)
+        return {
+            "url": self.url,
+            "size": self.total_size,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+
+    def _load_state(self, remote: dict) -> Optional[dict]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as fp:
+                state = json.load(fp)
+        except (FileNotFoundError, json.decoder.JSONDecodeError):
+            return None
+        if not os.path.exists(self.part_path) or os.path.getsize(self.part_path) != remote["size"]:
+            return None
+        for key in ["url", "size", "etag", "last_modified"]:
+            if state.get(key) != remote[key]:
+                return None
+        return state
+
+    def _save_state(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_state_save < STATE_SAVE_INTERVAL:
+            return
+        self._last_state_save = now
+        with self._lock:
+            data = json.dumps(self.state)
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as fp:
+            fp.write(data)
+        os.replace(temp_path, self.state_path)
+
+    def _clear_partial(self):
+        for path in [self.part_path, self.state_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.state = None
+        self._hasher = hashlib.sha1()
+        self._hashed_bytes = 0
+
+    def _download_segments(self, remote: dict, progress_callback):
+        self.state = self._load_state(remote)
+        if self.state is None:
+            self._clear_partial()
+            size = remote["size"]
+            segment_count = max(1, min(self.max_segments, size // SEGMENT_MIN_SIZE))
+            segment_size = -(-size // segment_count)
+            self.state = dict(remote)
+            self.state["segments"] = [
+                {"start": start, "end": min(start + segment_size, size), "done": 0}
+                for start in range(0, size, segment_size)
+            ] or [{"start": 0, "end": 0, "done": 0}]
+            with open(self.part_path, "wb") as file:
+                file.truncate(size)
+            self._save_state(force=True)
+        else:
+            print(f"Resuming download of {os.path.basename(self.location)} at {self.downloaded_bytes}/{remote['size']} bytes")
+
+        pending = [segment for segment in self.state["segments"] if segment["done"] < segment["end"] - segment["start"]]
+        self._abort.clear()
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = [executor.submit(self._fetch_segment, segment) for segment in pending]
+                while True:
+                    done, not_done = wait(futures, timeout=0.25, return_when=FIRST_EXCEPTION)
+                    self._advance_hash()
+                    self._save_state()
+                    if progress_callback:
+                        progress_callback(self.downloaded_bytes, self.total_size)
+                    for future in done:
+                        if future.exception():
+                            self._abort.set()
+                            self._save_state(force=True)
+                            raise future.exception()
+                    if not not_done:
+                        break
+
+        self._save_state(force=True)
+        self._advance_hash()
+        if progress_callback:
+            progress_callback(self.downloaded_bytes, self.total_size)
+
+    def _fetch_segment(self, segment: dict):
+        attempts = 0
+        while segment["done"] < segment["end"] - segment["start"] and not self._abort.is_set():
+            offset = segment["start"] + segment["done"]
+            headers = {"Range": f"bytes={offset}-{segment['end'] - 1}"}
+            validator = self.state.get("etag") or self.state.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator
+            try:
+                with self.session.get(self.url, headers=headers, stream=True, timeout=NETWORK_TIMEOUT) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise RangeNotSupported()
+                    with open(self.part_path, "r+b") as file:
+                        file.seek(offset)
+                        for data in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            if self._abort.is_set():
+                                return
+                            data = data[:segment["end"] - segment["start"] - segment["done"]]
+                            file.write(data)
+                            with self._lock:
+                                segment["done"] += len(data)
+            except requests.exceptions.RequestException:
+                attempts += 1
+                if attempts > SEGMENT_RETRIES:
+                    raise
+                time.sleep(attempts)
+
+    def _advance_hash(self):
+        # Hash whatever has become contiguous from the start of the file since the last call
+        with self._lock:
+            contiguous = 0
+            for segment in self.state["segments"]:
+                contiguous = segment["start"] + segment["done"]
+                if segment["done"] < segment["end"] - segment["start"]:
+                    break
+        if contiguous <= self._hashed_bytes:
+            return
+        with open(self.part_path, "rb") as file:
+            file.seek(self._hashed_bytes)
+            remaining = contiguous - self._hashed_bytes
+            while remaining > 0:
+                chunk = file.read(min(HASH_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self._hasher.update(chunk)
+                remaining -= len(chunk)
+                self._hashed_bytes += len(chunk)
+
+    def _stream_whole(self, progress_callback):
+        # No ranges (or no size), so a plain single-connection download that can't be resumed
+        self._clear_partial()
+        with self.session.get(self.url, stream=True, timeout=NETWORK_TIMEOUT) as response:
+            response.raise_for_status()
+            size = response.headers.get("content-length")
+            self.total_size = int(size) if size is not None else None
+            self.state = {"segments": [{"start": 0, "end": self.total_size or 0, "done": 0}]}
+            segment = self.state["segments"][0]
+            with open(self.part_path, "wb") as file:
+                for data in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    file.write(data)
+                    self._hasher.update(data)
+                    with self._lock:
+                        segment["done"] += len(data)
+                    if progress_callback:
+                        progress_callback(segment["done"], self.total_size)
+            segment["end"] = segment["done"]
+            self._hashed_bytes = segment["done"]
+
+    def _finish(self):
+        if self.expected_sha1:
+            self._advance_hash()
+            actual_sha1 = self._hasher.hexdigest().lower()
+            if actual_sha1 != self.expected_sha1:
+                self._clear_partial()
+                raise DownloadError(f"Hash mismatch for {os.path.basename(self.location)}: expected {self.expected_sha1}, got {actual_sha1}")
+        os.replace(self.part_path, self.location)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+
+def download_all(downloads: List[Download], progress_callback: Callable[[int, Optional[int]], None] = None, max_workers: int = 4):
+    """
+    Runs independent downloads in parallel. progress_callback receives the combined (bytes_done, bytes_total),
+    with bytes_total being None until every download knows its size.
+    """
+    lock = threading.Lock()
+    progress = {index: (0, None) for index in range(len(downloads))}
+
+    def report(index, done, total):
+        with lock:
+            progress[index] = (done, total)
+            totals = [item[1] for item in progress.values()]
+            combined_total = None if any(total is None for total in totals) else sum(totals)
+            combined_done = sum(item[0] for item in progress.values())
+        if progress_callback:
+            progress_callback(combined_done, combined_total)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(downloads)))) as executor:
+        futures = [executor.submit(download.run, lambda done, total, index=index: report(index, done, total))
+                   for index, download in enumerate(downloads)]
+        for future in futures:
+            future.result()
@@ -0,0 +1,120 @@
+import os
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class GameDataProvider:
+    """
+    Serves files from the base game data.
+
+    Instead of extracting all of game_data.zip up front, the zip's central directory is indexed once and only
+    the members a build actually asks for are extracted. Extracted members are kept in a folder per game_data.zip
+    (by size and mtime) inside the game_data folder, which works as a cache for later builds. Without a zip,
+    an already extracted game_data folder from an older version is used as-is.
+    """
+    def __init__(self, data_folder: str):
+        self.cache_dir = os.path.join(data_folder, "game_data")
+        self.zip_path = os.path.join(data_folder, "game_data.zip")
+        self._index = None
+        self._signature = None
+        self._member_root = None
+        self._index_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _zip_signature(self):
+        try:
+            stat = os.stat(self.zip_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _load_index(self):
+        """The zip's index, the folder its members are extracted to and the zip's signature. Checked against the zip on every call, so a replaced zip is picked up right away."""
+        signature = self._zip_signature()
+        with self._index_lock:
+            if self._index is not None and signature == self._signature:
+                return self._index, self._member_root, signature
+            first_load = self._index is None
+            self._index = {}
+            self._signature = signature
+            if signature is None:
+                self._member_root = self.cache_dir
+                return self._index, self._member_root, signature
+
+            generation = f".zip-{signature[0]}-{signature[1]}"
+            self._member_root = os.path.join(self.cache_dir, generation)
+            os.makedirs(self._member_root, exist_ok=True)
+            if first_load:
+                # Members of older zips. Only cleaned up before this process has served anything from them,
+                # and only as far as nothing else still has them open
+                for entry in os.scandir(self.cache_dir):
+                    if entry.is_dir() and entry.name.startswith(".zip-") and entry.name != generation:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+
+            with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+                infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+            # The zip contains a top level game_data folder
+            prefix = "game_data/" if infos and all(info.filename.startswith("game_data/") for info in infos) else ""
+            for info in infos:
+                self._index[self._normalize(info.filename[len(prefix):])] = info
+            return self._index, self._member_root, signature
+
+    @staticmethod
+    def _normalize(relative_file_path: str) -> str:
+        return relative_file_path.replace("\\", "/").strip("/").lower()
+
+    def _zip_handle(self, signature) -> zipfile.ZipFile:
+        # One handle per thread, so members can be decompressed in parallel. Reopened if the zip was replaced
+        handle = getattr(self._local, "zip_ref", None)
+        if handle is None or self._local.signature != signature:
+            if handle is not None:
+                handle.close()
+            handle = zipfile.ZipFile(self.zip_path, 'r')
+            self._local.zip_ref = handle
+            self._local.signature = signature
+        return handle
+
+    def exists(self, relative_file_path: str) -> bool:
+        index, member_root, _ = self._load_index()
+        if os.path.exists(os.path.join(member_root, relative_file_path)):
+            return True
+        return self._normalize(relative_file_path) in index
+
+    def path(self, relative_file_path: str) -> str:
+        """Returns the path of the file in the game_data folder, extracting just that member if needed."""
+        index, member_root, signature = self._load_index()
+        cached_path = os.path.join(member_root, relative_file_path)
+        if os.path.exists(cached_path):
+            return cached_path
+
+        info = index.get(self._normalize(relative_file_path))
+        if info is None:
+            if not os.path.exists(self.zip_path) and not os.path.exists(self.cache_dir):
+                raise FileNotFoundError(f"Neither 'game_data' folder nor 'game_data.zip' found in the {os.path.dirname(self.cache_dir)} directory.")
+            raise FileNotFoundError(f"'{relative_file_path}' is not part of the game data.")
+
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        temp_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._zip_handle(signature).open(info, 'r') as source, open(temp_path, 'wb') as target:
+            shutil.copyfileobj(source, target, STREAM_CHUNK_SIZE)
+        os.replace(temp_path, cached_path)
+        return cached_path
+
+    def copy_to(self, relative_file_path: str, destination: str):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(self.path(relative_file_path), destination)
+
+    def prefetch(self, relative_file_paths: Iterable[str], max_workers: int = 4):
+        """Extracts several members in parallel, so later path() calls are instant."""
+        _, member_root, _ = self._load_index()
+        missing = [path for path in relative_file_paths if not os.path.exists(os.path.join(member_root, path))]
+        if not missing:
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _ in executor.map(self.path, missing):
+                pass
@@ -1,22 +1,35 @@
 import hashlib
+import io
 import os
 import re
 import subprocess
 import sys
 import json
 import shutil
+import struct
+import time
 import zipfile
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 
-import toml
 from core import *
-import requests
+from lazyimport import lazy_import
 from PyQt6.QtWidgets import QApplication, QMainWindow, QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QListWidget, QPushButton, QLineEdit, QFileDialog, QMessageBox, QLabel, QWidget, QProgressBar
 from PyQt6.QtCore import Qt, QObject, pyqtSignal, QThread
+from PyQt6.QtGui import QColor
 
-from customWidgets import DownloadDialog
+from customWidgets import DownloadDialog, MultiDownloadDialog, format_eta
+from importer import import_fight_packs
+from assetstore import BlobStore
+from catalog import FightCatalog
+from daemon import cancel_build, request_build
 
 CONFIG_FILE = "config.json"
+RELEASE_CACHE_TTL = 6 * 60 * 60
+
+toml = lazy_import("toml")
+requests = lazy_import("requests")
+NETWORK_TIMEOUT = 10
 
 def launch_modengine2():
     resources_dir = os.path.join(os.path.dirname(__file__), "resources")
@@ -103,48 +116,108 @@ class PathWidget(QWidget):
 class Worker(QObject):
     finished = pyqtSignal()
     progress = pyqtSignal(int, str)
+    stats = pyqtSignal(int, float, float)
     error = pyqtSignal(object)
+
+    def __init__(self, roster, locales=None):
+        super().__init__()
+        self.roster = roster
+        self.locales = locales
+        self.cancel_token = CancellationToken()
+
     def run(self):
-        compile_folder(self.progress)
         try:
-            pass
+            # A running build daemon has everything warm already, otherwise build in-process
+            if not request_build(self.roster, progress_signal=self.progress, stats_signal=self.stats, locales=self.locales):
+                self.cancel_token.check()
+                context = BuildContext(self.roster, locales=self.locales, cancel_token=self.cancel_token)
+                try:
+                    compile_folder(context, self.progress, self.stats)
+                finally:
+                    context.cleanup()
+        except Exception as e:
+            self.error.emit(e)
+
+        self.finished.emit()
+
+    def cancel(self):
+        # Called from the GUI thread, the build stops at its next check and its running tools get killed
+        self.cancel_token.cancel()
+        cancel_build()
+
+class ImportWorker(QObject):
+    finished = pyqtSignal()
+    progress = pyqtSignal(int, str)
+    imported = pyqtSignal(list)
+    warning = pyqtSignal(str)
+    error = pyqtSignal(object)
+
+    def __init__(self, zip_files):
+        super().__init__()
+        self.zip_files = zip_files
+
+    def run(self):
+        try:
+            self.imported.emit(import_fight_packs(self.zip_files, self.progress, self.warning))
         except Exception as e:
             self.error.emit(e)
 
         self.finished.emit()
 
 class ProgressDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent, worker, error_message="Compilation failed"):
         super().__init__(parent)
         self.setWindowTitle("Progress")
+        self.error_message = error_message
+        self.failed = False
         self.setMinimumWidth(300)
 
         self.progress_bar = QProgressBar(self)
         self.status_label = QLabel("Initializing...", self)
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
+        self.stats_label = QLabel("", self)
+        self.stats_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
 
         layout = QVBoxLayout()
         layout.addWidget(self.status_label)
         layout.addWidget(self.progress_bar)
+        layout.addWidget(self.stats_label)
+        self.cancel_button = None
+        if hasattr(worker, "cancel"):
+            self.cancel_button = QPushButton("Cancel", self)
+            self.cancel_button.clicked.connect(self.cancel)
+            layout.addWidget(self.cancel_button)
         self.setLayout(layout)
 
         self.thread = QThread()
-        self.worker = Worker()
+        self.worker = worker
         self.worker.moveToThread(self.thread)
         self.thread.started.connect(self.worker.run)
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
         self.worker.progress.connect(self.update_progress)
+        if hasattr(self.worker, "stats"):
+            self.worker.stats.connect(self.update_stats)
         self.worker.finished.connect(self.accept)
         self.worker.error.connect(self.error_display)
 
     def start_task(self):
         self.thread.start()
     def error_display(self, exception):
-        QMessageBox.critical(None, "Error", f"Compilation failed: {exception}")
+        self.failed = True
+        if isinstance(exception, BuildCancelled):
+            return
+        QMessageBox.critical(None, "Error", f"{self.error_message}: {exception}")
+    def cancel(self):
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelling...")
+        self.worker.cancel()
     def closeEvent(self, event) -> None:
+        # The dialog closes once the worker is done, closing it early cancels the build if that's possible
         event.ignore()
+        if self.cancel_button and self.cancel_button.isEnabled():
+            self.cancel()
 
     def update_progress(self, value, status):
         self.progress_bar.setValue(value)
@@ -152,6 +225,9 @@ class ProgressDialog(QDialog):
         #if value == 100:
         #    QMessageBox.information(self, "Success", "Mod has been compiled. Ensure it's enabled.")
 
+    def update_stats(self, eta_seconds, fights_per_second, tool_calls_per_second):
+        self.stats_label.setText(f"ETA: {format_eta(eta_seconds)} - {fights_per_second:.2f} fights/s, {tool_calls_per_second:.2f} tool calls/s")
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -160,6 +236,11 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
 
+        self.catalog = FightCatalog()
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search fights (folder, AC name, pilot, mission)...")
+        self.search_box.textChanged.connect(self.filter_folders)
+
         self.folder_list = QListWidget()
 
         self.up_button = QPushButton("↑")
@@ -196,12 +277,24 @@ class MainWindow(QMainWindow):
         list_layout.addWidget(self.folder_list)
         list_layout.addLayout(button_layout)
 
+        self.layout.addWidget(self.search_box)
         self.layout.addLayout(list_layout)
         self.layout.addLayout(bottom_layout_1)
         self.layout.addLayout(bottom_layout_2)
 
         self.load_folders()
 
+    def tool_check_finished(self, versions, updates, error):
+        if error is not None:
+            QMessageBox.critical(self, "Error", f"Couldn't check for tool updates: {error}")
+        else:
+            try:
+                apply_tool_updates(versions, updates)
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Couldn't update the tools: {e}")
+        # Compiling still works with the tools already on disk, and reports it if any are missing
+        self.compile_button.setEnabled(True)
+
     def open_fights_folder(self):
         if os.path.exists(FIGHTS_FOLDER):
             os.startfile(FIGHTS_FOLDER)
@@ -224,12 +317,19 @@ class MainWindow(QMainWindow):
                 zip_ref.extractall(FIGHTS_FOLDER)
 
         folder_order = self.load_folder_order()
+        folder_errors = self.catalog.errors()
         self.folder_list.clear()
         updated_folder_order = []
         for folder in folder_order:
             if os.path.exists(os.path.join(FIGHTS_FOLDER, folder)):
                 self.folder_list.addItem(folder)
                 updated_folder_order.append(folder)
+                # Broken fights (a data.json saved halfway, say) keep their place in the roster, the build reports them
+                if folder in folder_errors:
+                    print(f"Warning - {folder}: {folder_errors[folder]}")
+                    item = self.folder_list.item(self.folder_list.count() - 1)
+                    item.setForeground(QColor("#e06c6c"))
+                    item.setToolTip(folder_errors[folder])
             else:
                 print(f"Folder not found: {folder}")
         if updated_folder_order != folder_order:
@@ -253,54 +353,22 @@ class MainWindow(QMainWindow):
 
     def import_folder(self):
         zip_files, _ = QFileDialog.getOpenFileNames(self, "Select ZIP Files", "", "ZIP Files (*.zip)")
-        for zip_file in zip_files:
-            try:
-                with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-                    root_path = zipfile.Path(zip_ref, "")
-                    namelist = zip_ref.namelist()
-                    folder_names = set(os.path.dirname(name) for name in namelist)
-                    if "data.json" in namelist and any(name.endswith(".design") for name in namelist):
-                        # Handle the case where data.json is in the root of the ZIP
-                        zip_name = os.path.splitext(os.path.basename(zip_file))[0]
-                        dest_folder = os.path.join(FIGHTS_FOLDER, zip_name)
-                        os.makedirs(dest_folder, exist_ok=True)
-                        zip_ref.extractall(dest_folder)
-                        if len(self.folder_list.findItems(zip_name, Qt.MatchFlag.MatchExactly)) == 0:
-                            self.folder_list.addItem(zip_name)
-                        self.save_folder_order()
-                    else:
-                        # Handle the case where data.json is in subfolders
-                        for folder_name in folder_names:
-                            if not folder_name.count("/") == 0:
-                                continue
-                            path_obj = root_path.joinpath(folder_name)
-
-                            if path_obj.is_dir():
-                                datajson_obj = root_path.joinpath(folder_name, "data.json")
-                                design_exists = any(name.endswith(".design") for name in zip_ref.namelist() if name.startswith(folder_name))
-                                if not (datajson_obj.is_file() and design_exists):
-                                    raise ValueError(f"Invalid folder structure in {zip_file}")
-                            dest_folder = os.path.join(FIGHTS_FOLDER, folder_name)
-                            os.makedirs(dest_folder, exist_ok=True)
-                            for name in zip_ref.namelist():
-                                if name.startswith(folder_name):
-                                    if name.endswith('/'):
-                                        # This is a directory, create it
-                                        os.makedirs(os.path.join(FIGHTS_FOLDER, name), exist_ok=True)
-                                    else:
-                                        # This is a file, extract it
-                                        try:
-                                            zip_ref.extract(name, FIGHTS_FOLDER)
-                                        except zipfile.BadZipFile:
-                                            print(f"Skipping bad zip file: {name}")
-                                        except Exception as e:
-                                            print(f"Error extracting {name}: {str(e)}")
-                            if len(self.folder_list.findItems(folder_name, Qt.MatchFlag.MatchExactly)) == 0:
-                                self.folder_list.addItem(folder_name)
-                            self.save_folder_order()
-
-            except (zipfile.BadZipFile, ValueError) as e:
-                QMessageBox.warning(self, "Error", str(e))
+        if not zip_files:
+            return
+
+        worker = ImportWorker(zip_files)
+        worker.imported.connect(self.add_imported_folders)
+        worker.warning.connect(lambda message: QMessageBox.warning(self, "Error", message))
+        progress_dialog = ProgressDialog(self, worker, "Import failed")
+        progress_dialog.start_task()
+        progress_dialog.exec()
+
+    def add_imported_folders(self, folder_names):
+        self.catalog.refresh()
+        for folder_name in folder_names:
+            if len(self.folder_list.findItems(folder_name, Qt.MatchFlag.MatchExactly)) == 0:
+                self.folder_list.addItem(folder_name)
+        self.save_folder_order()
 
     def remove_folder(self):
         current_item = self.folder_list.currentItem()
@@ -311,6 +379,8 @@ class MainWindow(QMainWindow):
                                          QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
             if reply == QMessageBox.StandardButton.Yes:
                 shutil.rmtree(folder_path)
+                BlobStore(BLOBS_FOLDER).collect_garbage(FIGHTS_FOLDER)
+                self.catalog.refresh()
                 self.folder_list.takeItem(self.folder_list.row(current_item))
                 self.save_folder_order()
 
@@ -329,38 +399,47 @@ class MainWindow(QMainWindow):
                     launch_modengine2()
                     return
 
-        progress_dialog = ProgressDialog(self)
+        roster = [self.folder_list.item(i).text() for i in range(self.folder_list.count())]
+        progress_dialog = ProgressDialog(self, Worker(roster, self.load_locales()))
         progress_dialog.start_task()
         progress_dialog.exec()
+        if progress_dialog.failed:
+            return
 
         # Save the current folder order to last_run.txt
-        current_order = ",".join([self.folder_list.item(i).text() for i in range(self.folder_list.count())])
+        current_order = ",".join(roster)
         with open(last_run_path, "w") as file:
             file.write(current_order)
 
         launch_modengine2()
 
 
+    def load_locales(self):
+        if os.path.exists(CONFIG_FILE):
+            with open(CONFIG_FILE, 'r') as file:
+                return json.load(file).get("locales")
+        return None
+
     def load_folder_order(self):
+        folder_order = []
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, 'r') as file:
                 config = json.load(file)
                 folder_order = config.get("folder_order", [])
 
-        for folder_name in os.listdir(FIGHTS_FOLDER):
-            folder_path = os.path.join(FIGHTS_FOLDER, folder_name)
-            if os.path.isdir(folder_path):
-                data_json_path = os.path.join(folder_path, "data.json")
-                design_file_found = False
-                for file_name in os.listdir(folder_path):
-                    if file_name.endswith(".design"):
-                        design_file_found = True
-                        break
-                if os.path.isfile(data_json_path) and design_file_found and folder_name not in folder_order:
-                    folder_order.append(folder_name)
+        self.catalog.refresh()
+        for folder_name in self.catalog.valid_folders():
+            if folder_name not in folder_order:
+                folder_order.append(folder_name)
 
         self.save_folder_order(folder_order)
         return folder_order
+
+    def filter_folders(self, text):
+        matches = set(self.catalog.search(text)) if text else None
+        for i in range(self.folder_list.count()):
+            item = self.folder_list.item(i)
+            item.setHidden(matches is not None and item.text() not in matches)
     def save_folder_order(self, folder_order=None):
         if folder_order is None:
             folder_order = [self.folder_list.item(i).text() for i in range(self.folder_list.count())]
@@ -372,19 +451,212 @@ class MainWindow(QMainWindow):
         with open(CONFIG_FILE, 'w') as file:
             json.dump(config, file, indent=4)
 
-def get_github_release(repo_owner, repo_name, tag=None) -> (str, list):
+def get_github_release(repo_owner, repo_name, tag=None, release_cache=None) -> (str, list):
+    """
+    Returns (tag, assets) for a release, or None if it couldn't be fetched.
+    If a release_cache dict is passed, answers younger than RELEASE_CACHE_TTL are reused without any request,
+    older ones are revalidated with their ETag, and the cached answer is used when offline.
+    """
     if tag:
         api_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/releases/tags/{tag}"
     else:
         api_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/releases/latest"
-    response = requests.get(api_url)
+
+    if release_cache is None:
+        release_cache = {}
+    cached = release_cache.get(api_url)
+    if cached and time.time() - cached["checked"] < RELEASE_CACHE_TTL:
+        return cached["tag"], cached["assets"]
+
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    try:
+        response = requests.get(api_url, headers=headers, timeout=NETWORK_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f"Could not check {repo_owner}/{repo_name} for updates: {e}")
+        return (cached["tag"], cached["assets"]) if cached else None
+
+    if response.status_code == 304 and cached:
+        cached["checked"] = time.time()
+        return cached["tag"], cached["assets"]
     if response.status_code == 200:
         release_data = response.json()
         latest_tag = release_data["tag_name"]
-        return latest_tag, release_data["assets"]
+        assets = [{"name": asset["name"], "browser_download_url": asset["browser_download_url"]} for asset in release_data["assets"]]
+        release_cache[api_url] = {
+            "etag": response.headers.get("ETag"),
+            "checked": time.time(),
+            "tag": latest_tag,
+            "assets": assets
+        }
+        return latest_tag, assets
     else:
-        return None
+        return (cached["tag"], cached["assets"]) if cached else None
 
+def hash_game_data(game_data_zip, hash_cache: dict):
+    """Streams the SHA-1 of game_data.zip, reusing the cached value if the size and mtime haven't changed."""
+    if not os.path.exists(game_data_zip):
+        return None
+    stat = os.stat(game_data_zip)
+    if hash_cache.get("size") == stat.st_size and hash_cache.get("mtime") == stat.st_mtime_ns:
+        return hash_cache["sha1"]
+
+    sha1 = hashlib.sha1()
+    with open(game_data_zip, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    game_data_hash = sha1.hexdigest().lower()
+    hash_cache.update({"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": game_data_hash})
+    return game_data_hash
+
+
+# Sizes and offsets at or past this need Zip64 records, which replace_zip_member leaves to zipfile
+ZIP64_LIMIT = 0xFFFFFFFF
+
+
+def read_central_directory(raw):
+    """
+    The raw central directory records of a zip, in order, or None if it uses Zip64 or doesn't have the plain layout
+    replace_zip_member can patch.
+    """
+    raw.seek(0, os.SEEK_END)
+    size = raw.tell()
+    raw.seek(max(size - (22 + 0xFFFF + 20), 0))
+    tail = raw.read()
+    eocd_offset = tail.rfind(b"PK\x05\x06")
+    if eocd_offset < 0:
+        return None
+    count, directory_size, directory_offset = struct.unpack_from("<HII", tail, eocd_offset + 10)
+    # A Zip64 end of central directory locator sits right before the regular one
+    if count == 0xFFFF or ZIP64_LIMIT in (directory_size, directory_offset) or tail[max(eocd_offset - 20, 0):eocd_offset - 16] == b"PK\x06\x07":
+        return None
+    raw.seek(directory_offset)
+    directory = raw.read(directory_size)
+
+    records = []
+    offset = 0
+    for _ in range(count):
+        if directory[offset:offset + 4] != b"PK\x01\x02":
+            return None
+        name_length, extra_length, comment_length = struct.unpack_from("<HHH", directory, offset + 28)
+        if has_zip64_extra(directory[offset + 46 + name_length:offset + 46 + name_length + extra_length]):
+            return None
+        end = offset + 46 + name_length + extra_length + comment_length
+        records.append(directory[offset:end])
+        offset = end
+    return records
+
+
+def has_zip64_extra(extra: bytes) -> bool:
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, data_size = struct.unpack_from("<HH", extra, offset)
+        if header_id == 0x0001:
+            return True
+        offset += 4 + data_size
+    return False
+
+
+def record_name(record: bytes) -> str:
+    flags, = struct.unpack_from("<H", record, 8)
+    name_length, = struct.unpack_from("<H", record, 28)
+    return record[46:46 + name_length].decode("utf-8" if flags & 0x800 else "cp437")
+
+
+def replace_zip_member(zip_path, member_name, data: bytes):
+    """
+    Rewrites a zip with the content of one member replaced.
+    Every other member is copied over byte for byte, without being decompressed or recompressed. Zip64 archives
+    go through a regular zipfile rewrite instead.
+    """
+    temp_path = f"{zip_path}.tmp"
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as source:
+            member_info = source.getinfo(member_name)
+            comment = source.comment
+        with open(zip_path, 'rb') as raw:
+            records = read_central_directory(raw)
+            if records is not None and os.path.getsize(zip_path) + len(data) < ZIP64_LIMIT:
+                with open(temp_path, 'wb') as target:
+                    write_replaced_zip(raw, target, records, member_info, data, comment)
+            else:
+                records = None
+        if records is None:
+            rewrite_zip_member(zip_path, temp_path, member_name, data)
+        os.replace(temp_path, zip_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_replaced_zip(raw, target, records, member_info: zipfile.ZipInfo, data: bytes, comment: bytes):
+    # The replacement's records come from zipfile, written on their own
+    new_info = zipfile.ZipInfo(member_info.filename, member_info.date_time)
+    new_info.compress_type = member_info.compress_type
+    new_info.external_attr = member_info.external_attr
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as single:
+        single.writestr(new_info, data)
+    new_record, = read_central_directory(buffer)
+    # Everything before its central directory record
+    new_local_record = buffer.getvalue()[:buffer.getvalue().rfind(new_record)]
+
+    central_records = []
+    for record in records:
+        offset = target.tell()
+        if record_name(record) == member_info.filename:
+            target.write(new_local_record)
+            record = new_record
+        else:
+            # Local file header, name and extra field, then the still-compressed data
+            flags, = struct.unpack_from("<H", record, 8)
+            compress_size, = struct.unpack_from("<I", record, 20)
+            header_offset, = struct.unpack_from("<I", record, 42)
+            raw.seek(header_offset)
+            local_header = raw.read(30)
+            if local_header[:4] != b"PK\x03\x04":
+                raise zipfile.BadZipFile(f"Bad local file header for {record_name(record)}")
+            name_length, extra_length = struct.unpack_from("<HH", local_header, 26)
+            record_length = 30 + name_length + extra_length + compress_size
+            if flags & 0x08:
+                # Data descriptor, with or without its optional signature. Its sizes are 8 bytes when the local header has a Zip64 extra.
+                local_extra = raw.read(name_length + extra_length)[name_length:]
+                descriptor_length = 20 if has_zip64_extra(local_extra) else 12
+                raw.seek(header_offset + record_length)
+                record_length += descriptor_length + 4 if raw.read(4) == b"PK\x07\x08" else descriptor_length
+            raw.seek(header_offset)
+            remaining = record_length
+            while remaining > 0:
+                chunk = raw.read(min(1024 * 1024, remaining))
+                if not chunk:
+                    raise zipfile.BadZipFile(f"Truncated data for {record_name(record)}")
+                target.write(chunk)
+                remaining -= len(chunk)
+        central_records.append(record[:42] + struct.pack("<I", offset) + record[46:])
+
+    directory_offset = target.tell()
+    for record in central_records:
+        target.write(record)
+    directory_size = target.tell() - directory_offset
+    target.write(struct.pack("<4sHHHHIIH", b"PK\x05\x06", 0, 0, len(central_records), len(central_records),
+                             directory_size, directory_offset, len(comment)) + comment)
+
+
+def rewrite_zip_member(zip_path, temp_path, member_name, data: bytes):
+    """Rewrites a zip through zipfile, recompressing every member. Slow, but handles anything zipfile can read."""
+    with zipfile.ZipFile(zip_path, 'r') as source, zipfile.ZipFile(temp_path, 'w') as target:
+        target.comment = source.comment
+        for info in source.infolist():
+            new_info = zipfile.ZipInfo(info.filename, info.date_time)
+            new_info.compress_type = info.compress_type
+            new_info.external_attr = info.external_attr
+            if info.filename == member_name:
+                target.writestr(new_info, data)
+                continue
+            new_info.file_size = info.file_size
+            with source.open(info) as member, target.open(new_info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as copy_target:
+                shutil.copyfileobj(member, copy_target, 1024 * 1024)
 
 def witchy_param_version_hack(witchy_dir):
     paramdex_path = os.path.join(witchy_dir, "Assets", "Paramdex")
@@ -400,36 +672,19 @@ def witchy_param_version_hack(witchy_dir):
                 with open(version_full_path, "w") as wp:
                     wp.write("1_07_2_0018")
 
-    # Update version in zip if it exists
+    # Update version in zip if it exists, only reading the one member we care about
     if os.path.exists(zip_path):
-        temp_dir = os.path.join(witchy_dir, "temp_zip")
-        try:
-            # Extract zip to temp directory
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            # Update version in extracted files
-            temp_version_path = os.path.join(temp_dir, version_relative_path)
-            if os.path.exists(temp_version_path):
-                with open(temp_version_path) as fp:
-                    current_version = fp.read().strip()
-                    if current_version == "1_07_1_0016L":
-                        with open(temp_version_path, "w") as wp:
-                            wp.write("1_07_2_0018")
-            # Create new zip file
-            os.remove(zip_path)  # Remove old zip
-            with zipfile.ZipFile(zip_path, 'w') as new_zip:
-                # Walk through the temporary directory and add all files
-                for root, _, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_name = os.path.relpath(file_path, temp_dir)
-                        new_zip.write(file_path, arc_name)
-        finally:
-            # Clean up temp directory
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-
-def check_tools():
+        version_member = None
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.filename.replace("\\", "/").lower() == "ac6/upgrader/version.txt":
+                    version_member = info.filename
+                    current_version = zip_ref.read(info).decode("utf-8", errors="replace").strip()
+                    break
+        if version_member and current_version == "1_07_1_0016L":
+            replace_zip_member(zip_path, version_member, b"1_07_2_0018")
+
+def load_versions() -> dict:
     os.makedirs(TOOLS_FOLDER, exist_ok=True)
 
     if not os.path.exists(VERSIONS_FILE):
@@ -442,43 +697,62 @@ def check_tools():
         versions = {}
         with open(VERSIONS_FILE, "w") as fp:
             json.dump({}, fp)
+    return versions
+
+def check_tool_versions(versions: dict) -> dict:
+    """
+    Does all the network and hashing work for check_tools, concurrently. Safe to run off the GUI thread.
+    Only touches the release_cache and game_data_hash entries of versions.
+    """
+    release_cache = versions.setdefault("release_cache", {})
+    game_data_hash_cache = versions.setdefault("game_data_hash", {})
+    game_data_zip = os.path.join(ARENA_MAKER_DATA_FOLDER, "game_data.zip")
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = {
+            "rewwise": executor.submit(get_github_release, "vswarte", "rewwise", release_cache=release_cache),
+            "texconv": executor.submit(get_github_release, "microsoft", "DirectXTex", release_cache=release_cache),
+            "witchy": executor.submit(get_github_release, "ividyon", "WitchyBND", release_cache=release_cache),
+            "ffdec": executor.submit(get_github_release, "jindrapetrik", "jpexs-decompiler", tag="version20.1.0", release_cache=release_cache),
+            "game_data": executor.submit(hash_game_data, game_data_zip, game_data_hash_cache),
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+def apply_tool_updates(versions: dict, updates: dict):
+    """Downloads whatever check_tool_versions found to be outdated. Must run on the GUI thread."""
+    # Work out everything that needs downloading first, so it can all be fetched in parallel
+    downloads = []
+    extractions = []
+    new_versions = {}
 
     rewwise_dir = os.path.join(TOOLS_FOLDER, "rewwise")
     os.makedirs(rewwise_dir, exist_ok=True)
-
-    latest_rewwise_release = get_github_release("vswarte", "rewwise")
+    latest_rewwise_release = updates["rewwise"]
     if latest_rewwise_release and versions.get("rewwise", "0.0") != latest_rewwise_release[0]:
         zip_path = os.path.join(rewwise_dir, "rewwise.zip")
-        DownloadDialog(f"Downloading rewwise", "https://github.com/vswarte/rewwise/releases/latest/download/binaries.zip", zip_path).exec()
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(rewwise_dir)
-        versions["rewwise"] = latest_rewwise_release[0]
+        downloads.append(("https://github.com/vswarte/rewwise/releases/latest/download/binaries.zip", zip_path, None))
+        extractions.append((zip_path, rewwise_dir))
+        new_versions["rewwise"] = latest_rewwise_release[0]
 
     texconv_path = os.path.join(TOOLS_FOLDER, "DirectXTex", "texconv.exe")
     os.makedirs(os.path.join(TOOLS_FOLDER, "DirectXTex"), exist_ok=True)
-    latest_texconv_release = get_github_release("microsoft", "DirectXTex")
+    latest_texconv_release = updates["texconv"]
     if latest_texconv_release and versions.get("texconv", "0.0") != latest_texconv_release[0]:
-        DownloadDialog(f"Downloading texconv", "https://github.com/microsoft/DirectXTex/releases/latest/download/texconv.exe", texconv_path).exec()
-        versions["texconv"] = latest_texconv_release[0]
+        downloads.append(("https://github.com/microsoft/DirectXTex/releases/latest/download/texconv.exe", texconv_path, None))
+        new_versions["texconv"] = latest_texconv_release[0]
 
     witchy_dir = os.path.join(TOOLS_FOLDER, "witchybnd")
     os.makedirs(witchy_dir, exist_ok=True)
-    latest_witchy_release = get_github_release("ividyon", "WitchyBND")
+    latest_witchy_release = updates["witchy"]
     if latest_witchy_release and versions.get("witchy", "0.0") != latest_witchy_release[0]:
         zip_path = os.path.join(witchy_dir, "witchy.zip")
-        DownloadDialog(f"Downloading WitchyBND", latest_witchy_release[1][0]["browser_download_url"], zip_path).exec()
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(witchy_dir)
-
-        versions["witchy"] = latest_witchy_release[0]
-
-    # Let's just make sure the paramdex version is corrected...
-    # 1_07_1_0016L
-    witchy_param_version_hack(witchy_dir)
+        downloads.append((latest_witchy_release[1][0]["browser_download_url"], zip_path, None))
+        extractions.append((zip_path, witchy_dir))
+        new_versions["witchy"] = latest_witchy_release[0]
 
     ffdec_dir = os.path.join(TOOLS_FOLDER, "ffdec")
     os.makedirs(ffdec_dir, exist_ok=True)
-    ffdec_release = get_github_release("jindrapetrik", "jpexs-decompiler", tag="version20.1.0")
+    ffdec_release = updates["ffdec"]
     if ffdec_release and versions.get("ffdec", "0.0") != ffdec_release[0]:
         zip_path = os.path.join(ffdec_dir, "ffdec.zip")
         download_url = None
@@ -487,25 +761,68 @@ def check_tools():
                 download_url = asset["browser_download_url"]
                 break
         if download_url:
-            DownloadDialog(f"Downloading ffdec", download_url, zip_path).exec()
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(ffdec_dir)
-
-            versions["ffdec"] = ffdec_release[0]
+            downloads.append((download_url, zip_path, None))
+            extractions.append((zip_path, ffdec_dir))
+            new_versions["ffdec"] = ffdec_release[0]
 
     game_data_zip = os.path.join(ARENA_MAKER_DATA_FOLDER, "game_data.zip")
-    if os.path.exists(game_data_zip):
-        with open(game_data_zip, 'rb') as file:
-            game_data_hash = hashlib.sha1(file.read()).hexdigest().lower()
-    else:
-        game_data_hash = None
+    game_data_hash = updates["game_data"]
+    expected_hash = "4D60E88729C9F89A2C8C6A2296CED7E7061D4D60".lower()
+    if not game_data_hash or game_data_hash != expected_hash:
+        downloads.append(("https://f004.backblazeb2.com/file/lugia19/game_data.zip", game_data_zip, expected_hash))
+
+    download_dialog = None
+    if len(downloads) == 1:
+        download_dialog = DownloadDialog(f"Downloading {os.path.basename(downloads[0][1])}...", *downloads[0])
+    elif len(downloads) > 1:
+        download_dialog = MultiDownloadDialog(f"Downloading {len(downloads)} files...", downloads)
+    if download_dialog:
+        download_dialog.exec()
+        if download_dialog.error:
+            # Nothing is marked as updated, the next check retries (and resumes) the downloads
+            print(f"Tool update failed: {download_dialog.error}")
+            return
+
+    for zip_path, destination in extractions:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(destination)
+    versions.update(new_versions)
+
+    # Let's just make sure the paramdex version is corrected...
+    # 1_07_1_0016L
+    witchy_param_version_hack(witchy_dir)
 
     json.dump(versions, open(VERSIONS_FILE, "w"), indent=4)
 
-    expected_hash = "4D60E88729C9F89A2C8C6A2296CED7E7061D4D60".lower()
-    download_url = "https://f004.backblazeb2.com/file/lugia19/game_data.zip"
-    if not game_data_hash or game_data_hash != expected_hash:
-        DownloadDialog(f"Downloading base game files...", download_url, game_data_zip).exec()
+def check_tools():
+    versions = load_versions()
+    apply_tool_updates(versions, check_tool_versions(versions))
+
+class ToolCheckWorker(QObject):
+    # versions, updates, and the exception if the check failed (the other two are None then)
+    finished = pyqtSignal(object, object, object)
+
+    def run(self):
+        try:
+            versions = load_versions()
+            updates = check_tool_versions(versions)
+        except Exception as e:
+            self.finished.emit(None, None, e)
+        else:
+            self.finished.emit(versions, updates, None)
+
+def start_tool_check(main_window):
+    # The compile button stays disabled until the tools are confirmed present and up to date
+    main_window.compile_button.setEnabled(False)
+    thread = QThread()
+    worker = ToolCheckWorker()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.finished.connect(thread.quit)
+    worker.finished.connect(main_window.tool_check_finished)
+    # Keep references around so they aren't garbage collected while running
+    main_window.tool_check = (thread, worker)
+    thread.start()
 
 
 if __name__ == "__main__":
@@ -529,6 +846,6 @@ if __name__ == "__main__":
     main_window = MainWindow()
     main_window.show()
 
-    check_tools()
+    start_tool_check(main_window)
 
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,169 @@
+import os
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from assetstore import BlobStore
+from core import FIGHTS_FOLDER, BLOBS_FOLDER, DummySignal
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+IGNORED_FOLDERS = ["__MACOSX"]
+
+
+class FightPackImporter:
+    """
+    Imports a zip of one or more fights into the fights folder.
+
+    The central directory is only read once: every entry is grouped by the fight it belongs to up front,
+    so validation and extraction never have to rescan the namelist.
+    Files go through the blob store, so assets shared between fights are only stored once.
+    """
+    def __init__(self, zip_path: str, fights_folder: str = FIGHTS_FOLDER, max_workers: int = None, blob_store: BlobStore = None):
+        self.zip_path = zip_path
+        self.fights_folder = fights_folder
+        self.blob_store = blob_store if blob_store else BlobStore(BLOBS_FOLDER)
+        self.max_workers = max_workers or min(8, (os.cpu_count() or 1) + 2)
+        self.fights: Dict[str, List[zipfile.ZipInfo]] = {}
+        self.strip_prefix = {}
+        self._local = threading.local()
+        self._handles = []
+        self._handles_lock = threading.Lock()
+        self.index()
+
+    def index(self):
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            entries = [info for info in zip_ref.infolist() if info.filename.split("/")[0] not in IGNORED_FOLDERS]
+
+        names = [info.filename for info in entries]
+        if "data.json" in names and any(name.endswith(".design") for name in names):
+            # data.json is in the root of the ZIP, so the whole thing is a single fight named after the zip
+            fight_name = os.path.splitext(os.path.basename(self.zip_path))[0]
+            self.fights[fight_name] = entries
+            self.strip_prefix[fight_name] = ""
+            return
+
+        # Otherwise each top level folder is a fight
+        for info in entries:
+            if "/" not in info.filename:
+                # Stray file in the root (readme or similar), not part of any fight
+                continue
+            folder_name = info.filename.split("/")[0]
+            self.fights.setdefault(folder_name, []).append(info)
+            self.strip_prefix[folder_name] = f"{folder_name}/"
+
+        if len(self.fights) == 0:
+            raise ValueError(f"Invalid folder structure in {self.zip_path}")
+
+        for folder_name, fight_entries in self.fights.items():
+            fight_names = [info.filename for info in fight_entries]
+            design_exists = any(name.endswith(".design") for name in fight_names)
+            if f"{folder_name}/data.json" not in fight_names or not design_exists:
+                raise ValueError(f"Invalid folder structure in {self.zip_path}")
+
+    def total_size(self) -> int:
+        return sum(info.file_size for fight_entries in self.fights.values() for info in fight_entries)
+
+    def extract(self, progress_callback=None) -> List[str]:
+        """
+        Extracts every fight, streaming members in parallel. progress_callback receives (bytes_done, bytes_total).
+        Returns the names of the imported fights.
+        """
+        jobs = []
+        for fight_name, fight_entries in self.fights.items():
+            fight_dir = os.path.join(self.fights_folder, fight_name)
+            os.makedirs(fight_dir, exist_ok=True)
+            for info in fight_entries:
+                relative_path = info.filename[len(self.strip_prefix[fight_name]):]
+                if relative_path == "":
+                    continue
+                destination = os.path.realpath(os.path.join(fight_dir, relative_path))
+                if os.path.commonpath([destination, os.path.realpath(fight_dir)]) != os.path.realpath(fight_dir):
+                    print(f"Skipping entry outside of the fight folder: {info.filename}")
+                    continue
+                if info.is_dir():
+                    os.makedirs(destination, exist_ok=True)
+                else:
+                    jobs.append((info, destination))
+
+        total_bytes = sum(info.file_size for info, _ in jobs)
+        done_bytes = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._extract_member, info, destination) for info, destination in jobs]
+                for future in as_completed(futures):
+                    done_bytes += future.result()
+                    if progress_callback:
+                        progress_callback(done_bytes, total_bytes)
+        finally:
+            for handle in self._handles:
+                handle.close()
+            self._handles = []
+
+        return list(self.fights.keys())
+
+    def _zip_handle(self) -> zipfile.ZipFile:
+        # Each thread gets its own handle, so members can be decompressed concurrently
+        handle = getattr(self._local, "zip_ref", None)
+        if handle is None:
+            handle = zipfile.ZipFile(self.zip_path, 'r')
+            self._local.zip_ref = handle
+            with self._handles_lock:
+                self._handles.append(handle)
+        return handle
+
+    def _extract_member(self, info: zipfile.ZipInfo, destination: str) -> int:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            with self._zip_handle().open(info, 'r') as source:
+                digest = self.blob_store.add_stream(source, STREAM_CHUNK_SIZE)
+            self.blob_store.link(digest, destination)
+        except zipfile.BadZipFile:
+            print(f"Skipping bad zip file: {info.filename}")
+        except Exception as e:
+            print(f"Error extracting {info.filename}: {str(e)}")
+        return info.file_size
+
+
+def import_fight_packs(zip_paths: List[str], progress_signal=None, warning_signal=None, fights_folder: str = FIGHTS_FOLDER,
+                       blob_store: BlobStore = None) -> List[str]:
+    """
+    Validates every zip before extracting anything, then extracts the valid ones one after the other.
+    Invalid zips are reported through warning_signal and skipped, they don't stop the others from being imported.
+    Returns the names of all the imported fights, in order.
+    """
+    if not progress_signal:
+        progress_signal = DummySignal()
+    if not warning_signal:
+        warning_signal = DummySignal()
+
+    progress_signal.emit(0, "Validating fight packs...")
+    importers = []
+    for zip_path in zip_paths:
+        try:
+            importers.append(FightPackImporter(zip_path, fights_folder, blob_store=blob_store))
+        except zipfile.BadZipFile as e:
+            print(f"Skipping {zip_path}: {e}")
+            warning_signal.emit(f"{zip_path}: {e}")
+        except ValueError as e:
+            print(f"Skipping {zip_path}: {e}")
+            warning_signal.emit(str(e))
+
+    total_bytes = sum(importer.total_size() for importer in importers)
+    previous_bytes = 0
+    imported_fights = []
+    for importer in importers:
+        message = f"Extracting {os.path.basename(importer.zip_path)}..."
+
+        def report(done_bytes, _, offset=previous_bytes, message=message):
+            if total_bytes:
+                progress_signal.emit(int(100 * (offset + done_bytes) / total_bytes), message)
+
+        progress_signal.emit(int(100 * previous_bytes / total_bytes) if total_bytes else 0, message)
+        for fight_name in importer.extract(report):
+            if fight_name not in imported_fights:
+                imported_fights.append(fight_name)
+        previous_bytes += importer.total_size()
+
+    progress_signal.emit(100, "Done!")
+    return imported_fights
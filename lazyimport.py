@@ -0,0 +1,29 @@
+import importlib
+import importlib.util
+import sys
+import types
+
+
+# Not importlib.util.LazyLoader: it needs the module's spec up front, and finding a submodule's spec imports its parent
+# package (PIL for PIL.Image), and before Python 3.12 two threads using a lazy module for the first time can both run it.
+class _LazyModule(types.ModuleType):
+    def __getattr__(self, attribute):
+        # Only reached while the real module hasn't been loaded into this proxy yet.
+        # import_module takes the import lock, so threads racing to the first use are safe.
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attribute)
+
+
+def lazy_import(name: str):
+    """
+    Returns a module that is only actually executed the first time one of its attributes is used.
+    Keeps heavy dependencies (numpy, PIL, etc) off the startup path until the code that needs them runs.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    # find_spec on a submodule would import its parent package, so only the top level package is looked up
+    top_level = name.partition(".")[0]
+    if importlib.util.find_spec(top_level) is None:
+        raise ModuleNotFoundError(f"No module named '{top_level}'", name=top_level)
+    return _LazyModule(name)
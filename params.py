@@ -0,0 +1,456 @@
+import os
+import re
+import struct
+import threading
+import zipfile
+from typing import Dict, List, Optional
+
+from lazyimport import lazy_import
+
+numpy = lazy_import("numpy")
+xmltodict = lazy_import("xmltodict")
+
+# PARAM format flags, as SoulsFormats names them
+FORMAT_FLAG01 = 0x01
+FORMAT_INT_DATA_OFFSET = 0x02
+FORMAT_LONG_DATA_OFFSET = 0x04
+FORMAT_OFFSET_PARAM_TYPE = 0x80
+FORMAT_UNICODE_ROW_NAMES = 0x01
+
+FIELD_TYPES = {
+    "s8": "<i1", "u8": "<u1", "s16": "<i2", "u16": "<u2", "s32": "<i4", "u32": "<u4", "b32": "<i4",
+    "f32": "<f4", "angle32": "<f4", "f64": "<f8", "dummy8": "<u1",
+}
+BIT_TYPES = {"u8": 8, "u16": 16, "u32": 32, "dummy8": 8}
+FIELD_DEF_PATTERN = re.compile(r"^(\w+)\s+(\w+)\s*(?:\[(\d+)\])?\s*(?::\s*(\d+))?\s*(?:=.*)?$")
+
+
+class ParamFormatError(ValueError):
+    pass
+
+
+class Field:
+    __slots__ = ("name", "type", "offset", "array_length", "bit_size", "bit_offset", "column")
+
+    def __init__(self, name: str, field_type: str, offset: int, array_length: int = 1, bit_size: int = 0, bit_offset: int = 0, column: str = None):
+        self.name = name
+        self.type = field_type
+        self.offset = offset
+        self.array_length = array_length
+        self.bit_size = bit_size
+        self.bit_offset = bit_offset
+        # The structured array column holding the value (the shared container for bitfields)
+        self.column = column if column else name
+
+    @property
+    def is_string(self) -> bool:
+        return self.type in ("fixstr", "fixstrW")
+
+    @property
+    def is_float(self) -> bool:
+        return self.type in ("f32", "angle32", "f64")
+
+    @property
+    def is_array(self) -> bool:
+        return self.array_length > 1 and not self.is_string and self.type != "dummy8"
+
+    @property
+    def is_padding(self) -> bool:
+        return self.type == "dummy8" and not self.bit_size
+
+
+class Paramdef:
+    """A row layout from a Paramdex definition, as a NumPy structured dtype plus named (bit)fields."""
+    def __init__(self, param_type: str, fields: List[Field], dtype):
+        self.param_type = param_type
+        self.fields = {field.name: field for field in fields}
+        self.dtype = dtype
+
+    @property
+    def row_size(self) -> int:
+        return self.dtype.itemsize
+
+    @classmethod
+    def parse(cls, xml_data: bytes) -> "Paramdef":
+        paramdef = xmltodict.parse(xml_data)["PARAMDEF"]
+        field_entries = paramdef["Fields"]["Field"]
+        if not isinstance(field_entries, list):
+            field_entries = [field_entries]
+
+        fields = []
+        names, formats, offsets = [], [], []
+        offset = 0
+        # Consecutive bitfields of the same type share one container until it runs out of bits, like SoulsFormats reads them
+        container = None
+
+        for field_entry in field_entries:
+            match = FIELD_DEF_PATTERN.match(field_entry["@Def"].strip())
+            if not match:
+                raise ParamFormatError(f"Can't parse field definition '{field_entry['@Def']}'")
+            field_type, name, array_length, bit_size = match.group(1), match.group(2), match.group(3), match.group(4)
+            array_length = int(array_length) if array_length else 1
+            bit_size = int(bit_size) if bit_size else 0
+            if name in names or any(field.name == name for field in fields):
+                name = f"{name}_{len(fields)}"
+
+            if bit_size and field_type in BIT_TYPES:
+                container_type = "u8" if field_type == "dummy8" else field_type
+                bit_limit = BIT_TYPES[container_type]
+                if container is None or container["type"] != container_type or container["bits"] + bit_size > bit_limit:
+                    container = {"type": container_type, "bits": 0, "column": f"__bits{offset:x}"}
+                    names.append(container["column"])
+                    formats.append(FIELD_TYPES[container_type])
+                    offsets.append(offset)
+                    offset += bit_limit // 8
+                fields.append(Field(name, field_type, offsets[-1], bit_size=bit_size, bit_offset=container["bits"], column=container["column"]))
+                container["bits"] += bit_size
+                continue
+            container = None
+
+            if field_type == "fixstr":
+                field_format, size = f"V{array_length}", array_length
+            elif field_type == "fixstrW":
+                field_format, size = f"V{array_length * 2}", array_length * 2
+            elif field_type == "dummy8":
+                field_format, size = f"V{array_length}", array_length
+            elif field_type in FIELD_TYPES:
+                # Numeric arrays are a subarray column, so their values read and write as one (array_length,) array per row
+                field_format = FIELD_TYPES[field_type] if array_length == 1 else (FIELD_TYPES[field_type], (array_length,))
+                size = numpy.dtype(FIELD_TYPES[field_type]).itemsize * array_length
+            else:
+                raise ParamFormatError(f"Unknown field type '{field_type}'")
+            fields.append(Field(name, field_type, offset, array_length))
+            names.append(name)
+            formats.append(field_format)
+            offsets.append(offset)
+            offset += size
+
+        dtype = numpy.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": offset})
+        return cls(paramdef["ParamType"], fields, dtype)
+
+
+class Paramdex:
+    """Loads the AC6 Paramdex definitions that ship with WitchyBND, either unpacked or still inside Paramdex.zip."""
+    def __init__(self, assets_folder: str, game: str = "AC6"):
+        self.folder = os.path.join(assets_folder, "Paramdex")
+        self.zip_path = os.path.join(assets_folder, "Paramdex.zip")
+        self.game = game
+        self._paramdefs = {}
+        self._lock = threading.Lock()
+
+    def _read_def(self, param_type: str) -> bytes:
+        def_path = os.path.join(self.folder, self.game, "Defs", param_type + ".xml")
+        if os.path.exists(def_path):
+            with open(def_path, "rb") as file:
+                return file.read()
+        if os.path.exists(self.zip_path):
+            member_name = f"{self.game}/Defs/{param_type}.xml".lower()
+            with zipfile.ZipFile(self.zip_path) as zip_ref:
+                for info in zip_ref.infolist():
+                    if info.filename.replace("\\", "/").lower() == member_name:
+                        return zip_ref.read(info)
+        raise FileNotFoundError(f"No Paramdex definition found for {param_type}")
+
+    def get(self, param_type: str) -> Paramdef:
+        with self._lock:
+            if param_type not in self._paramdefs:
+                self._paramdefs[param_type] = Paramdef.parse(self._read_def(param_type))
+            return self._paramdefs[param_type]
+
+
+def read_string(data: bytes, offset: int, unicode: bool) -> str:
+    if unicode:
+        end = data.find(b"\0\0", offset)
+        while end != -1 and (end - offset) % 2:
+            end = data.find(b"\0\0", end + 1)
+        return data[offset:end].decode("utf-16-le")
+    end = data.find(b"\0", offset)
+    return data[offset:end].decode("shift_jis")
+
+
+class Param:
+    """
+    A little endian PARAM, with the rows held in a NumPy structured array laid out by its Paramdex definition.
+    Row ids and names are kept in their own arrays, parallel to the rows.
+    """
+    def __init__(self, paramdef: Paramdef, ids, names: List[Optional[str]], rows, header: dict):
+        self.paramdef = paramdef
+        self.ids = ids
+        self.names = names
+        self.rows = rows
+        self.header = header
+
+    @classmethod
+    def parse(cls, data: bytes, paramdex: Paramdex) -> "Param":
+        if data[0x2C]:
+            raise ParamFormatError("Big endian params are not supported")
+        format_2d, format_2e, paramdef_format_version = data[0x2D], data[0x2E], data[0x2F]
+        unk06, data_version, row_count = struct.unpack_from("<hhH", data, 0x06)
+        if format_2d & FORMAT_OFFSET_PARAM_TYPE:
+            param_type_offset = struct.unpack_from("<q", data, 0x10)[0]
+            param_type = read_string(data, param_type_offset, False)
+        else:
+            param_type = data[0x0C:0x2C].split(b"\0")[0].rstrip(b" ").decode("shift_jis")
+
+        long_offsets = bool(format_2d & FORMAT_LONG_DATA_OFFSET)
+        if long_offsets:
+            headers_offset = 0x40
+            header_dtype = numpy.dtype([("id", "<i4"), ("unk", "<i4"), ("data", "<i8"), ("name", "<i8")])
+        else:
+            headers_offset = 0x40 if format_2d & FORMAT_FLAG01 and format_2d & FORMAT_INT_DATA_OFFSET else 0x30
+            header_dtype = numpy.dtype([("id", "<i4"), ("data", "<u4"), ("name", "<u4")])
+        row_headers = numpy.frombuffer(data, header_dtype, row_count, headers_offset)
+
+        paramdef = paramdex.get(param_type)
+        row_size = paramdef.row_size
+        data_offsets = row_headers["data"].astype(numpy.int64)
+        if row_count > 1 and not numpy.all(numpy.diff(data_offsets) == row_size):
+            raise ParamFormatError(f"{param_type} rows aren't {row_size} bytes each, the Paramdex definition doesn't match this param")
+        if row_count:
+            rows = numpy.frombuffer(data, paramdef.dtype, row_count, int(data_offsets[0])).copy()
+        else:
+            rows = numpy.zeros(0, paramdef.dtype)
+
+        unicode_names = bool(format_2e & FORMAT_UNICODE_ROW_NAMES)
+        names = [read_string(data, int(name_offset), unicode_names) if name_offset else None for name_offset in row_headers["name"]]
+        header = {
+            "unk06": unk06, "data_version": data_version, "format_2d": format_2d, "format_2e": format_2e,
+            "paramdef_format_version": paramdef_format_version, "param_type": param_type,
+        }
+        return cls(paramdef, row_headers["id"].copy(), names, rows, header)
+
+    @classmethod
+    def read(cls, path: str, paramdex: Paramdex) -> "Param":
+        with open(path, "rb") as file:
+            return cls.parse(file.read(), paramdex)
+
+    def copy(self) -> "Param":
+        return Param(self.paramdef, self.ids.copy(), list(self.names), self.rows.copy(), dict(self.header))
+
+    def field(self, name: str) -> Field:
+        if name not in self.paramdef.fields:
+            raise ParamFormatError(f"{self.header['param_type']} has no field '{name}'")
+        return self.paramdef.fields[name]
+
+    def column(self, name: str, rows=None):
+        """A field's values for all rows (or the given rows) as a NumPy array. Bitfields are extracted."""
+        rows = self.rows if rows is None else rows
+        if name == "id":
+            return self.ids
+        field = self.field(name)
+        values = rows[field.column]
+        if field.bit_size:
+            return (values >> field.bit_offset) & ((1 << field.bit_size) - 1)
+        return values
+
+    def find(self, name: str, value) -> Optional[int]:
+        """Index of the first row where the field equals value."""
+        matches = numpy.flatnonzero(self.column(name) == coerce_value(self.field(name), value))
+        return int(matches[0]) if len(matches) else None
+
+    def get(self, index: int, name: str, rows=None):
+        rows = self.rows if rows is None else rows
+        field = self.field(name)
+        if field.is_string:
+            raw = bytes(rows[field.column][index])
+            return raw.decode("utf-16-le").split("\0")[0] if field.type == "fixstrW" else raw.decode("shift_jis").split("\0")[0]
+        if field.is_array:
+            return self.column(name, rows)[index].tolist()
+        return self.column(name, rows)[index].item()
+
+    def set(self, rows, name: str, values, where=slice(None)):
+        """Writes values (one, or one per selected row) to a field of rows[where]."""
+        field = self.field(name)
+        if field.is_string:
+            encoding = "utf-16-le" if field.type == "fixstrW" else "shift_jis"
+            size = rows.dtype[field.column].itemsize
+            values = [values] if isinstance(values, str) else values
+            encoded = numpy.array([str(value).encode(encoding)[:size].ljust(size, b"\0") for value in values], dtype=f"V{size}")
+            rows[field.column][where] = encoded
+            return
+        if field.is_array:
+            # One list for every selected row, or one list per row
+            rows[field.column][where] = numpy.array(values, dtype=numpy.float64 if field.is_float else numpy.int64)
+            return
+        if isinstance(values, (list, tuple)):
+            values = numpy.array([coerce_value(field, value) for value in values], dtype=rows.dtype[field.column] if not field.bit_size else numpy.int64)
+        else:
+            values = coerce_value(field, values)
+        if field.bit_size:
+            container = rows[field.column]
+            mask = ((1 << field.bit_size) - 1) << field.bit_offset
+            patched = (container[where].astype(numpy.int64) & ~mask) | ((numpy.asarray(values, dtype=numpy.int64) << field.bit_offset) & mask)
+            container[where] = patched.astype(container.dtype)
+        else:
+            rows[field.column][where] = values
+
+    def row(self, index: int) -> "ParamRow":
+        """A copy-on-write view of a row. Its values are only read from the arrays when asked for."""
+        return ParamRow(self, self.rows[index:index + 1], int(self.ids[index]), self.names[index])
+
+    def add_overlay_rows(self, rows: List["ParamRow"]):
+        """Materializes overlay rows: their sources are gathered once, then each overridden field is written as one column."""
+        if not rows:
+            return
+        new_rows = numpy.concatenate([row.source for row in rows])
+        field_values = {}
+        for row_index, row in enumerate(rows):
+            for name, value in row.overrides.items():
+                indices, values = field_values.setdefault(name, ([], []))
+                indices.append(row_index)
+                values.append(value)
+        for name, (indices, values) in field_values.items():
+            self.set(new_rows, name, values, indices)
+        self.add_rows([row.id for row in rows], [row.name for row in rows], new_rows)
+
+    def add_rows(self, ids, names: List[Optional[str]], rows):
+        """Inserts rows in id order, each one after any existing rows with the same id."""
+        ids = numpy.asarray(ids, dtype=numpy.int32)
+        order = numpy.argsort(ids, kind="stable")
+        ids, rows, names = ids[order], rows[order], [names[i] for i in order]
+        if numpy.all(self.ids[1:] >= self.ids[:-1]):
+            positions = numpy.searchsorted(self.ids, ids, side="right")
+        else:
+            positions = numpy.array([(numpy.flatnonzero(self.ids > row_id)[:1].tolist() or [len(self.ids)])[0] for row_id in ids], dtype=numpy.int64)
+
+        self.rows = numpy.insert(self.rows, positions, rows)
+        self.ids = numpy.insert(self.ids, positions, ids)
+        merged_names = []
+        previous = 0
+        for position, name in zip(positions.tolist(), names):
+            merged_names.extend(self.names[previous:position])
+            merged_names.append(name)
+            previous = position
+        merged_names.extend(self.names[previous:])
+        self.names = merged_names
+
+    def encode(self) -> bytes:
+        header = self.header
+        format_2d = header["format_2d"]
+        long_offsets = bool(format_2d & FORMAT_LONG_DATA_OFFSET)
+        int_offsets = bool(format_2d & FORMAT_FLAG01 and format_2d & FORMAT_INT_DATA_OFFSET)
+        row_count = len(self.rows)
+        if row_count > 0xFFFF:
+            raise ParamFormatError(f"{header['param_type']} has too many rows ({row_count})")
+
+        output = bytearray(struct.pack("<IHhhH", 0, 0, header["unk06"], header["data_version"], row_count))
+        if format_2d & FORMAT_OFFSET_PARAM_TYPE:
+            output += struct.pack("<iq", 0, 0) + b"\0" * 0x14
+        else:
+            output += header["param_type"].encode("shift_jis").ljust(0x20, b" " if format_2d & FORMAT_FLAG01 else b"\0")
+        output += bytes([0, format_2d, header["format_2e"], header["paramdef_format_version"]])
+        if int_offsets or long_offsets:
+            output += b"\0" * 0x10
+
+        if long_offsets:
+            row_headers = numpy.zeros(row_count, numpy.dtype([("id", "<i4"), ("unk", "<i4"), ("data", "<i8"), ("name", "<i8")]))
+        else:
+            row_headers = numpy.zeros(row_count, numpy.dtype([("id", "<i4"), ("data", "<u4"), ("name", "<u4")]))
+        headers_offset = len(output)
+        data_start = headers_offset + row_headers.nbytes + (0x20 if format_2d == FORMAT_FLAG01 else 0)
+        strings_offset = data_start + self.rows.nbytes
+
+        strings = bytearray()
+        param_type_offset = 0
+        if format_2d & FORMAT_OFFSET_PARAM_TYPE:
+            param_type_offset = strings_offset
+            strings += header["param_type"].encode("ascii") + b"\0"
+        unicode_names = bool(header["format_2e"] & FORMAT_UNICODE_ROW_NAMES)
+        name_offsets = numpy.zeros(row_count, numpy.int64)
+        for index, name in enumerate(self.names):
+            if name is not None:
+                name_offsets[index] = strings_offset + len(strings)
+                strings += (name.encode("utf-16-le") + b"\0\0") if unicode_names else (name.encode("shift_jis") + b"\0")
+
+        row_headers["id"] = self.ids
+        row_headers["data"] = data_start + numpy.arange(row_count, dtype=numpy.int64) * self.paramdef.row_size
+        row_headers["name"] = name_offsets
+
+        struct.pack_into("<I", output, 0, strings_offset)
+        if format_2d & FORMAT_OFFSET_PARAM_TYPE:
+            struct.pack_into("<q", output, 0x10, param_type_offset)
+        if int_offsets:
+            struct.pack_into("<I", output, 0x30, data_start)
+        elif long_offsets:
+            struct.pack_into("<q", output, 0x30, data_start)
+        else:
+            struct.pack_into("<H", output, 0x04, data_start)
+
+        output += row_headers.tobytes()
+        if format_2d == FORMAT_FLAG01:
+            output += b"\0" * 0x20
+        output += self.rows.tobytes()
+        output += strings
+        return bytes(output)
+
+    def write(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.encode())
+
+
+class ParamRow:
+    """
+    A row as a sparse overlay on a source row: only the fields that were set are stored, everything else is read
+    from the source (a one row view into the arrays of the param it came from) on demand.
+    Keys use the @field form WitchyBND's XML used, plus @id and @paramdexName for the row id and name.
+    """
+    __slots__ = ("param", "source", "id", "name", "overrides")
+
+    def __init__(self, param: Param, source, row_id: int, name: Optional[str], overrides: Optional[Dict[str, object]] = None):
+        self.param = param
+        self.source = source
+        self.id = row_id
+        self.name = name
+        self.overrides = overrides if overrides is not None else {}
+
+    def __getitem__(self, key: str):
+        if key == "@id":
+            return self.id
+        if key == "@paramdexName":
+            return self.name
+        field_name = key[1:]
+        if field_name in self.overrides:
+            return self.overrides[field_name]
+        return self.param.get(0, field_name, self.source)
+
+    def __setitem__(self, key: str, value):
+        if key == "@id":
+            self.id = int(value)
+        elif key == "@paramdexName":
+            self.name = value
+        elif key.startswith("@"):
+            # Field names come from the shared Paramdef, so every overlay keys its values with the same strings
+            self.overrides[self.param.field(key[1:]).name] = value
+        # Keys without the @ prefix were never param fields in the XML either, so they're skipped
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except ParamFormatError:
+            return default
+
+    def overlay(self, values: dict) -> "ParamRow":
+        """A new row on the same source, with this row's overrides plus values."""
+        row = ParamRow(self.param, self.source, self.id, self.name, dict(self.overrides))
+        for key, value in values.items():
+            row[key] = value
+        return row
+
+    def to_dict(self) -> Dict[str, object]:
+        """Every value of the row, without the padding."""
+        row = {"@id": self.id, "@paramdexName": self.name}
+        for name, field in self.param.paramdef.fields.items():
+            if not field.is_padding:
+                row[f"@{name}"] = self[f"@{name}"]
+        return row
+
+
+def coerce_value(field: Optional[Field], value):
+    if isinstance(value, str):
+        value = value.strip()
+        if field is not None and field.is_float:
+            return float(value)
+        return int(float(value)) if any(char in value for char in ".eE") else int(value)
+    if field is not None and field.is_float:
+        return float(value)
+    return int(value)
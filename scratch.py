@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+# Points the scratch workspace at a RAM disk. Linux has /dev/shm, Windows has no RAM disk out of the box,
+# so this is how to use one there (an ImDisk drive, for example)
+RAM_FOLDER_VARIABLE = "AC6_ARENA_MAKER_RAM_FOLDER"
+RAM_FOLDER_CANDIDATES = ["/dev/shm"]
+DEFAULT_RAM_BUDGET = 512 * 1024 * 1024
+# Always leave this much of the RAM disk free for everything else on the machine
+RAM_HEADROOM = 64 * 1024 * 1024
+
+
+def default_ram_folder() -> Optional[str]:
+    configured = os.environ.get(RAM_FOLDER_VARIABLE)
+    for folder in [configured] if configured else RAM_FOLDER_CANDIDATES:
+        if os.path.isdir(folder) and os.access(folder, os.W_OK | os.X_OK):
+            return folder
+    return None
+
+
+class ScratchWorkspace:
+    """
+    Private space for a build's intermediate files (resized images, temp wavs, texconv output...).
+
+    Directories are handed out on a RAM disk (/dev/shm, or the folder in AC6_ARENA_MAKER_RAM_FOLDER) when there is one,
+    as long as their expected sizes stay within the budget. Anything that doesn't fit, anything of unknown size, or every
+    directory if there's no RAM disk, goes to disk instead. Everything is removed by cleanup().
+    """
+    def __init__(self, disk_folder: str, ram_budget: int = DEFAULT_RAM_BUDGET, ram_folder: Optional[str] = None):
+        os.makedirs(disk_folder, exist_ok=True)
+        self.disk_root = tempfile.mkdtemp(prefix="build-", dir=disk_folder)
+        self.ram_budget = ram_budget
+        self.ram_root = None
+        # Expected sizes of the RAM directories handed out, until their owners remove them
+        self._ram_dirs = {}
+        self._ram_used = 0
+        self._lock = threading.Lock()
+
+        ram_folder = ram_folder if ram_folder else default_ram_folder()
+        if ram_folder and ram_budget > 0:
+            try:
+                self.ram_root = tempfile.mkdtemp(prefix="ac6_arena_maker-", dir=ram_folder)
+            except OSError:
+                self.ram_root = None
+
+    def _release_removed_dirs(self):
+        for path in [path for path in self._ram_dirs if not os.path.isdir(path)]:
+            self._ram_used -= self._ram_dirs.pop(path)
+
+    def make_dir(self, prefix: str, expected_size: int = 0) -> str:
+        """A fresh directory for intermediates expected to take up to expected_size bytes (0 if unknown)."""
+        with self._lock:
+            if self.ram_root and expected_size > 0:
+                self._release_removed_dirs()
+                fits_budget = self._ram_used + expected_size <= self.ram_budget
+                if fits_budget and shutil.disk_usage(self.ram_root).free >= expected_size + RAM_HEADROOM:
+                    path = tempfile.mkdtemp(prefix=prefix, dir=self.ram_root)
+                    self._ram_dirs[path] = expected_size
+                    self._ram_used += expected_size
+                    return path
+            return tempfile.mkdtemp(prefix=prefix, dir=self.disk_root)
+
+    def cleanup(self):
+        for root in [self.ram_root, self.disk_root]:
+            if root:
+                shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,281 @@
+import struct
+import zlib
+from typing import List, Tuple
+
+# Binder format flags, as SoulsFormats names them
+FORMAT_BIG_ENDIAN = 0x01
+FORMAT_IDS = 0x02
+FORMAT_NAMES1 = 0x04
+FORMAT_NAMES2 = 0x08
+FORMAT_LONG_OFFSETS = 0x10
+FORMAT_COMPRESSION = 0x20
+
+FILE_FLAG1 = 0x02
+
+TPF_PLATFORM_PC = 0
+TPF_ENCODING_UTF16 = 1
+
+
+def reverse_bits(value: int) -> int:
+    return int(f"{value:08b}"[::-1], 2)
+
+
+def align(data: bytearray, alignment: int):
+    data.extend(b"\0" * (-len(data) % alignment))
+
+
+def dcx_dflt(data: bytes) -> bytes:
+    """Wraps data in a DCX_DFLT_11000_44_9_15 container (zlib, which the game reads everywhere Kraken is used)."""
+    compressed = zlib.compress(data, 9)
+    header = b"DCX\0" + struct.pack(">5I", 0x11000, 0x18, 0x24, 0x44, 0x4C)
+    header += b"DCS\0" + struct.pack(">II", len(data), len(compressed))
+    header += b"DCP\0" + b"DFLT" + struct.pack(">I", 0x20)
+    header += bytes([9, 0, 0, 0]) + struct.pack(">I", 0) + bytes([15, 0, 0, 0]) + struct.pack(">II", 0, 0x00010100)
+    header += b"DCA\0" + struct.pack(">I", 8)
+    return header + compressed
+
+
+def path_hash(name: str) -> int:
+    hashable = name.strip().replace("\\", "/").lower()
+    if not hashable.startswith("/"):
+        hashable = "/" + hashable
+    value = 0
+    for char in hashable:
+        value = (value * 37 + ord(char)) & 0xFFFFFFFF
+    return value
+
+
+def is_prime(candidate: int) -> bool:
+    if candidate < 2:
+        return False
+    if candidate == 2:
+        return True
+    if candidate % 2 == 0:
+        return False
+    divisor = 3
+    while divisor * divisor <= candidate:
+        if candidate % divisor == 0:
+            return False
+        divisor += 2
+    return True
+
+
+def bnd4_hash_table(names: List[str], table_offset: int) -> bytes:
+    group_count = next(count for count in range(len(names) // 7, 100001) if is_prime(count))
+    groups = [[] for _ in range(group_count)]
+    for index, name in enumerate(names):
+        name_hash = path_hash(name)
+        groups[name_hash % group_count].append((name_hash, index))
+
+    group_entries = bytearray()
+    hash_entries = bytearray()
+    count = 0
+    for group in groups:
+        group.sort()
+        group_entries += struct.pack("<ii", len(group), count)
+        for name_hash, index in group:
+            hash_entries += struct.pack("<Ii", name_hash, index)
+        count += len(group)
+
+    hashes_offset = table_offset + 0x10 + len(group_entries)
+    return struct.pack("<qIBBBB", hashes_offset, group_count, 0x10, 8, 8, 0) + group_entries + hash_entries
+
+
+def bnd4(files: List[Tuple[int, str, bytes]], version: str = "07D7R6", extended: int = 4, unicode: bool = True,
+         file_format: int = FORMAT_IDS | FORMAT_NAMES1 | FORMAT_NAMES2 | FORMAT_COMPRESSION, file_flags: int = FILE_FLAG1) -> bytes:
+    """
+    Writes a little endian BND4 from (id, name, data) entries, matching what WitchyBND produces for the same manifest.
+    Only the layouts this project packs are supported: 32 bit data offsets, IDs, names and uncompressed entries.
+    """
+    if file_format & (FORMAT_BIG_ENDIAN | FORMAT_LONG_OFFSETS) or not file_format & FORMAT_IDS or not file_format & (FORMAT_NAMES1 | FORMAT_NAMES2):
+        raise ValueError(f"Unsupported BND4 format 0x{file_format:02X}")
+    file_header_size = 0x10 + 4 + (8 if file_format & FORMAT_COMPRESSION else 0) + 4 + 4
+
+    names_start = 0x40 + file_header_size * len(files)
+    encoded_names = [(name.encode("utf-16-le") + b"\0\0") if unicode else (name.encode("shift_jis") + b"\0") for _, name, _ in files]
+    name_offsets = []
+    names = bytearray()
+    for encoded_name in encoded_names:
+        name_offsets.append(names_start + len(names))
+        names += encoded_name
+
+    headers_end = names_start + len(names)
+    hash_table = b""
+    hash_table_offset = 0
+    if extended == 4:
+        hash_table_offset = headers_end + (-headers_end % 8)
+        hash_table = bnd4_hash_table([name for _, name, _ in files], hash_table_offset)
+        headers_end = hash_table_offset + len(hash_table)
+
+    data = bytearray()
+    data_offsets = []
+    for _, _, file_data in files:
+        if file_data:
+            data_start = headers_end + len(data)
+            data += b"\0" * (-data_start % 0x10)
+        data_offsets.append(headers_end + len(data))
+        data += file_data
+
+    output = bytearray(b"BND4")
+    output += bytes([0, 0, 0, 0, 0, 0, 1, 0])
+    output += struct.pack("<iq", len(files), 0x40)
+    output += version.encode("ascii").ljust(8, b"\0")
+    output += struct.pack("<qq", file_header_size, headers_end)
+    output += bytes([int(unicode), reverse_bits(file_format), extended, 0])
+    output += struct.pack("<iq", 0, hash_table_offset)
+
+    for index, (file_id, _, file_data) in enumerate(files):
+        output += bytes([reverse_bits(file_flags), 0, 0, 0]) + struct.pack("<iq", -1, len(file_data))
+        if file_format & FORMAT_COMPRESSION:
+            output += struct.pack("<q", len(file_data))
+        output += struct.pack("<Iii", data_offsets[index], file_id, name_offsets[index])
+
+    output += names
+    if extended == 4:
+        align(output, 8)
+        output += hash_table
+    output += data
+    return bytes(output)
+
+
+def tpf(textures: List[Tuple[str, int, int, bytes]], flag2: int = 3, encoding: int = TPF_ENCODING_UTF16) -> bytes:
+    """Writes a PC TPF from (name without extension, format, flags1, dds data) entries."""
+    header_size = 0x10 + 0x14 * len(textures)
+    encoded_names = [(name.encode("utf-16-le") + b"\0\0") if encoding == TPF_ENCODING_UTF16 else (name.encode("shift_jis") + b"\0") for name, _, _, _ in textures]
+    name_offsets = []
+    names_size = 0
+    for encoded_name in encoded_names:
+        name_offsets.append(header_size + names_size)
+        names_size += len(encoded_name)
+
+    data_start = header_size + names_size
+    data = bytearray()
+    data_offsets = []
+    for _, _, _, dds_data in textures:
+        if dds_data:
+            data += b"\0" * (-(data_start + len(data)) % 4)
+        data_offsets.append(data_start + len(data))
+        data += dds_data
+
+    output = bytearray(b"TPF\0")
+    output += struct.pack("<Ii", len(data), len(textures))
+    output += bytes([TPF_PLATFORM_PC, flag2, encoding, 0])
+    for index, (_, texture_format, flags1, dds_data) in enumerate(textures):
+        mipmaps = struct.unpack_from("<I", dds_data, 28)[0] if len(dds_data) >= 32 else 1
+        output += struct.pack("<Ii", data_offsets[index], len(dds_data))
+        output += bytes([texture_format, 0, max(1, min(mipmaps, 255)), flags1])
+        output += struct.pack("<Ii", name_offsets[index], 0)
+    for encoded_name in encoded_names:
+        output += encoded_name
+    output += data
+    return bytes(output)
+
+
+def luagnl(global_names: List[str]) -> bytes:
+    """Writes a little endian, long format LUAGNL listing the given globals."""
+    offsets_size = 8 * (len(global_names) + 1)
+    names = bytearray()
+    offsets = []
+    for name in global_names:
+        offsets.append(offsets_size + len(names))
+        names += name.encode("shift_jis") + b"\0"
+    output = bytearray(struct.pack(f"<{len(offsets) + 1}q", *offsets, 0))
+    output += names
+    align(output, 0x10)
+    return bytes(output)
+
+
+class Fmg:
+    """
+    A text table, as id -> text (None for entries that exist without text).
+    Reads the little endian FMG versions 1 and 2 (wide offsets, used from DS3 on), writes them back the way SoulsFormats does.
+    """
+    def __init__(self, entries: dict = None, version: int = 2):
+        self.entries = entries if entries is not None else {}
+        self.version = version
+
+    @classmethod
+    def parse(cls, data: bytes) -> "Fmg":
+        if data[1]:
+            raise ValueError("Big endian FMGs are not supported")
+        version = data[2]
+        if version not in (1, 2):
+            raise ValueError(f"Unsupported FMG version {version}")
+        wide = version == 2
+        group_count, string_count = struct.unpack_from("<ii", data, 0x0C)
+        if wide:
+            string_offsets_offset = struct.unpack_from("<q", data, 0x18)[0]
+            groups_offset, group_size, offset_format = 0x28, 0x10, "<q"
+        else:
+            string_offsets_offset = struct.unpack_from("<i", data, 0x14)[0]
+            groups_offset, group_size, offset_format = 0x1C, 0x0C, "<i"
+        offset_size = struct.calcsize(offset_format)
+
+        entries = {}
+        for group_index in range(group_count):
+            offset_index, first_id, last_id = struct.unpack_from("<iii", data, groups_offset + group_index * group_size)
+            for index in range(last_id - first_id + 1):
+                string_offset = struct.unpack_from(offset_format, data, string_offsets_offset + (offset_index + index) * offset_size)[0]
+                text = None
+                if string_offset > 0:
+                    # The terminator is the first aligned UTF-16 null, a match straddling two characters doesn't count
+                    end = data.find(b"\0\0", string_offset)
+                    while end != -1 and (end - string_offset) % 2:
+                        end = data.find(b"\0\0", end + 1)
+                    if end == -1:
+                        raise ValueError(f"Unterminated string for FMG entry {first_id + index}")
+                    text = data[string_offset:end].decode("utf-16-le")
+                entries[first_id + index] = text
+        return cls(entries, version)
+
+    @classmethod
+    def read(cls, path: str) -> "Fmg":
+        with open(path, "rb") as file:
+            return cls.parse(file.read())
+
+    def encode(self) -> bytes:
+        wide = self.version == 2
+        ids = sorted(self.entries)
+
+        groups = []
+        index = 0
+        while index < len(ids):
+            start = index
+            while index + 1 < len(ids) and ids[index + 1] == ids[index] + 1:
+                index += 1
+            groups.append((start, ids[start], ids[index]))
+            index += 1
+
+        header_size = 0x28 if wide else 0x1C
+        offset_format = "<q" if wide else "<i"
+        string_offsets_offset = header_size + len(groups) * (0x10 if wide else 0x0C)
+        strings_offset = string_offsets_offset + len(ids) * struct.calcsize(offset_format)
+
+        offsets = bytearray()
+        strings = bytearray()
+        for entry_id in ids:
+            text = self.entries[entry_id]
+            if text is None:
+                offsets += struct.pack(offset_format, 0)
+            else:
+                offsets += struct.pack(offset_format, strings_offset + len(strings))
+                strings += str(text).encode("utf-16-le") + b"\0\0"
+
+        file_size = strings_offset + len(strings)
+        output = bytearray(bytes([0, 0, self.version, 0]))
+        output += struct.pack("<i", file_size) + bytes([1, 0, 0, 0])
+        output += struct.pack("<ii", len(groups), len(ids))
+        if wide:
+            output += struct.pack("<iqq", 0xFF, string_offsets_offset, 0)
+        else:
+            output += struct.pack("<ii", string_offsets_offset, 0)
+        for offset_index, first_id, last_id in groups:
+            output += struct.pack("<iii", offset_index, first_id, last_id)
+            if wide:
+                output += struct.pack("<i", 0)
+        output += offsets + strings
+        return bytes(output)
+
+    def write(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.encode())
@@ -0,0 +1,282 @@
+import struct
+import zlib
+from typing import List, Optional
+
+# Tag codes
+END = 0
+SHOW_FRAME = 1
+REMOVE_OBJECT2 = 28
+DEFINE_SPRITE = 39
+EXPORT_ASSETS = 56
+PLACE_OBJECT2 = 26
+PLACE_OBJECT3 = 70
+SYMBOL_CLASS = 76
+DEFINE_EXTERNAL_IMAGE = 1001
+DEFINE_EXTERNAL_IMAGE2 = 1009
+
+# Tags whose body starts with the UI16 id of the character they define
+CHARACTER_TAGS = {2, 6, 7, 10, 11, 14, 20, 21, 22, 32, 33, 34, 35, 36, 37, 39, 46, 48, 60, 75, 83, 84, 87, 90, 91}
+
+SIGNATURES = {
+    b"FWS": False, b"GFX": False,
+    b"CWS": True, b"CFX": True,
+}
+
+# Where the rank images are placed in the arenarank sprite
+RANK_IMAGE_DEPTH = 1
+RANK_IMAGE_TRANSLATE = (-2320, -1280)
+RANK_IMAGE_TRANSLATE_BITS = 13
+RANK_IMAGE_FORMAT = 13
+RANK_IMAGE_SIZE = (232, 128)
+
+
+class SwfFormatError(ValueError):
+    pass
+
+
+class Tag:
+    """A raw tag. Only the bodies of the tags being edited are ever decoded."""
+    __slots__ = ("code", "body", "long_header")
+
+    def __init__(self, code: int, body: bytes, long_header: bool = False):
+        self.code = code
+        self.body = body
+        self.long_header = long_header
+
+    def encode(self) -> bytes:
+        if self.long_header or len(self.body) >= 0x3F:
+            return struct.pack("<HI", (self.code << 6) | 0x3F, len(self.body)) + self.body
+        return struct.pack("<H", (self.code << 6) | len(self.body)) + self.body
+
+
+class Swf:
+    def __init__(self, signature: bytes, version: int, movie_header: bytes, tags: List[Tag]):
+        self.signature = signature
+        self.version = version
+        self.movie_header = movie_header
+        self.tags = tags
+
+    @classmethod
+    def read(cls, path: str) -> "Swf":
+        with open(path, "rb") as file:
+            data = file.read()
+        signature = data[:3]
+        if signature not in SIGNATURES:
+            raise SwfFormatError(f"Unsupported signature {signature!r}")
+        version = data[3]
+        file_length = struct.unpack_from("<I", data, 4)[0]
+        if SIGNATURES[signature]:
+            try:
+                body = zlib.decompress(data[8:])
+            except zlib.error as e:
+                raise SwfFormatError(f"Bad zlib stream: {e}")
+        else:
+            body = data[8:]
+        if len(body) + 8 != file_length:
+            raise SwfFormatError(f"File length mismatch: header says {file_length}, got {len(body) + 8}")
+
+        # Frame size RECT (5 bit field size, then four fields), frame rate and frame count
+        rect_bits = 5 + 4 * (body[0] >> 3)
+        header_length = (rect_bits + 7) // 8 + 4
+        tags, _ = read_tags(body, header_length)
+        return cls(signature, version, body[:header_length], tags)
+
+    def write(self, path: str):
+        body = self.movie_header + b"".join(tag.encode() for tag in self.tags)
+        if not self.tags or self.tags[-1].code != END:
+            body += Tag(END, b"").encode()
+        header = self.signature + bytes([self.version]) + struct.pack("<I", len(body) + 8)
+        with open(path, "wb") as file:
+            file.write(header)
+            file.write(zlib.compress(body) if SIGNATURES[self.signature] else body)
+
+
+def read_tags(data: bytes, offset: int, end: Optional[int] = None) -> (List[Tag], int):
+    """Reads tags up to and including the End tag. Returns the tags and the offset right after them."""
+    end = len(data) if end is None else end
+    tags = []
+    while offset < end:
+        if offset + 2 > end:
+            raise SwfFormatError("Truncated tag header")
+        code_and_length = struct.unpack_from("<H", data, offset)[0]
+        offset += 2
+        code, length = code_and_length >> 6, code_and_length & 0x3F
+        long_header = length == 0x3F
+        if long_header:
+            length = struct.unpack_from("<I", data, offset)[0]
+            offset += 4
+        if offset + length > end:
+            raise SwfFormatError(f"Tag {code} runs past the end of the data")
+        tags.append(Tag(code, data[offset:offset + length], long_header))
+        offset += length
+        if code == END:
+            break
+    return tags, offset
+
+
+class BitWriter:
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value: int, bit_count: int):
+        self.value = (self.value << bit_count) | (value & ((1 << bit_count) - 1))
+        self.bits += bit_count
+
+    def getvalue(self) -> bytes:
+        padding = (8 - self.bits % 8) % 8
+        return (self.value << padding).to_bytes((self.bits + padding) // 8, "big")
+
+
+def read_net_string(data: bytes, offset: int) -> (str, int):
+    length = data[offset]
+    return data[offset + 1:offset + 1 + length].decode("ascii"), offset + 1 + length
+
+
+def net_string(text: str) -> bytes:
+    encoded = text.encode("ascii")
+    if len(encoded) > 255:
+        raise SwfFormatError(f"Name too long: {text}")
+    return bytes([len(encoded)]) + encoded
+
+
+class ExternalImage:
+    """Body of a DefineExternalImage2 tag."""
+    def __init__(self, character_id: int, bitmap_format: int, width: int, height: int, export_name: str, file_name: str, extra: bytes = b""):
+        self.character_id = character_id
+        self.bitmap_format = bitmap_format
+        self.width = width
+        self.height = height
+        self.export_name = export_name
+        self.file_name = file_name
+        self.extra = extra
+
+    @classmethod
+    def parse(cls, body: bytes) -> "ExternalImage":
+        try:
+            character_id, bitmap_format, width, height = struct.unpack_from("<IHHH", body, 0)
+            export_name, offset = read_net_string(body, 10)
+            file_name, offset = read_net_string(body, offset)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise SwfFormatError(f"Unexpected DefineExternalImage2 layout: {e}")
+        # Sanity checks, so a layout this reader doesn't know about fails loudly instead of producing a broken file
+        if character_id > 0xFFFF or len(body) - offset > 16 or not file_name.startswith(export_name):
+            raise SwfFormatError(f"Unexpected DefineExternalImage2 layout for '{export_name}'")
+        return cls(character_id, bitmap_format, width, height, export_name, file_name, body[offset:])
+
+    def encode(self) -> bytes:
+        return (struct.pack("<IHHH", self.character_id, self.bitmap_format, self.width, self.height)
+                + net_string(self.export_name) + net_string(self.file_name) + self.extra)
+
+
+def place_object3(character_id: int) -> Tag:
+    flags = 0x02 | 0x04  # HasCharacter, HasMatrix
+    image_flags = 0x10  # HasImage
+    matrix = BitWriter()
+    matrix.write(0, 1)  # HasScale
+    matrix.write(0, 1)  # HasRotate
+    matrix.write(RANK_IMAGE_TRANSLATE_BITS, 5)
+    matrix.write(RANK_IMAGE_TRANSLATE[0], RANK_IMAGE_TRANSLATE_BITS)
+    matrix.write(RANK_IMAGE_TRANSLATE[1], RANK_IMAGE_TRANSLATE_BITS)
+    body = struct.pack("<BBHH", flags, image_flags, RANK_IMAGE_DEPTH, character_id) + matrix.getvalue()
+    return Tag(PLACE_OBJECT3, body, long_header=True)
+
+
+def remove_object2() -> Tag:
+    return Tag(REMOVE_OBJECT2, struct.pack("<H", RANK_IMAGE_DEPTH))
+
+
+def placed_character_id(tag: Tag) -> Optional[int]:
+    if tag.code not in (PLACE_OBJECT2, PLACE_OBJECT3) or not tag.body[0] & 0x02:
+        return None
+    offset = 3 if tag.code == PLACE_OBJECT2 else 4
+    if tag.code == PLACE_OBJECT3 and tag.body[1] & 0x08:
+        offset = tag.body.index(b"\0", offset) + 1  # Class name
+    return struct.unpack_from("<H", tag.body, offset)[0]
+
+
+def symbol_names(tags: List[Tag]) -> dict:
+    names = {}
+    for tag in tags:
+        if tag.code not in (SYMBOL_CLASS, EXPORT_ASSETS):
+            continue
+        count = struct.unpack_from("<H", tag.body, 0)[0]
+        offset = 2
+        for _ in range(count):
+            character_id = struct.unpack_from("<H", tag.body, offset)[0]
+            end = tag.body.index(b"\0", offset + 2)
+            names[character_id] = tag.body[offset + 2:end].decode("utf-8", errors="replace")
+            offset = end + 1
+    return names
+
+
+def add_rank_images(gfx_file: str, rank_image_files: List[dict]) -> bool:
+    """
+    Adds the custom rank images to a menu GFX: one DefineExternalImage2 per image, and frames in the arenarank sprite
+    that show them. rank_image_files holds {"filename", "rankID"} dicts, the assigned "characterID" is filled in.
+    Returns False if the file has no ArenaRank images to extend.
+    """
+    swf = Swf.read(gfx_file)
+
+    highest_character_id = 0
+    arena_rank_00000d_id = None
+    last_rank_image_index = None
+    for index, tag in enumerate(swf.tags):
+        if tag.code in CHARACTER_TAGS and len(tag.body) >= 2:
+            highest_character_id = max(highest_character_id, struct.unpack_from("<H", tag.body, 0)[0])
+        elif tag.code == DEFINE_EXTERNAL_IMAGE and len(tag.body) >= 2:
+            highest_character_id = max(highest_character_id, struct.unpack_from("<H", tag.body, 0)[0])
+        elif tag.code == DEFINE_EXTERNAL_IMAGE2:
+            image = ExternalImage.parse(tag.body)
+            highest_character_id = max(highest_character_id, image.character_id)
+            if "ArenaRank" in image.export_name:
+                last_rank_image_index = index
+                if image.export_name == "ArenaRank_00000d":
+                    arena_rank_00000d_id = image.character_id
+
+    if arena_rank_00000d_id is None:
+        print("ArenaRank_00000d.tga not found.")
+        return False
+
+    base_character_id_offset = ((highest_character_id // 100) + 1) * 100
+    new_images = []
+    for idx, image_file_data in enumerate(rank_image_files):
+        image_file_data["characterID"] = base_character_id_offset + idx
+        image_name = image_file_data["filename"][:-4]
+        new_images.append(Tag(DEFINE_EXTERNAL_IMAGE2, ExternalImage(base_character_id_offset + idx, RANK_IMAGE_FORMAT, *RANK_IMAGE_SIZE,
+                                                                     image_name, f"{image_name}.tga").encode()))
+    # Same order as inserting each one right after the last ArenaRank image
+    swf.tags[last_rank_image_index + 1:last_rank_image_index + 1] = reversed(new_images)
+
+    names_by_character_id = symbol_names(swf.tags)
+    sprite_index = None
+    for index, tag in enumerate(swf.tags):
+        if tag.code == DEFINE_SPRITE and "arenarank" in names_by_character_id.get(struct.unpack_from("<H", tag.body, 0)[0], "").lower():
+            sprite_index = index
+    if sprite_index is None:
+        raise SwfFormatError("No arenarank sprite found")
+
+    sprite = swf.tags[sprite_index]
+    sprite_tags, end_offset = read_tags(sprite.body, 4)
+    if end_offset != len(sprite.body):
+        raise SwfFormatError("Unexpected data after the arenarank sprite's End tag")
+    if not any(placed_character_id(tag) == arena_rank_00000d_id for tag in sprite_tags):
+        raise SwfFormatError("The arenarank sprite doesn't place ArenaRank_00000d")
+
+    images_by_rank = {image["rankID"]: image for image in rank_image_files}
+    last_image_id = max(images_by_rank.keys())
+    patched_tags = []
+    frame_count = 1
+    for tag in sprite_tags:
+        if tag.code == SHOW_FRAME:
+            if frame_count - 1 in images_by_rank:
+                patched_tags.append(remove_object2())
+                patched_tags.append(place_object3(images_by_rank[frame_count - 1]["characterID"]))
+            if frame_count == last_image_id + 2:
+                patched_tags.append(place_object3(arena_rank_00000d_id))
+            frame_count += 1
+        patched_tags.append(tag)
+
+    sprite.body = sprite.body[:4] + b"".join(tag.encode() for tag in patched_tags)
+    swf.write(gfx_file)
+    return True
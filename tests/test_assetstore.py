@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+from assetstore import BlobStore, hash_file
+
+
+def import_file(store, content, destination):
+    digest = store.add_stream(io.BytesIO(content))
+    store.link(digest, str(destination))
+    return digest
+
+
+def test_identical_files_share_a_blob(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = import_file(store, b"image", tmp_path / "a.png")
+    second = import_file(store, b"image", tmp_path / "b.png")
+    assert first == second
+    assert os.path.samefile(store.blob_path(first), tmp_path / "b.png")
+
+
+def test_edited_blob_is_replaced_on_the_next_import(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = import_file(store, b"original image", tmp_path / "a.png")
+    # Edited in place through the fight's link, so the blob's content no longer matches its name
+    with open(tmp_path / "a.png", "wb") as file:
+        file.write(b"edited")
+    assert not store.is_intact(digest)
+
+    assert import_file(store, b"original image", tmp_path / "b.png") == digest
+    with open(tmp_path / "b.png", "rb") as file:
+        assert file.read() == b"original image"
+    with open(tmp_path / "a.png", "rb") as file:
+        assert file.read() == b"edited"
+    assert store.is_intact(digest)
+
+
+def test_edited_blob_is_not_linked(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = import_file(store, b"original audio", tmp_path / "a.wav")
+    with open(tmp_path / "a.wav", "wb") as file:
+        file.write(b"edited")
+    with pytest.raises(ValueError):
+        store.link(digest, str(tmp_path / "b.wav"))
+    assert not os.path.exists(tmp_path / "b.wav")
+
+
+def test_collect_garbage(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    fights_folder = tmp_path / "fights"
+    fights_folder.mkdir()
+    kept = import_file(store, b"kept", fights_folder / "kept.png")
+    removed = import_file(store, b"removed", fights_folder / "removed.png")
+    edited = import_file(store, b"original", fights_folder / "edited.png")
+    copied = import_file(store, b"copied", fights_folder / "data.json")
+    os.remove(fights_folder / "removed.png")
+    with open(fights_folder / "edited.png", "wb") as file:
+        file.write(b"edited!!")
+
+    assert store.collect_garbage(str(fights_folder)) == len(b"removed")
+    assert os.path.exists(store.blob_path(kept)) and os.path.exists(store.blob_path(copied))
+    assert not os.path.exists(store.blob_path(removed))
+    # The modified blob is dropped from the store, the fight keeps its edit
+    assert not os.path.exists(store.blob_path(edited))
+    with open(fights_folder / "edited.png", "rb") as file:
+        assert file.read() == b"edited!!"
+    assert hash_file(str(fights_folder / "edited.png")) != edited
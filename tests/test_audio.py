@@ -0,0 +1,56 @@
+import numpy
+import pytest
+import soundfile as sf
+
+import core
+
+
+def tone(frequency, rate, seconds=1.0, amplitude=0.5):
+    t = numpy.arange(int(rate * seconds)) / rate
+    return (amplitude * numpy.sin(2 * numpy.pi * frequency * t)).astype(numpy.float32)[:, None]
+
+
+def resample(signal, source_rate, target_rate, block_frames=4096):
+    blocks = (signal[start:start + block_frames] for start in range(0, len(signal), block_frames))
+    return numpy.concatenate(list(core.resample_blocks(blocks, source_rate, target_rate)))
+
+
+def level(signal, frequency, rate):
+    """Amplitude of one frequency, ignoring the edges where the filter ramps in and out."""
+    middle = signal[len(signal) // 4:3 * len(signal) // 4, 0].astype(numpy.float64)
+    t = numpy.arange(len(middle)) / rate
+    return 2 * abs(numpy.mean(middle * numpy.exp(-2j * numpy.pi * frequency * t)))
+
+
+@pytest.mark.parametrize("source_rate", [96000, 88200])
+def test_downsampling_does_not_alias(source_rate):
+    # 30kHz is above the 24kHz Nyquist frequency of the output, linear interpolation folds it back down to 18kHz (or 18.2)
+    output = resample(tone(30000, source_rate), source_rate, 48000)
+    alias_frequency = 48000 - 30000
+    assert level(output, alias_frequency, 48000) < 0.5 * 10 ** (-60 / 20)
+
+
+@pytest.mark.parametrize("source_rate", [22050, 44100, 96000])
+def test_passband_is_kept(source_rate):
+    output = resample(tone(1000, source_rate), source_rate, 48000)
+    assert len(output) == 48000
+    assert level(output, 1000, 48000) == pytest.approx(0.5, abs=0.005)
+
+
+def test_block_size_does_not_change_the_output():
+    signal = numpy.random.default_rng(0).uniform(-0.5, 0.5, (44100, 2)).astype(numpy.float32)
+    assert numpy.allclose(resample(signal, 44100, 48000, 1000), resample(signal, 44100, 48000, 65536), atol=1e-6)
+
+
+def test_preprocess_audio_only_normalizes_when_asked(tmp_path):
+    input_file = str(tmp_path / "clip.wav")
+    sf.write(input_file, tone(1000, 48000, amplitude=0.25), 48000)
+
+    core.preprocess_audio(input_file, str(tmp_path / "kept.wav"))
+    kept, rate = sf.read(str(tmp_path / "kept.wav"), always_2d=True)
+    assert rate == 48000 and kept.shape[1] == 2
+    assert numpy.abs(kept).max() == pytest.approx(0.25, abs=0.001)
+
+    core.preprocess_audio(input_file, str(tmp_path / "normalized.wav"), peak_dbfs=-1.0)
+    normalized, _ = sf.read(str(tmp_path / "normalized.wav"), always_2d=True)
+    assert numpy.abs(normalized).max() == pytest.approx(10 ** (-1 / 20), abs=0.001)
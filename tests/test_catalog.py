@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from catalog import FightCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    fights_folder = tmp_path / "fights"
+    for folder, ac_name in [("my_fight", "Steel Haze"), ("myXfight", "Sunlight"), ("100% Rusty", "Back\\slash"), ("Rusty 1000", "Lumen")]:
+        (fights_folder / folder).mkdir(parents=True)
+        (fights_folder / folder / "ac.design").write_bytes(b"design")
+        (fights_folder / folder / "data.json").write_text(json.dumps({"textData": {"acName": ac_name}}))
+    catalog = FightCatalog(str(tmp_path / "catalog.db"), str(fights_folder))
+    catalog.refresh()
+    yield catalog
+    catalog.close()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("_", ["my_fight"]),
+    ("my_f", ["my_fight"]),
+    ("%", ["100% Rusty"]),
+    ("100%", ["100% Rusty"]),
+    ("\\", ["100% Rusty"]),
+    ("rusty", ["100% Rusty", "Rusty 1000"]),
+    ("fight", ["myXfight", "my_fight"]),
+])
+def test_search_matches_text_literally(catalog, text, expected):
+    assert catalog.search(text) == expected
+
+
+def test_errors_lists_invalid_fights(catalog, tmp_path):
+    broken = tmp_path / "fights" / "Broken"
+    broken.mkdir()
+    (broken / "ac.design").write_bytes(b"design")
+    (broken / "data.json").write_text('{"textData": ')
+    catalog.refresh()
+    assert "Broken" not in catalog.valid_folders()
+    assert list(catalog.errors()) == ["Broken"] and catalog.errors()["Broken"].startswith("Could not read data.json")
+
+
+@pytest.mark.parametrize("data", ["[1, 2]", "42", '"text"', '{"textData": [], "fileData": "ac.design"}'])
+def test_data_json_of_the_wrong_shape(catalog, tmp_path, data):
+    odd = tmp_path / "fights" / "Odd"
+    odd.mkdir()
+    (odd / "ac.design").write_bytes(b"design")
+    (odd / "data.json").write_text(data)
+    assert "Odd" in catalog.refresh()
+    if data.startswith("{"):
+        assert catalog.get("Odd")["valid"]
+    else:
+        assert catalog.errors() == {"Odd": "data.json doesn't hold a JSON object"}
+    assert "my_fight" in catalog.valid_folders()
@@ -0,0 +1,13 @@
+from daemon import BuildDaemon, BuildJob
+
+
+def test_prebuild_gives_way_to_builds(tmp_path):
+    daemon = BuildDaemon(authkey=b"test", fights_directory=str(tmp_path))
+    daemon.last_roster = ["Fight A"]
+
+    daemon.current_job = BuildJob(["Fight A"], None)
+    assert not daemon.prebuild("Fight A")
+    daemon.current_job = None
+    daemon.pending[None] = BuildJob(["Fight A"], None)
+    assert not daemon.prebuild("Fight A")
+    assert daemon.prebuild_token is None
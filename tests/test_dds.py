@@ -0,0 +1,174 @@
+import struct
+
+import numpy
+import pytest
+
+import dds
+
+
+def expand_565(value):
+    red, green, blue = value >> 11, (value >> 5) & 0x3F, value & 0x1F
+    return numpy.array([(red << 3) | (red >> 2), (green << 2) | (green >> 4), (blue << 3) | (blue >> 2)], dtype=numpy.float64)
+
+
+def decode_color_block(block, bc1: bool):
+    """Reference BC1/DXT1 color block decoder, as the format spec defines it. Returns (16, 4) RGBA."""
+    color0, color1, indices = struct.unpack("<HHI", block)
+    palette = [expand_565(color0), expand_565(color1)]
+    alphas = [255, 255, 255, 255]
+    if color0 > color1 or not bc1:
+        palette += [(2 * palette[0] + palette[1]) / 3, (palette[0] + 2 * palette[1]) / 3]
+    else:
+        palette += [(palette[0] + palette[1]) / 2, numpy.zeros(3)]
+        alphas[3] = 0
+    pixels = numpy.zeros((16, 4))
+    for pixel in range(16):
+        index = (indices >> (2 * pixel)) & 3
+        pixels[pixel, :3] = palette[index]
+        pixels[pixel, 3] = alphas[index]
+    return pixels
+
+
+def decode_alpha_block(block):
+    alpha0, alpha1 = block[0], block[1]
+    if alpha0 > alpha1:
+        palette = [alpha0, alpha1] + [((7 - i) * alpha0 + i * alpha1) / 7 for i in range(1, 7)]
+    else:
+        palette = [alpha0, alpha1] + [((5 - i) * alpha0 + i * alpha1) / 5 for i in range(1, 5)] + [0, 255]
+    indices = int.from_bytes(block[2:8], "little")
+    return numpy.array([palette[(indices >> (3 * pixel)) & 7] for pixel in range(16)], dtype=numpy.float64)
+
+
+def decode(data):
+    """Decodes a DDS written by encode_dds back to an (height, width, 4) array."""
+    height, width = struct.unpack_from("<II", data, 12)
+    four_cc = data[84:88]
+    body = data[128:]
+    if four_cc == b"\0\0\0\0":
+        return numpy.frombuffer(body, numpy.uint8).reshape(height, width, 4)[:, :, [2, 1, 0, 3]].astype(numpy.float64)
+    block_size = 8 if four_cc == b"DXT1" else 16
+    block_rows, block_columns = (height + 3) // 4, (width + 3) // 4
+    assert len(body) == block_rows * block_columns * block_size
+    image = numpy.zeros((block_rows * 4, block_columns * 4, 4))
+    for index in range(block_rows * block_columns):
+        block = body[index * block_size:(index + 1) * block_size]
+        if four_cc == b"DXT1":
+            pixels = decode_color_block(block, bc1=True)
+        else:
+            pixels = decode_color_block(block[8:], bc1=False)
+            pixels[:, 3] = decode_alpha_block(block[:8])
+        row, column = divmod(index, block_columns)
+        image[row * 4:row * 4 + 4, column * 4:column * 4 + 4] = pixels.reshape(4, 4, 4)
+    return image[:height, :width]
+
+
+def color_blocks(data):
+    """(color0, color1, indices) of every color block."""
+    block_size = 8 if data[84:88] == b"DXT1" else 16
+    body = data[128:]
+    return [struct.unpack_from("<HHI", body, offset + block_size - 8) for offset in range(0, len(body), block_size)]
+
+
+@pytest.mark.parametrize("dds_format, four_cc, block_size", [(dds.BC1, b"DXT1", 8), (dds.BC3, b"DXT5", 16), (dds.B8G8R8A8, b"\0\0\0\0", None)])
+@pytest.mark.parametrize("width, height", [(4, 4), (5, 7), (64, 32), (1, 1)])
+def test_header_and_body_size(dds_format, four_cc, block_size, width, height):
+    data = dds.encode_dds(numpy.zeros((height, width, 4), numpy.uint8), dds_format)
+    magic, size, flags, header_height, header_width, pitch_or_linear_size, depth, mipmaps = struct.unpack_from("<4s7I", data, 0)
+    assert (magic, size, header_height, header_width, depth, mipmaps) == (b"DDS ", 124, height, width, 0, 1)
+    pixel_format_size, pixel_format_flags, header_four_cc = struct.unpack_from("<II4s", data, 76)
+    assert pixel_format_size == 32 and header_four_cc == four_cc
+    assert struct.unpack_from("<I", data, 108)[0] == dds.DDSCAPS_TEXTURE
+    required = dds.DDSD_CAPS | dds.DDSD_HEIGHT | dds.DDSD_WIDTH | dds.DDSD_PIXELFORMAT | dds.DDSD_MIPMAPCOUNT
+    assert flags & required == required
+    if block_size:
+        body_size = ((width + 3) // 4) * ((height + 3) // 4) * block_size
+        assert flags & dds.DDSD_LINEARSIZE and pixel_format_flags == dds.DDPF_FOURCC
+    else:
+        body_size = width * height * 4
+        assert flags & dds.DDSD_PITCH and pixel_format_flags == dds.DDPF_RGB | dds.DDPF_ALPHAPIXELS
+        assert struct.unpack_from("<I4I", data, 88) == (32, 0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000)
+    assert pitch_or_linear_size == (body_size if block_size else width * 4)
+    assert len(data) == 128 + body_size
+
+
+def test_uncompressed_is_lossless():
+    pixels = numpy.random.default_rng(1).integers(0, 256, (3, 5, 4), dtype=numpy.uint8)
+    assert numpy.array_equal(decode(dds.encode_dds(pixels, dds.B8G8R8A8)), pixels)
+
+
+@pytest.mark.parametrize("dds_format", [dds.BC1, dds.BC3])
+@pytest.mark.parametrize("color", [(200, 100, 50), (0, 0, 0), (255, 255, 255), (8, 130, 250)])
+def test_solid_block(dds_format, color):
+    pixels = numpy.zeros((4, 4, 4), numpy.uint8)
+    pixels[:, :] = color + (255,)
+    data = dds.encode_dds(pixels, dds_format)
+    decoded = decode(data)
+    # Within 565 quantization
+    assert numpy.abs(decoded[:, :, :3] - color).max() <= 4
+    assert (decoded[:, :, 3] == 255).all()
+    # Never the 3 color mode: either color0 > color1, or a single color every index points at color0
+    color0, color1, indices = color_blocks(data)[0]
+    assert color0 > color1 or indices == 0
+
+
+def test_alpha_gradient():
+    pixels = numpy.zeros((4, 4, 4), numpy.uint8)
+    pixels[:, :, :3] = 255
+    pixels[:, :, 3] = numpy.arange(16).reshape(4, 4) * 17
+    data = dds.encode_dds(pixels, dds.BC3)
+    body = data[128:]
+    # 8 value mode, between the block's extremes
+    assert (body[0], body[1]) == (255, 0)
+    decoded = decode(data)
+    assert numpy.abs(decoded[:, :, 3] - pixels[:, :, 3]).max() <= 255 / 7 / 2 + 1
+    assert decoded[0, 0, 3] == 0 and decoded[3, 3, 3] == 255
+
+
+def test_uniform_alpha():
+    pixels = numpy.full((4, 4, 4), 77, numpy.uint8)
+    decoded = decode(dds.encode_dds(pixels, dds.BC3))
+    assert (decoded[:, :, 3] == 77).all()
+
+
+def test_punch_through_block():
+    pixels = numpy.zeros((4, 4, 4), numpy.uint8)
+    pixels[:, :, :3] = [30, 200, 90]
+    pixels[:, :, 3] = 255
+    pixels[::2, ::2, 3] = 0
+    pixels[1, 1, :3] = [90, 40, 200]
+    data = dds.encode_dds(pixels, dds.BC1)
+    color0, color1, _ = color_blocks(data)[0]
+    # Transparency needs the 3 color mode
+    assert color0 <= color1
+    decoded = decode(data)
+    transparent = pixels[:, :, 3] < 128
+    assert (decoded[:, :, 3][transparent] == 0).all() and (decoded[:, :, 3][~transparent] == 255).all()
+    opaque_error = numpy.abs(decoded[:, :, :3] - pixels[:, :, :3])[~transparent]
+    assert opaque_error.max() <= 40
+
+
+@pytest.mark.parametrize("dds_format", [dds.BC1, dds.BC3])
+def test_gradient_image_not_a_multiple_of_4(dds_format):
+    height, width = 13, 22
+    y, x = numpy.mgrid[0:height, 0:width]
+    # Every block's colors lie on a line, which the 4 color palette can follow closely
+    position = (x + y) / (width + height - 2)
+    pixels = numpy.stack([20 + 200 * position, 200 - 150 * position, 60 + 100 * position, numpy.full_like(position, 255)],
+                         axis=-1).astype(numpy.uint8)
+    data = dds.encode_dds(pixels, dds_format)
+    decoded = decode(data)
+    assert decoded.shape == pixels.shape
+    error = numpy.abs(decoded[:, :, :3] - pixels[:, :, :3])
+    assert error.mean() < 4 and error.max() <= 12
+    for color0, color1, indices in color_blocks(data):
+        assert color0 > color1 or indices == 0
+
+
+def test_edge_blocks_repeat_the_last_pixels():
+    pixels = numpy.zeros((5, 5, 4), numpy.uint8)
+    pixels[:, :, 3] = 255
+    pixels[4, :, :3] = 255
+    pixels[:, 4, :3] = 255
+    decoded = decode(dds.encode_dds(pixels, dds.BC3))
+    # The padding of the partial blocks is white like their edge, so the white edge decodes exactly white
+    assert (decoded[4, :, :3] >= 250).all() and (decoded[:4, :4, :3] <= 5).all()
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import downloads
+from downloads import Download, DownloadError
+
+PAYLOAD = bytes(range(256)) * 4096  # 1MB
+
+
+class FileServer(ThreadingHTTPServer):
+    """Serves PAYLOAD, optionally with byte ranges, and can cut the first response short to simulate a dropped connection."""
+    daemon_threads = True
+
+    def __init__(self, ranges=True):
+        super().__init__(("127.0.0.1", 0), FileHandler)
+        self.ranges = ranges
+        self.cut_next_response_at = None
+        self.requested_ranges = []
+        self.bytes_sent = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/file.bin"
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def send_payload_headers(self, status, length, content_range=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", '"payload"')
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.send_payload_headers(200, len(PAYLOAD))
+
+    def do_GET(self):
+        start, end = 0, len(PAYLOAD) - 1
+        range_header = self.headers.get("Range")
+        if self.server.ranges and range_header:
+            first, last = range_header.split("=")[1].split("-")
+            start, end = int(first), int(last) if last else len(PAYLOAD) - 1
+            self.server.requested_ranges.append((start, end))
+            self.send_payload_headers(206, end - start + 1, f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            self.send_payload_headers(200, len(PAYLOAD))
+
+        body = PAYLOAD[start:end + 1]
+        if self.server.cut_next_response_at is not None:
+            body = body[:self.server.cut_next_response_at]
+            self.server.cut_next_response_at = None
+            self.close_connection = True
+        self.wfile.write(body)
+        self.server.bytes_sent += len(body)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**kwargs):
+        server = FileServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_ranged_download_in_segments(serve, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloads, "SEGMENT_MIN_SIZE", 256 * 1024)
+    server = serve()
+    location = str(tmp_path / "file.bin")
+
+    Download(server.url, location, hashlib.sha1(PAYLOAD).hexdigest(), segments=4).run()
+
+    assert read(location) == PAYLOAD
+    assert sorted(server.requested_ranges) == [(0, 262143), (262144, 524287), (524288, 786431), (786432, 1048575)]
+    assert not os.path.exists(location + ".part")
+    assert not os.path.exists(location + ".part.json")
+
+
+def test_interrupted_download_resumes(serve, tmp_path, monkeypatch):
+    monkeypatch.setattr(downloads, "SEGMENT_RETRIES", 0)
+    server = serve()
+    location = str(tmp_path / "file.bin")
+
+    server.cut_next_response_at = 300000
+    with pytest.raises(Exception):
+        Download(server.url, location, segments=1).run()
+    assert os.path.exists(location + ".part.json")
+    assert not os.path.exists(location)
+
+    server.requested_ranges.clear()
+    server.bytes_sent = 0
+    Download(server.url, location, hashlib.sha1(PAYLOAD).hexdigest(), segments=1).run()
+
+    assert read(location) == PAYLOAD
+    # Only the missing part was fetched again
+    assert server.requested_ranges[0][0] > 0
+    assert server.bytes_sent < len(PAYLOAD)
+
+
+def test_hash_mismatch_fails_and_discards_the_data(serve, tmp_path):
+    server = serve()
+    location = str(tmp_path / "file.bin")
+
+    with pytest.raises(DownloadError):
+        Download(server.url, location, "0" * 40).run()
+
+    assert not os.path.exists(location)
+    assert not os.path.exists(location + ".part")
+    assert not os.path.exists(location + ".part.json")
+
+
+def test_server_without_ranges(serve, tmp_path):
+    server = serve(ranges=False)
+    location = str(tmp_path / "file.bin")
+
+    Download(server.url, location, hashlib.sha1(PAYLOAD).hexdigest()).run()
+
+    assert read(location) == PAYLOAD
+    assert server.requested_ranges == []
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough for a slow CI machine, importing a heavy dependency eagerly blows straight through it
+IMPORT_BUDGET_MS = 400
+HEAVY_MODULES = ["numpy", "PIL", "soundfile", "xmltodict", "chardet"]
+
+
+def import_times(module: str) -> dict:
+    """Cumulative import time in microseconds of every module loaded by importing module, as reported by -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_core_import_defers_heavy_dependencies():
+    times = import_times("core")
+    assert [module for module in times if module.split(".")[0] in HEAVY_MODULES] == []
+
+
+def test_core_import_time():
+    # Best of a few runs, the first one may have to compile the modules
+    best = min(import_times("core")["core"] for _ in range(3))
+    assert best / 1000 < IMPORT_BUDGET_MS
@@ -0,0 +1,40 @@
+import os
+import zipfile
+
+from assetstore import BlobStore
+from importer import import_fight_packs
+
+
+class Messages:
+    def __init__(self):
+        self.messages = []
+
+    def emit(self, message):
+        self.messages.append(message)
+
+
+def write_zip(path, files):
+    with zipfile.ZipFile(path, "w") as zip_ref:
+        for name, content in files.items():
+            zip_ref.writestr(name, content)
+    return str(path)
+
+
+def test_invalid_zips_are_skipped(tmp_path):
+    fights_folder = tmp_path / "fights"
+    fights_folder.mkdir()
+    good = write_zip(tmp_path / "good.zip", {"Fight A/data.json": "{}", "Fight A/ac.design": b"design"})
+    missing_design = write_zip(tmp_path / "missing_design.zip", {"Fight B/data.json": "{}"})
+    not_a_zip = str(tmp_path / "not_a_zip.zip")
+    with open(not_a_zip, "wb") as file:
+        file.write(b"not a zip")
+    single = write_zip(tmp_path / "Fight C.zip", {"data.json": "{}", "ac.design": b"design"})
+
+    warnings = Messages()
+    imported = import_fight_packs([missing_design, good, not_a_zip, single], warning_signal=warnings,
+                                  fights_folder=str(fights_folder), blob_store=BlobStore(str(tmp_path / "blobs")))
+
+    assert imported == ["Fight A", "Fight C"]
+    assert sorted(os.listdir(fights_folder)) == ["Fight A", "Fight C"]
+    assert len(warnings.messages) == 2
+    assert missing_design in warnings.messages[0] and not_a_zip in warnings.messages[1]
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+import pytest
+
+from lazyimport import lazy_import
+
+
+def run(code: str):
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_submodule_parent_is_not_imported():
+    run("""
+import sys
+from lazyimport import lazy_import
+Image = lazy_import("PIL.Image")
+assert "PIL" not in sys.modules and "PIL.Image" not in sys.modules
+assert Image.open is sys.modules["PIL.Image"].open
+assert Image.Image is sys.modules["PIL.Image"].Image
+""")
+
+
+def test_concurrent_first_use():
+    run("""
+import threading
+from lazyimport import lazy_import
+numpy = lazy_import("numpy")
+barrier = threading.Barrier(16)
+results = []
+def use():
+    barrier.wait()
+    results.append(int(numpy.arange(4).sum()))
+threads = [threading.Thread(target=use) for _ in range(16)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert results == [6] * 16, results
+""")
+
+
+def test_missing_module():
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("not_a_real_module.submodule")
+
+
+def test_already_imported_module_is_returned():
+    assert lazy_import("sys") is sys
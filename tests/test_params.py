@@ -0,0 +1,155 @@
+import struct
+
+import numpy
+import pytest
+
+import params
+from params import Param, ParamFormatError, Paramdex
+
+PARAM_TYPE = "TEST_PARAM_ST"
+PARAMDEF = """<?xml version="1.0" encoding="utf-8"?>
+<PARAMDEF XmlVersion="3">
+  <ParamType>TEST_PARAM_ST</ParamType>
+  <DataVersion>1</DataVersion>
+  <BigEndian>False</BigEndian>
+  <Unicode>True</Unicode>
+  <FormatVersion>203</FormatVersion>
+  <Fields>
+    <Field Def="s32 value = 0" />
+    <Field Def="u8 flagA:1 = 0" />
+    <Field Def="u8 flagB:3 = 0" />
+    <Field Def="dummy8 pad0:4" />
+    <Field Def="dummy8 pad1[3]" />
+    <Field Def="f32 scale = 1" />
+    <Field Def="s16 values[3]" />
+    <Field Def="u16 tail = 0" />
+    <Field Def="fixstr label[8]" />
+    <Field Def="fixstrW wideLabel[4]" />
+    <Field Def="u32 low:20 = 0" />
+    <Field Def="u32 high:12 = 0" />
+  </Fields>
+</PARAMDEF>
+"""
+ROW_SIZE = 4 + 1 + 3 + 4 + 6 + 2 + 8 + 8 + 4
+ROWS = [
+    # id, name, value, flagA, flagB, scale, values, tail, label, wideLabel, low, high
+    (10, "First", -5, 1, 5, 0.5, (1, -2, 3), 7, b"abc", "wide", 0xABCDE, 0x123),
+    (20, None, 100, 0, 7, 2.0, (-32768, 0, 32767), 65535, b"12345678", "", 0, 0xFFF),
+    (30, "Third", 0, 1, 0, -1.25, (0, 0, 0), 1, b"", "x", 0xFFFFF, 0),
+]
+
+
+def pack_row(row):
+    _, _, value, flag_a, flag_b, scale, values, tail, label, wide_label, low, high = row
+    # The padding bits and bytes aren't zero, so a writer that regenerates them instead of keeping them would show
+    return (struct.pack("<iB", value, flag_a | flag_b << 1 | 0xA0) + b"\x01\x02\x03" + struct.pack("<f3hH", scale, *values, tail)
+            + label.ljust(8, b"\0") + wide_label.encode("utf-16-le").ljust(8, b"\0") + struct.pack("<I", low | high << 20))
+
+
+def build_param(long_offsets: bool) -> bytes:
+    """Lays out a PARAM by hand, the way SoulsFormats writes the two header variants."""
+    rows = b"".join(pack_row(row) for row in ROWS)
+    if long_offsets:
+        format_2d, format_2e, headers_offset, header_size = 0x85, 0x01, 0x40, 24
+    else:
+        format_2d, format_2e, headers_offset, header_size = 0x00, 0x00, 0x30, 12
+    data_start = headers_offset + header_size * len(ROWS)
+    strings_offset = data_start + len(rows)
+
+    strings = b""
+    if long_offsets:
+        param_type_offset = strings_offset
+        strings += PARAM_TYPE.encode("ascii") + b"\0"
+    name_offsets = []
+    for row in ROWS:
+        name = row[1]
+        name_offsets.append(strings_offset + len(strings) if name is not None else 0)
+        if name is not None:
+            strings += name.encode("utf-16-le") + b"\0\0" if long_offsets else name.encode("shift_jis") + b"\0"
+
+    header = struct.pack("<IHhhH", strings_offset, 0 if long_offsets else data_start, 3, 7, len(ROWS))
+    if long_offsets:
+        header += struct.pack("<iq", 0, param_type_offset) + b"\0" * 0x14
+    else:
+        header += PARAM_TYPE.encode("shift_jis").ljust(0x20, b"\0")
+    header += bytes([0, format_2d, format_2e, 203])
+    if long_offsets:
+        header += struct.pack("<q", data_start) + b"\0" * 8
+
+    row_headers = b""
+    for (row_id, *_), name_offset, index in zip(ROWS, name_offsets, range(len(ROWS))):
+        if long_offsets:
+            row_headers += struct.pack("<iiqq", row_id, 0, data_start + index * ROW_SIZE, name_offset)
+        else:
+            row_headers += struct.pack("<iII", row_id, data_start + index * ROW_SIZE, name_offset)
+    return header + row_headers + rows + strings
+
+
+@pytest.fixture
+def paramdex(tmp_path):
+    defs = tmp_path / "Paramdex" / "AC6" / "Defs"
+    defs.mkdir(parents=True)
+    (defs / f"{PARAM_TYPE}.xml").write_text(PARAMDEF, encoding="utf-8")
+    return Paramdex(str(tmp_path))
+
+
+def test_paramdef_layout(paramdex):
+    paramdef = paramdex.get(PARAM_TYPE)
+    assert paramdef.row_size == ROW_SIZE
+    offsets = {name: field.offset for name, field in paramdef.fields.items()}
+    assert offsets == {"value": 0, "flagA": 4, "flagB": 4, "pad0": 4, "pad1": 5, "scale": 8, "values": 12, "tail": 18,
+                       "label": 20, "wideLabel": 28, "low": 36, "high": 36}
+    assert [paramdef.fields[name].bit_offset for name in ("flagA", "flagB", "pad0", "low", "high")] == [0, 1, 4, 0, 20]
+    assert paramdef.fields["pad1"].is_padding and not paramdef.fields["pad0"].is_array
+
+
+@pytest.mark.parametrize("long_offsets", [True, False])
+def test_round_trip_is_byte_identical(paramdex, long_offsets):
+    data = build_param(long_offsets)
+    param = Param.parse(data, paramdex)
+    assert param.header["param_type"] == PARAM_TYPE
+    assert param.encode() == data
+
+    for index, (row_id, name, value, flag_a, flag_b, scale, values, tail, label, wide_label, low, high) in enumerate(ROWS):
+        row = param.row(index)
+        assert (row["@id"], row["@paramdexName"]) == (row_id, name)
+        assert (row["@value"], row["@flagA"], row["@flagB"], row["@scale"], row["@values"], row["@tail"]) == (value, flag_a, flag_b, scale, list(values), tail)
+        assert (row["@label"], row["@wideLabel"], row["@low"], row["@high"]) == (label.decode(), wide_label, low, high)
+
+
+def test_mismatched_paramdef_is_rejected(paramdex):
+    # A paramdef one byte short of the rows, like one that sized a numeric array as a single value
+    paramdef = paramdex.get(PARAM_TYPE)
+    paramdex._paramdefs[PARAM_TYPE] = params.Paramdef(PARAM_TYPE, list(paramdef.fields.values()),
+                                                      numpy.dtype({"names": ["value"], "formats": ["<i4"], "offsets": [0], "itemsize": ROW_SIZE - 1}))
+    with pytest.raises(ParamFormatError):
+        Param.parse(build_param(True), paramdex)
+
+
+def test_overlay_rows(paramdex):
+    param = Param.parse(build_param(True), paramdex)
+    base = param.row(0)
+    first = base.overlay({"@id": 25, "@paramdexName": "Overlay", "@value": 42, "@flagB": 3, "@values": [9, 8, 7], "@label": "new"})
+    second = first.overlay({"@id": 5, "@high": 0x456, "@wideLabel": "wz", "notAField": 1})
+
+    # Overlays only store what they change, and never write through to the row they came from
+    assert first.overrides == {"value": 42, "flagB": 3, "values": [9, 8, 7], "label": "new"}
+    assert second["@value"] == 42 and second["@tail"] == 7
+    assert base["@value"] == -5 and base["@flagB"] == 5
+    with pytest.raises(ParamFormatError):
+        base.overlay({"@notAField": 1})
+
+    param.add_overlay_rows([first, second])
+    assert param.ids.tolist() == [5, 10, 20, 25, 30]
+    assert param.names == ["Overlay", "First", None, "Overlay", "Third"]
+
+    reread = Param.parse(param.encode(), paramdex)
+    assert reread.encode() == param.encode()
+    added = reread.row(3).to_dict()
+    assert added == {**base.to_dict(), "@id": 25, "@paramdexName": "Overlay", "@value": 42, "@flagB": 3, "@values": [9, 8, 7], "@label": "new"}
+    added = reread.row(0).to_dict()
+    assert added["@high"] == 0x456 and added["@low"] == 0xABCDE and added["@wideLabel"] == "wz" and added["@flagA"] == 1
+    # Padding bits and bytes come from the source row
+    assert reread.rows[0].tobytes()[4] & 0xF0 == 0xA0 and reread.rows[0].tobytes()[5:8] == b"\x01\x02\x03"
+    # The original rows are untouched
+    assert reread.row(1).to_dict() == base.to_dict()
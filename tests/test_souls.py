@@ -0,0 +1,202 @@
+import struct
+import zlib
+
+import pytest
+
+import core
+import souls
+from souls import Fmg
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_fmg_round_trip(version):
+    # "AĀ" is 41 00 00 01 in UTF-16, a null pair that isn't the terminator
+    entries = {1: "Hello", 2: None, 5: "AĀx", 6: ""}
+    assert Fmg.parse(Fmg(entries, version).encode()).entries == entries
+
+
+def test_fmg_unterminated_string():
+    data = Fmg({1: "Hello", 2: "AĀ"}).encode()
+    end = data.rindex("AĀ".encode("utf-16-le")) + 4
+    with pytest.raises(ValueError, match="Unterminated"):
+        Fmg.parse(data[:end])
+
+
+def read_utf16(data, offset):
+    end = offset
+    while data[end:end + 2] != b"\0\0":
+        end += 2
+    return data[offset:end].decode("utf-16-le")
+
+
+def read_dcx(data):
+    """Reads a DCX_DFLT container by the SoulsFormats layout, checking every fixed field on the way."""
+    assert data[:4] == b"DCX\0"
+    assert struct.unpack_from(">5I", data, 4) == (0x11000, 0x18, 0x24, 0x44, 0x4C)
+    assert data[0x18:0x1C] == b"DCS\0"
+    uncompressed_size, compressed_size = struct.unpack_from(">II", data, 0x1C)
+    assert data[0x24:0x2C] == b"DCP\0DFLT" and struct.unpack_from(">I", data, 0x2C)[0] == 0x20
+    assert data[0x30] == 9 and data[0x38] == 15 and struct.unpack_from(">I", data, 0x40)[0] == 0x00010100
+    assert data[0x44:0x48] == b"DCA\0" and struct.unpack_from(">I", data, 0x48)[0] == 8
+    assert len(data) == 0x4C + compressed_size
+    payload = zlib.decompress(data[0x4C:])
+    assert len(payload) == uncompressed_size
+    return payload
+
+
+def read_bnd4(data):
+    """An independent BND4 reader for the layout bnd4() writes, returning its header fields, files and hash groups."""
+    assert data[:4] == b"BND4" and data[4:12] == bytes([0, 0, 0, 0, 0, 0, 1, 0])
+    file_count, header_size = struct.unpack_from("<iq", data, 0x0C)
+    version = data[0x18:0x20].rstrip(b"\0").decode("ascii")
+    file_header_size, data_start = struct.unpack_from("<qq", data, 0x20)
+    unicode, raw_format, extended = data[0x30], data[0x31], data[0x32]
+    hash_table_offset = struct.unpack_from("<q", data, 0x38)[0]
+    assert header_size == 0x40 and unicode == 1
+    file_format = souls.reverse_bits(raw_format)
+
+    files = []
+    for index in range(file_count):
+        offset = 0x40 + index * file_header_size
+        flags = souls.reverse_bits(data[offset])
+        minus_one, compressed_size = struct.unpack_from("<iq", data, offset + 4)
+        assert minus_one == -1 and data[offset + 1:offset + 4] == b"\0\0\0"
+        offset += 0x10
+        uncompressed_size = compressed_size
+        if file_format & souls.FORMAT_COMPRESSION:
+            uncompressed_size = struct.unpack_from("<q", data, offset)[0]
+            offset += 8
+        data_offset, file_id, name_offset = struct.unpack_from("<Iii", data, offset)
+        assert offset + 12 - (0x40 + index * file_header_size) == file_header_size
+        files.append({"flags": flags, "size": compressed_size, "uncompressed_size": uncompressed_size, "offset": data_offset,
+                      "id": file_id, "name_offset": name_offset, "name": read_utf16(data, name_offset),
+                      "data": data[data_offset:data_offset + compressed_size]})
+
+    groups = None
+    if extended == 4:
+        hashes_offset, group_count, entry_size, hash_size, hash_count_size, unk = struct.unpack_from("<qIBBBB", data, hash_table_offset)
+        assert (entry_size, hash_size, hash_count_size, unk) == (0x10, 8, 8, 0)
+        assert hashes_offset == hash_table_offset + 0x10 + group_count * 8
+        groups = []
+        for group_index in range(group_count):
+            length, first = struct.unpack_from("<ii", data, hash_table_offset + 0x10 + group_index * 8)
+            groups.append([struct.unpack_from("<Ii", data, hashes_offset + (first + entry) * 8) for entry in range(length)])
+        assert data_start == hashes_offset + sum(map(len, groups)) * 8
+    return {"version": version, "format": file_format, "extended": extended, "file_header_size": file_header_size,
+            "data_start": data_start, "hash_table_offset": hash_table_offset, "files": files, "groups": groups}
+
+
+def test_path_hash():
+    # SoulsFormats' hash: lowercase, forward slashes, a leading slash, then h = h * 37 + c over 32 bits
+    expected = 0
+    for char in "/script/ai/out/each/123_logic.lua":
+        expected = (expected * 37 + ord(char)) % 2 ** 32
+    assert souls.path_hash("Script\\AI\\out\\each\\123_logic.lua") == expected
+    assert souls.path_hash(" /script/ai/out/each/123_logic.lua ") == expected
+
+
+@pytest.mark.parametrize("file_count", [1, 2, 9, 40])
+def test_bnd4_structure(file_count):
+    entries = [(1000 + index, f"W:\\data\\file_{index}.bin", bytes([index % 256]) * (index * 7 % 33)) for index in range(file_count)]
+    bnd = read_bnd4(souls.bnd4(entries))
+
+    assert bnd["version"] == "07D7R6" and bnd["extended"] == 4
+    assert bnd["format"] == souls.FORMAT_IDS | souls.FORMAT_NAMES1 | souls.FORMAT_NAMES2 | souls.FORMAT_COMPRESSION
+    assert bnd["file_header_size"] == 0x24
+
+    # Names follow the file headers back to back, the hash table is 8 aligned after them
+    names_start = 0x40 + 0x24 * file_count
+    expected_offset = names_start
+    for file, (file_id, name, file_data) in zip(bnd["files"], entries):
+        assert (file["id"], file["name"], file["data"], file["flags"]) == (file_id, name, file_data, souls.FILE_FLAG1)
+        assert file["size"] == file["uncompressed_size"] == len(file_data)
+        assert file["name_offset"] == expected_offset
+        expected_offset += (len(name) + 1) * 2
+        if file_data:
+            assert file["offset"] % 0x10 == 0 and file["offset"] >= bnd["data_start"]
+    assert bnd["hash_table_offset"] == expected_offset + (-expected_offset % 8)
+
+    # Every name is in the group its hash picks, sorted by hash, and the group count is the first prime from count / 7
+    group_count = len(bnd["groups"])
+    assert souls.is_prime(group_count) and not any(souls.is_prime(count) for count in range(file_count // 7, group_count))
+    seen = set()
+    for group_index, group in enumerate(bnd["groups"]):
+        assert group == sorted(group)
+        for name_hash, file_index in group:
+            assert name_hash == souls.path_hash(entries[file_index][1]) and name_hash % group_count == group_index
+            seen.add(file_index)
+    assert seen == set(range(file_count))
+
+    # Data never overlaps
+    spans = sorted((file["offset"], file["offset"] + file["size"]) for file in bnd["files"])
+    assert all(end <= start for (_, end), (start, _) in zip(spans, spans[1:]))
+
+
+def test_bnd4_without_hash_table():
+    bnd = read_bnd4(souls.bnd4([(1, "a.txt", b"abc")], extended=0))
+    assert bnd["hash_table_offset"] == 0 and bnd["groups"] is None
+    assert bnd["data_start"] == 0x40 + 0x24 + len("a.txt\0") * 2
+    assert bnd["files"][0]["data"] == b"abc"
+
+
+def test_bnd4_rejects_unsupported_formats():
+    with pytest.raises(ValueError):
+        souls.bnd4([(1, "a", b"")], file_format=souls.FORMAT_IDS | souls.FORMAT_NAMES1 | souls.FORMAT_LONG_OFFSETS)
+
+
+@pytest.mark.parametrize("size", [0, 1, 100, 200000])
+def test_dcx_dflt(size):
+    data = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+    assert read_dcx(souls.dcx_dflt(data)) == data
+
+
+def dds(mipmaps, body_size):
+    return b"DDS " + struct.pack("<7I", 124, 0, 4, 4, 0, 0, mipmaps) + b"\0" * (124 - 28) + b"\xAB" * body_size
+
+
+def test_tpf_structure():
+    textures = [("MENU_Tex_00001", 102, 0, dds(1, 16)), ("MENU_Tex_00002", 0, 1, dds(5, 7)), ("Tiny", 5, 0, b"DDS ")]
+    data = souls.tpf(textures)
+    assert data[:4] == b"TPF\0"
+    data_size, count = struct.unpack_from("<Ii", data, 4)
+    assert count == len(textures) and data[12:16] == bytes([souls.TPF_PLATFORM_PC, 3, souls.TPF_ENCODING_UTF16, 0])
+
+    data_end = 0
+    for index, (name, texture_format, flags1, dds_data) in enumerate(textures):
+        offset, size = struct.unpack_from("<Ii", data, 0x10 + index * 0x14)
+        entry_format, cubemap, mipmaps, entry_flags1 = data[0x18 + index * 0x14:0x1C + index * 0x14]
+        name_offset, unk = struct.unpack_from("<Ii", data, 0x1C + index * 0x14)
+        assert (entry_format, cubemap, entry_flags1, unk) == (texture_format, 0, flags1, 0)
+        assert mipmaps == (struct.unpack_from("<I", dds_data, 28)[0] if len(dds_data) >= 32 else 1)
+        assert read_utf16(data, name_offset) == name
+        assert offset % 4 == 0 and data[offset:offset + size] == dds_data
+        data_end = max(data_end, offset + size)
+    assert data_end == len(data)
+    # Like SoulsFormats, the data size counts everything after the names, the alignment before the first texture included
+    names_end = 0x10 + 0x14 * count + sum((len(name) + 1) * 2 for name, _, _, _ in textures)
+    assert data_size == len(data) - names_end
+
+
+def test_luagnl():
+    data = souls.luagnl(["LogicInitialSetup_123", "InterruptCallBack_123"])
+    assert len(data) % 0x10 == 0
+    offsets = struct.unpack_from("<3q", data, 0)
+    assert offsets[2] == 0
+    assert [data[offset:data.index(b"\0", offset)].decode() for offset in offsets[:2]] == ["LogicInitialSetup_123", "InterruptCallBack_123"]
+    assert offsets[0] == 24
+
+
+def test_generated_luabnd():
+    bnd = read_bnd4(read_dcx(core.generate_luabnd("function LogicInitialSetup_123() end", 123)))
+    lua, gnl = bnd["files"]
+    assert (lua["id"], gnl["id"]) == (1000, 1000000)
+    assert lua["name"].endswith("\\123_logic\\123_logic.lua") and gnl["name"].endswith("\\123_logic.luagnl")
+    assert lua["data"] == b"function LogicInitialSetup_123() end"
+    assert gnl["data"] == souls.luagnl(["LogicInitialSetup_123", "InterruptCallBack_123"])
+
+
+def test_generated_single_tpf():
+    dds_data = dds(1, 64)
+    tpf = read_dcx(core.generate_single_tpf("MENU_DecalThumb_00001", dds_data))
+    offset, size = struct.unpack_from("<Ii", tpf, 0x10)
+    assert tpf[offset:offset + size] == dds_data and tpf[0x18] == 102
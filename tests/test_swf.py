@@ -0,0 +1,183 @@
+import copy
+import struct
+
+import pytest
+
+import core
+import swf
+from swf import Swf, Tag, ExternalImage
+
+# Four GFX files get rank images in the real build (one per menu and resolution); the fixture mimics their layout:
+# the ArenaRank images, other images after them, a shape with a lower id and the arenarank sprite that places
+# ArenaRank_00000d on depth 1 and steps through its frames.
+SPRITE_ID = 260
+ARENA_RANK_IDS = {"ArenaRank_00000a": 410, "ArenaRank_00000b": 411, "ArenaRank_00000d": 412}
+SPRITE_FRAMES = 8
+
+TAG_TYPES = {
+    swf.SHOW_FRAME: "ShowFrameTag",
+    swf.PLACE_OBJECT2: "PlaceObject2Tag",
+    swf.PLACE_OBJECT3: "PlaceObject3Tag",
+    swf.REMOVE_OBJECT2: "RemoveObject2Tag",
+    swf.DEFINE_EXTERNAL_IMAGE2: "DefineExternalImage2",
+}
+
+
+def external_image(character_id, name):
+    return Tag(swf.DEFINE_EXTERNAL_IMAGE2, ExternalImage(character_id, 13, 232, 128, name, f"{name}.tga", b"\0\0").encode())
+
+
+def place_object2(character_id, depth=1):
+    return Tag(swf.PLACE_OBJECT2, struct.pack("<BHH", 0x02, depth, character_id))
+
+
+def sprite_tags():
+    return [place_object2(ARENA_RANK_IDS["ArenaRank_00000d"])] + [Tag(swf.SHOW_FRAME, b"")] * SPRITE_FRAMES
+
+
+def write_fixture(path, signature=b"GFX"):
+    sprite_body = struct.pack("<HH", SPRITE_ID, SPRITE_FRAMES) + b"".join(tag.encode() for tag in sprite_tags()) + Tag(swf.END, b"").encode()
+    symbol_class = struct.pack("<HH", 1, SPRITE_ID) + b"arenarank_mc\0"
+    tags = [Tag(2, struct.pack("<H", 7) + b"\0" * 8)]  # DefineShape
+    tags += [external_image(character_id, name) for name, character_id in ARENA_RANK_IDS.items()]
+    tags += [external_image(420, "MenuFrame_0001"),
+             Tag(swf.DEFINE_SPRITE, sprite_body),
+             Tag(swf.SYMBOL_CLASS, symbol_class),
+             Tag(swf.SHOW_FRAME, b""),
+             Tag(swf.END, b"")]
+    # Empty frame size RECT, frame rate and frame count
+    Swf(signature, 10, bytes(1) + struct.pack("<HH", 24 << 8, 1), tags).write(path)
+
+
+def read_bits(data, bit_offset, bit_count, signed=False):
+    value = int.from_bytes(data, "big") >> (len(data) * 8 - bit_offset - bit_count) & ((1 << bit_count) - 1)
+    if signed and value & (1 << (bit_count - 1)):
+        value -= 1 << bit_count
+    return value
+
+
+def native_item(tag):
+    """Describes a decoded tag with the attributes ffdec's XML gives it."""
+    item = {"@type": TAG_TYPES[tag.code]}
+    if tag.code in (swf.REMOVE_OBJECT2, swf.PLACE_OBJECT2, swf.PLACE_OBJECT3):
+        item["@forceWriteAsLong"] = str(tag.long_header).lower()
+    if tag.code == swf.REMOVE_OBJECT2:
+        item["@depth"] = str(struct.unpack_from("<H", tag.body, 0)[0])
+    elif tag.code == swf.PLACE_OBJECT2:
+        item["@depth"], item["@characterId"] = map(str, struct.unpack_from("<HH", tag.body, 1))
+    elif tag.code == swf.PLACE_OBJECT3:
+        flags, image_flags, depth, character_id = struct.unpack_from("<BBHH", tag.body, 0)
+        matrix = tag.body[6:]
+        translate_bits = read_bits(matrix, 2, 5)
+        item.update({
+            "@depth": str(depth),
+            "@characterId": str(character_id),
+            "@placeFlagHasCharacter": str(bool(flags & 0x02)).lower(),
+            "@placeFlagHasMatrix": str(bool(flags & 0x04)).lower(),
+            "@placeFlagHasImage": str(bool(image_flags & 0x10)).lower(),
+            "matrix": {
+                "@type": "MATRIX",
+                "@hasScale": str(bool(read_bits(matrix, 0, 1))).lower(),
+                "@hasRotate": str(bool(read_bits(matrix, 1, 1))).lower(),
+                "@nTranslateBits": str(translate_bits),
+                "@translateX": str(read_bits(matrix, 7, translate_bits, signed=True)),
+                "@translateY": str(read_bits(matrix, 7 + translate_bits, translate_bits, signed=True)),
+            },
+        })
+    elif tag.code == swf.DEFINE_EXTERNAL_IMAGE2:
+        image = ExternalImage.parse(tag.body)
+        item.update({"@characterID": str(image.character_id), "@exportName": image.export_name, "@fileName": image.file_name,
+                     "@bitmapFormat": str(image.bitmap_format), "@targetWidth": str(image.width), "@targetHeight": str(image.height)})
+    return item
+
+
+NATIVE_KEYS = {"@depth", "@characterId", "@characterID", "@placeFlagHasCharacter", "@placeFlagHasMatrix", "@placeFlagHasImage",
+               "@forceWriteAsLong", "@hasScale", "@hasRotate", "@nTranslateBits", "@translateX", "@translateY",
+               "@exportName", "@fileName", "@bitmapFormat", "@targetWidth", "@targetHeight"}
+
+
+def comparable(item):
+    """Keeps the attributes both paths describe, so ffdec's extra bookkeeping attributes don't get in the way."""
+    if not isinstance(item, dict):
+        return item
+    return {key: comparable(value) for key, value in item.items() if key in ("@type", "matrix") or key in NATIVE_KEYS}
+
+
+def ffdec_sprite_items(rank_image_files):
+    """Runs modify_sprite_tag, the ffdec path's sprite edit, on the fixture's sprite as ffdec would describe it."""
+    sprite_tag = {"subTags": {"item": [native_item(tag) for tag in sprite_tags()]}}
+    images_by_rank = {image["rankID"]: image for image in rank_image_files}
+    core.modify_sprite_tag(sprite_tag, images_by_rank, ARENA_RANK_IDS["ArenaRank_00000d"])
+    return sprite_tag["subTags"]["item"]
+
+
+def ffdec_top_level_images(rank_image_files):
+    """The DefineExternalImage2 order process_gfx_file_ffdec produces: each new image goes right after the last ArenaRank one."""
+    names = list(ARENA_RANK_IDS) + ["MenuFrame_0001"]
+    last_line_index = len(ARENA_RANK_IDS) - 1
+    for image_file_data in rank_image_files:
+        names.insert(last_line_index + 1, image_file_data["filename"][:-4])
+    return names
+
+
+def frames(items):
+    """Splits the sprite's tags into the frames they belong to."""
+    result = [[]]
+    for item in items:
+        if item["@type"] == "ShowFrameTag":
+            result.append([])
+        else:
+            result[-1].append(item)
+    return result
+
+
+@pytest.mark.parametrize("signature", [b"GFX", b"CFX"])
+@pytest.mark.parametrize("rank_ids", [[0], [0, 1, 2, 3], [1, 4]])
+def test_add_rank_images_matches_ffdec_path(tmp_path, signature, rank_ids):
+    gfx_file = str(tmp_path / "02_903_arenarank.gfx")
+    write_fixture(gfx_file, signature)
+    rank_image_files = [{"filename": f"ArenaRank_{1000 + rank_id:06d}.png", "rankID": rank_id} for rank_id in rank_ids]
+    ffdec_rank_image_files = copy.deepcopy(rank_image_files)
+
+    assert swf.add_rank_images(gfx_file, rank_image_files)
+
+    # The ffdec path numbers the new images from the next hundred after the highest DefineExternalImage2 id
+    expected_ids = [500 + index for index in range(len(rank_ids))]
+    assert [image["characterID"] for image in rank_image_files] == expected_ids
+    for index, image in enumerate(ffdec_rank_image_files):
+        image["characterID"] = 500 + index
+
+    result = Swf.read(gfx_file)
+    assert result.signature == signature
+    images = [ExternalImage.parse(tag.body) for tag in result.tags if tag.code == swf.DEFINE_EXTERNAL_IMAGE2]
+    assert [image.export_name for image in images] == ffdec_top_level_images(ffdec_rank_image_files)
+    for image in images:
+        if image.character_id in expected_ids:
+            assert (image.bitmap_format, image.width, image.height) == (13, 232, 128)
+            assert image.file_name == f"{image.export_name}.tga"
+
+    sprite = next(tag for tag in result.tags if tag.code == swf.DEFINE_SPRITE)
+    assert struct.unpack_from("<HH", sprite.body, 0) == (SPRITE_ID, SPRITE_FRAMES)
+    native_tags, end_offset = swf.read_tags(sprite.body, 4)
+    assert end_offset == len(sprite.body) and native_tags[-1].code == swf.END
+
+    native_items = [comparable(native_item(tag)) for tag in native_tags[:-1]]
+    ffdec_items = [comparable(item) for item in ffdec_sprite_items(ffdec_rank_image_files)]
+    assert native_items == ffdec_items
+    # Sanity check on the expectation itself: every rank's image is placed in its frame and ArenaRank_00000d comes back after the last one
+    sprite_frames = frames(native_items)
+    for index, image in enumerate(ffdec_rank_image_files):
+        assert [item["@type"] for item in sprite_frames[image["rankID"]]][-2:] == ["RemoveObject2Tag", "PlaceObject3Tag"]
+        assert sprite_frames[image["rankID"]][-1]["@characterId"] == str(image["characterID"])
+    assert sprite_frames[max(rank_ids) + 1][-1]["@characterId"] == str(ARENA_RANK_IDS["ArenaRank_00000d"])
+
+
+def test_add_rank_images_without_arena_rank_images(tmp_path):
+    gfx_file = str(tmp_path / "menu.gfx")
+    Swf(b"GFX", 10, bytes(1) + struct.pack("<HH", 24 << 8, 1), [external_image(5, "MenuFrame_0001"), Tag(swf.END, b"")]).write(gfx_file)
+    with open(gfx_file, "rb") as file:
+        original = file.read()
+
+    assert not swf.add_rank_images(gfx_file, [{"filename": "ArenaRank_001000.png", "rankID": 0}])
+    with open(gfx_file, "rb") as file:
+        assert file.read() == original
@@ -0,0 +1,50 @@
+import json
+
+import core
+import params
+
+PARAMDEF = """<?xml version="1.0" encoding="utf-8"?>
+<PARAMDEF XmlVersion="3">
+  <ParamType>ARENA_PARAM_ST</ParamType>
+  <Fields>
+    <Field Def="s32 initialCoamReward" />
+    <Field Def="s32 missionParamId" />
+    <Field Def="f32 rewardScale" />
+    <Field Def="dummy8 pad[4]" />
+  </Fields>
+</PARAMDEF>
+"""
+
+
+def arena_errors(tmp_path, arena_data):
+    fight_dir = tmp_path / "fight"
+    fight_dir.mkdir()
+    (fight_dir / "ac.design").write_bytes(b"design")
+    (fight_dir / "data.json").write_text(json.dumps({
+        "arenaData": arena_data,
+        "textData": {"acName": "AC", "pilotName": "Pilot", "arenaDescription": "Description"},
+        "fileData": {"acDesign": "ac.design"},
+        "logicId": 1,
+    }))
+    fields = params.Paramdef.parse(PARAMDEF.encode("utf-8")).fields
+    return core.validate_fight(str(fight_dir), arena_fields=fields)
+
+
+def test_valid_arena_data(tmp_path):
+    assert arena_errors(tmp_path, {"initialCoamReward": 1000, "missionParamId": "5", "rewardScale": 1.5}) == []
+
+
+def test_arena_data_is_checked_against_arena_param(tmp_path):
+    errors = arena_errors(tmp_path, {"initialCoamReward": "lots", "misionParamId": 5, "pad": 0, "rewardScale": None})
+    assert errors == [
+        "fight: arenaData.initialCoamReward should be a number, not 'lots'",
+        "fight: arenaData.misionParamId is not an ArenaParam field",
+        "fight: arenaData.pad is not an ArenaParam field",
+        "fight: arenaData.rewardScale should be a number, not 'None'",
+    ]
+
+
+def test_data_json_that_is_not_an_object(tmp_path):
+    (tmp_path / "fight").mkdir()
+    (tmp_path / "fight" / "data.json").write_text("[]")
+    assert core.validate_fight(str(tmp_path / "fight")) == ["fight: data.json doesn't hold a JSON object"]
@@ -0,0 +1,96 @@
+import os
+import zipfile
+
+import pytest
+
+import gui
+
+MEMBERS = {
+    "AC6/Upgrader/version.txt": b"1_07_1_0016L",
+    "AC6/Defs/EquipParamWeapon.xml": b"<PARAMDEF>" + b"<Field/>" * 5000 + b"</PARAMDEF>",
+    "AC6/Names/stored.txt": bytes(range(256)) * 8,
+    "AC6/Names/ünicode.txt": "éè".encode("utf-8") * 100,
+}
+
+
+class Unseekable:
+    """A write-only stream, so zipfile falls back to data descriptors."""
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+def write_fixture(path, streamed=False, force_zip64=False):
+    with open(path, "wb") as file:
+        with zipfile.ZipFile(Unseekable(file) if streamed else file, "w") as zip_ref:
+            zip_ref.comment = b"fixture"
+            for name, content in MEMBERS.items():
+                info = zipfile.ZipInfo(name, (2024, 1, 2, 3, 4, 6))
+                info.compress_type = zipfile.ZIP_STORED if name.endswith("stored.txt") else zipfile.ZIP_DEFLATED
+                with zip_ref.open(info, "w", force_zip64=force_zip64) as member:
+                    member.write(content)
+
+
+def raw_member(path, info):
+    with open(path, "rb") as file:
+        file.seek(info.header_offset + 26)
+        name_length, extra_length = int.from_bytes(file.read(2), "little"), int.from_bytes(file.read(2), "little")
+        file.seek(info.header_offset + 30 + name_length + extra_length)
+        return file.read(info.compress_size)
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+@pytest.mark.parametrize("force_zip64", [False, True])
+def test_replace_zip_member(tmp_path, streamed, force_zip64):
+    zip_path = str(tmp_path / "Paramdex.zip")
+    write_fixture(zip_path, streamed, force_zip64)
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        before = {info.filename: (info.CRC, info.compress_type, raw_member(zip_path, info)) for info in zip_ref.infolist()}
+        if streamed:
+            assert all(info.flag_bits & 0x08 for info in zip_ref.infolist())
+
+    gui.replace_zip_member(zip_path, "AC6/Upgrader/version.txt", b"1_07_2_0018")
+
+    assert not os.path.exists(f"{zip_path}.tmp")
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        assert zip_ref.testzip() is None
+        assert zip_ref.comment == b"fixture"
+        assert zip_ref.namelist() == list(MEMBERS)
+        assert zip_ref.read("AC6/Upgrader/version.txt") == b"1_07_2_0018"
+        replaced = zip_ref.getinfo("AC6/Upgrader/version.txt")
+        assert replaced.date_time == (2024, 1, 2, 3, 4, 6) and replaced.compress_type == zipfile.ZIP_DEFLATED
+        for info in zip_ref.infolist():
+            if info.filename == "AC6/Upgrader/version.txt":
+                continue
+            crc, compress_type, raw = before[info.filename]
+            assert (info.CRC, info.compress_type) == (crc, compress_type)
+            assert zip_ref.read(info) == MEMBERS[info.filename]
+            # Copied without recompressing, Zip64 local headers and data descriptors included
+            assert raw_member(zip_path, info) == raw
+
+
+def test_zip64_central_directory_is_rewritten(tmp_path, monkeypatch):
+    zip_path = str(tmp_path / "Paramdex.zip")
+    # Small enough that zipfile gives the larger members Zip64 central directory records
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 1000)
+    write_fixture(zip_path, force_zip64=True)
+    with open(zip_path, "rb") as file:
+        assert gui.read_central_directory(file) is None
+
+    gui.replace_zip_member(zip_path, "AC6/Upgrader/version.txt", b"1_07_2_0018")
+
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        assert zip_ref.testzip() is None
+        assert {name: zip_ref.read(name) for name in zip_ref.namelist()} == {**MEMBERS, "AC6/Upgrader/version.txt": b"1_07_2_0018"}
+
+
+def test_read_central_directory(tmp_path):
+    zip_path = str(tmp_path / "Paramdex.zip")
+    write_fixture(zip_path)
+    with open(zip_path, "rb") as file:
+        assert [gui.record_name(record) for record in gui.read_central_directory(file)] == list(MEMBERS)